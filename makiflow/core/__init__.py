@@ -15,7 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
-from .graph_entities import MakiRestorable, MakiTensor, MakiLayer, InputMakiLayer
+from .graph_entities import MakiRestorable, MakiTensor, MakiLayer, InputMakiLayer, DeferredInit, FrozenStats
 from .base_layers import BatchNormBaseLayer
 from .training import MakiTrainer, Loss, TrainerBuilder
 from .inference import MakiModel, MakiBuilder
@@ -16,9 +16,9 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 from abc import abstractmethod
-import tensorflow as tf
 import numpy as np
-from .graph_entities import MakiLayer
+import tensorflow as tf
+from .graph_entities import MakiLayer, FrozenStats
 
 
 class BatchNormBaseLayer(MakiLayer):
@@ -76,11 +76,6 @@ class BatchNormBaseLayer(MakiLayer):
         # the batchNormaization: result*gamma + beta
         # beta - offset
         # gamma - scale
-        if beta is None:
-            beta = np.zeros(D)
-        if gamma is None:
-            gamma = np.ones(D)
-
         params = []
         regularize_params = []
         named_params_dict = {}
@@ -89,7 +84,9 @@ class BatchNormBaseLayer(MakiLayer):
         # Create gamma
         if use_gamma:
             self.name_gamma = '{}Gamma_{}_id_'.format(type_norm, D) + name
-            self.gamma = tf.Variable(gamma.astype(np.float32), name=self.name_gamma)
+            self.gamma = MakiLayer.create_variable(
+                self.name_gamma, shape=[D], init_fn=lambda: np.ones(D), value=gamma
+            )
             named_params_dict[self.name_gamma] = self.gamma
             params += [self.gamma]
             if regularize_gamma:
@@ -100,7 +97,9 @@ class BatchNormBaseLayer(MakiLayer):
         # Create beta
         if use_beta:
             self.name_beta = '{}Beta_{}_id_'.format(type_norm, D) + name
-            self.beta = tf.Variable(beta.astype(np.float32), name=self.name_beta)
+            self.beta = MakiLayer.create_variable(
+                self.name_beta, shape=[D], init_fn=lambda: np.zeros(D), value=beta
+            )
             named_params_dict[self.name_beta] = self.beta
             params += [self.beta]
             if regularize_beta:
@@ -121,6 +120,28 @@ class BatchNormBaseLayer(MakiLayer):
 
         return super().__call__(x)
 
+    def _update_running_stats(self, batch_mean, batch_var):
+        """
+        Creates the ops updating the running mean and variance with the batch statistics.
+
+        Returns
+        -------
+        list
+            The update ops. The training output must depend on them. Empty within the FrozenStats context.
+        """
+        if FrozenStats.is_active():
+            return []
+
+        update_running_mean = tf.assign(
+            self.running_mean,
+            self.running_mean * self.decay + batch_mean * (1 - self.decay)
+        )
+        update_running_variance = tf.assign(
+            self.running_variance,
+            self.running_variance * self.decay + batch_var * (1 - self.decay)
+        )
+        return [update_running_mean, update_running_variance]
+
     @abstractmethod
     def _init_train_params(self, data):
         pass
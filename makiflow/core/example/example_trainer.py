@@ -42,9 +42,11 @@ class ExampleTrainer(MakiTrainer):
     def _build_loss(self):
         # This method must return a scalar of the training loss
         out_xs = self.get_model().get_outputs()
+        # Fetch the labels here rather than using `self._labels`, since each tower gets its own slice of them
+        labels = super().get_label_tensors()[ExampleTrainer.LABELS]
         losses = []
         for out_x in out_xs:
             out_t = out_x.get_data_tensor()
-            losses += [Loss.mse_loss(self._labels, out_t)]
+            losses += [Loss.mse_loss(labels, out_t)]
 
         return tf.add_n(losses)
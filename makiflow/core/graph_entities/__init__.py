@@ -17,4 +17,4 @@
 
 from .input_maki_layer import InputMakiLayer
 from .maki_tensor import MakiTensor
-from .maki_layer import MakiLayer, MakiRestorable
\ No newline at end of file
+from .maki_layer import MakiLayer, MakiRestorable, DeferredInit, FrozenStats
\ No newline at end of file
@@ -42,7 +42,7 @@ class InputMakiLayer(MakiTensor, ABC):
             data_tensor=data_tensor,
             parent_layer=self,
             parent_tensor_names=[],
-            previous_tensors={},
+            parent_tensors=[],
         )
 
     def get_params(self):
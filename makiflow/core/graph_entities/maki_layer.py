@@ -18,6 +18,9 @@
 from abc import abstractmethod, ABC
 from .maki_tensor import MakiTensor
 from warnings import warn
+from weakref import WeakKeyDictionary
+import numpy as np
+import tensorflow as tf
 
 
 class MakiRestorable(ABC):
@@ -68,6 +71,57 @@ class MakiRestorable(ABC):
         pass
 
 
+class DeferredInit:
+    """
+    Context manager that turns on the deferred initialization mode. Within the context the layers create
+    their variables from the shapes only: no initial values are generated or embedded into the graph,
+    the variables are filled with zeros when initialized. Use it when the weights are loaded right
+    after the model is built:
+
+    with DeferredInit():
+        model = Classificator.from_json(arch_path)
+    model.set_session(sess)
+    model.load_weights(weights_path)
+    """
+    # Number of the entered contexts. Allows nesting.
+    _depth = 0
+
+    def __enter__(self):
+        DeferredInit._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        DeferredInit._depth -= 1
+        return False
+
+    @staticmethod
+    def is_active():
+        return DeferredInit._depth > 0
+
+
+class FrozenStats:
+    """
+    Context manager within which the layers do not update their running statistics (the moving mean and
+    variance of the normalization layers) in the training mode. It is used when the training graph of a part
+    of the model is built once more, for example, to recompute the activations during gradient checkpointing,
+    so the statistics are still updated once per training step.
+    """
+    # Number of the entered contexts. Allows nesting.
+    _depth = 0
+
+    def __enter__(self):
+        FrozenStats._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        FrozenStats._depth -= 1
+        return False
+
+    @staticmethod
+    def is_active():
+        return FrozenStats._depth > 0
+
+
 class MakiLayer(MakiRestorable):
     TRAINING_MODE = 'TrainingGraph'
     INFERENCE_MODE = 'InferenceGraph'
@@ -77,6 +131,10 @@ class MakiLayer(MakiRestorable):
                                      ' tensors in the MakiLayer constructor (see the `outputs_names` parameter).'
     __EXC_OUTPUT_NONE = 'Output of the layer is None. Check whether the `_forward` method works correctly.'
 
+    # Contains pairs { tf.Graph: { initial value placeholder name: function generating the initial value } }.
+    # The graphs are weakly referenced, so the functions are released along with their graph.
+    _INIT_FNS = WeakKeyDictionary()
+
     def __init__(self, name: str, params: list, regularize_params: list, named_params_dict: dict,
                  outputs_names: list = None):
         """
@@ -115,6 +173,86 @@ class MakiLayer(MakiRestorable):
         # Dictionary of pairs { parent MakiTensor name : list child MakiTensor name }
         self._children_dict = {}
 
+    @staticmethod
+    def create_variable(name, shape, init_fn=None, value=None, trainable=True):
+        """
+        Creates a float32 variable for the layer's parameter. The initial value is not embedded into the graph:
+        the variable is initialized from a placeholder, the value for which is generated at initialization time
+        (see `get_init_feed_dict`). Therefore, the size of the graph does not depend on the number of parameters.
+        Any initializer of such variables must be run with the feed dict from `get_init_feed_dict`, for example:
+        sess.run(tf.global_variables_initializer(), feed_dict=MakiLayer.get_init_feed_dict(tf.global_variables())).
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+        shape : list
+            Shape of the variable.
+        init_fn : function
+            Returns the initial value as a numpy array. It is not called in the deferred initialization mode
+            (see DeferredInit).
+        value : np.ndarray
+            Explicitly given initial value, for example, a pretrained one. Takes precedence over `init_fn`.
+        trainable : bool
+            Passed to tf.Variable.
+
+        Returns
+        -------
+        tf.Variable
+        """
+        if value is None and DeferredInit.is_active():
+            return tf.Variable(tf.zeros(shape, dtype=tf.float32), name=name, trainable=trainable)
+
+        if value is not None:
+            init_fn = lambda: value
+        # The placeholder is created within the variable's name scope, so the variable's name stays the same
+        variable = tf.Variable(
+            lambda: tf.placeholder(tf.float32, shape=shape, name='initial_value'),
+            name=name, trainable=trainable
+        )
+        graph_init_fns = MakiLayer._INIT_FNS.setdefault(variable.graph, {})
+        graph_init_fns[variable.initial_value.name] = init_fn
+        return variable
+
+    @staticmethod
+    def get_init_feed_dict(variables):
+        """
+        Generates the initial values for the variables created via `create_variable`.
+
+        Parameters
+        ----------
+        variables : list
+            List of tf.Variables to initialize. Variables that were created in a different way are skipped.
+
+        Returns
+        -------
+        dict
+            Feed dict for running the initializers of the `variables`.
+        """
+        feed_dict = {}
+        for variable in variables:
+            init_fn = MakiLayer._INIT_FNS.get(variable.graph, {}).get(variable.initial_value.name)
+            if init_fn is not None:
+                feed_dict[variable.initial_value] = np.asarray(init_fn()).astype(np.float32)
+        return feed_dict
+
+    @staticmethod
+    def release_init_fns(variables):
+        """
+        Drops the functions generating the initial values of the `variables`, so the values they hold
+        (pretrained weights, for example) can be garbage collected. Call it once the variables are initialized,
+        after that their initializers cannot be run anymore.
+
+        Parameters
+        ----------
+        variables : list
+            List of tf.Variables created via `create_variable`. Other variables are skipped.
+        """
+        for variable in variables:
+            graph_init_fns = MakiLayer._INIT_FNS.get(variable.graph)
+            if graph_init_fns is not None:
+                graph_init_fns.pop(variable.initial_value.name, None)
+
     def __call__(self, x):
         """
         Unpacks datatensor(s) (tf.Tensor) from the given MakiTensor(s) `x`, performs layer's transformation and
@@ -139,12 +277,9 @@ class MakiLayer(MakiRestorable):
             x = [x]
 
         data_tensors = []
-        previous_tensors = {}
         parent_tensor_names = []
         for _x in x:
             data_tensors += [_x.get_data_tensor()]
-            previous_tensors.update(_x.get_previous_tensors())
-            previous_tensors.update(_x.get_self_pair())
             parent_tensor_names += [_x.get_name()]
 
         if len(data_tensors) == 1:
@@ -164,7 +299,7 @@ class MakiLayer(MakiRestorable):
                         data_tensor=t,
                         parent_layer=self,
                         parent_tensor_names=parent_tensor_names,
-                        previous_tensors=previous_tensors,
+                        parent_tensors=x,
                         name=makitensor_name,
                         index=i
                     )
@@ -176,7 +311,7 @@ class MakiLayer(MakiRestorable):
                 data_tensor=output,
                 parent_layer=self,
                 parent_tensor_names=parent_tensor_names,
-                previous_tensors=previous_tensors,
+                parent_tensors=x,
                 name=makitensor_name
             )
 
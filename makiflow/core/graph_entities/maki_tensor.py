@@ -27,7 +27,7 @@ class MakiTensor:
     OBJ2REPR = "<mf.core.MakiTensor 'name={}' shape={} dtype={}>"
 
     def __init__(self, data_tensor: tf.Tensor, parent_layer, parent_tensor_names: list,
-                 previous_tensors: dict, name=None, index=None):
+                 previous_tensors: dict = None, name=None, index=None, parent_tensors: list = None):
         """
         Parameters
         ----------
@@ -39,13 +39,18 @@ class MakiTensor:
             Name of the MakiTensors used to produce this MakiTensor. I.e., names of the
             MakiTensors that were inputs to the `parent_layer`.
         previous_tensors : dict
-            Dictionary of all the MakiTensors that appeared in the graph before creation of this MakiTensor/
+            Dictionary of all the MakiTensors that appeared in the graph before creation of this MakiTensor.
+            Can be omitted if `parent_tensors` are provided. In this case the dictionary is computed on demand
+            (see `get_previous_tensors`).
         name : str
             Custom name for this MakiTensor
         index : int
             Layer can produce a list of MakiTensors. This is the index of this MakiTensor from such a list.
             If the index is None, the `parent_layer` never produces a list of MakiTensors,
             hence there is no index value.
+        parent_tensors : list
+            MakiTensors used to produce this MakiTensor. Their order must be the same as in `parent_tensor_names`.
+            Storing only the direct parents keeps the graph construction linear in the number of layers.
         """
         self._data_tensor: tf.Tensor = data_tensor
         if name is not None:
@@ -54,7 +59,10 @@ class MakiTensor:
             self._name: str = parent_layer.get_name()
         self._parent_tensor_names = parent_tensor_names
         self._parent_layer = parent_layer
+        if previous_tensors is None and parent_tensors is None:
+            previous_tensors = {}
         self._previous_tensors: dict = previous_tensors
+        self._parent_tensors = list(parent_tensors) if parent_tensors is not None else None
         self._index = index
 
     def get_data_tensor(self):
@@ -76,6 +84,9 @@ class MakiTensor:
         list of MakiTensors
             MakiTensors that were used for creating current MakiTensor.
         """
+        if self._parent_tensors is not None:
+            return list(self._parent_tensors)
+
         parent_tensors = []
         for name in self._parent_tensor_names:
             parent_tensors += [self._previous_tensors[name]]
@@ -91,8 +102,41 @@ class MakiTensor:
         dict of MakiTensors
             All the MakiTensors that appear earlier in the computational graph.
             The dictionary contains pairs: { name of the tensor: MakiTensor }.
+            The tensors are ordered so that each tensor goes after all of its parents.
         """
-        return self._previous_tensors
+        if self._parent_tensors is None:
+            return self._previous_tensors
+
+        # The graph is walked iteratively (post-order DFS) since deep models
+        # would exceed the recursion limit.
+        previous_tensors = {}
+        visited = {self._name}
+        # Contains pairs [MakiTensor, index of the next parent to visit]
+        stack = [[self, 0]]
+        while len(stack) > 0:
+            tensor, i = stack[-1]
+            parents = tensor._parent_tensors
+            if parents is None:
+                # The tensor was created with an explicit dictionary of the previous tensors
+                stack.pop()
+                previous_tensors.update(tensor._previous_tensors)
+                if tensor is not self:
+                    previous_tensors.update(tensor.get_self_pair())
+                continue
+
+            if i < len(parents):
+                stack[-1][1] += 1
+                parent = parents[i]
+                if parent.get_name() not in visited:
+                    visited.add(parent.get_name())
+                    stack.append([parent, 0])
+                continue
+
+            stack.pop()
+            if tensor is not self:
+                previous_tensors.update(tensor.get_self_pair())
+
+        return previous_tensors
 
     def get_shape(self):
         return self._data_tensor.get_shape().as_list()
@@ -83,58 +83,16 @@ class MakiBuilder:
         # Collects all the created MakiTensors.
         # Contains pairs {makitensor_name: MakiTensor}.
         makitensors = {}
+        # The same MakiTensors, but the keys are the names from `graph_info`.
+        # They differ only for the custom InputLayer.
+        restored = {}
+        # If a custom InputLayer is passed, it probably has a different name.
+        # Contains pairs {old_name: new_name}. It is used instead of rewriting `graph_info`.
+        renamed = {}
         # Collects all the created layers.
         # Contains pairs {layer_name: MakiLayer}.
         layers = {}
 
-        def restore_makitensor(makitensor_name):
-            """
-            Restores the requested MakiTensor.
-            """
-            makitensor_info = graph_info[makitensor_name]
-
-            # Check if the makitensor was already created.
-            if makitensors.get(makitensor_name) is not None:
-                return makitensors[makitensor_name]
-
-            parent_makitensor_names = makitensor_info[MakiTensor.PARENT_TENSOR_NAMES]
-            # Check if we at the beginning of the graph. In this case we create InputLayer and return it.
-            if len(parent_makitensor_names) == 0:
-                layer = get_parent_layer(makitensor_info[MakiTensor.PARENT_LAYER_INFO], layer=input_layer)
-                # The input layer is a MakiTensor as well.
-                makitensors[layer.get_name()] = layer
-                return layer
-
-            parent_makitensors = []
-            for parent_makitensor_name in parent_makitensor_names:
-                # This call may modify `graph_info` if a custom InputLayer is passed.
-                parent_makitensors += [restore_makitensor(parent_makitensor_name)]
-
-            # If a custom InputLayer is passed, then it may have a different name. It this case
-            # we need to update parent tensors names. If no InputLayer is passed, the code below
-            # will change nothing.
-            parent_makitensor_names = makitensor_info[MakiTensor.PARENT_TENSOR_NAMES]
-
-            # If only one MakiTensor was used to create the current one,
-            # then the layer does not expect a list as input
-            if len(parent_makitensors) == 1:
-                parent_makitensors = parent_makitensors[0]
-
-            # Get the parent layer object and pass the parent makitensors through it.
-            parent_layer = get_parent_layer(makitensor_info[MakiTensor.PARENT_LAYER_INFO])
-            output_makitensors = parent_layer(parent_makitensors)
-
-            # The rest of the code expects `output_makitensors` to be a list.
-            if not isinstance(output_makitensors, list):
-                output_makitensors = [output_makitensors]
-
-            # Save the output makitensors to the dictionary.
-            output_makitensors_names = parent_layer.get_children(parent_makitensor_names[0])
-            for output_makitensor, output_makitensor_name in zip(output_makitensors, output_makitensors_names):
-                makitensors[output_makitensor_name] = output_makitensor
-
-            return makitensors[makitensor_name]
-
         def get_parent_layer(parent_layer_info, layer=None):
             """
             Builds the layer, saves to the `layers` dictionary and returns it or returns an already built layer.
@@ -155,34 +113,70 @@ class MakiBuilder:
 
             # This IF statement only for cases when a custom InputLayer is passed.
             if layer is not None:
-                # If a custom InputLayer is passed, it probably has a different name.
-                # Therefore, we need to change 'parent_tensor_names' list for each makitensor there is in the graph.
-                # P.S. If we don't do that we'll get an exception during graph restoration.
-                old_name = name
-                new_name = layer.get_name()
-                for makitensor_name in graph_info:
-                    mt_info = graph_info[makitensor_name]
-                    # Change tensor names
-                    new_parent_tensor_names = []
-                    for parent_t_name in mt_info[MakiTensor.PARENT_TENSOR_NAMES]:
-                        if parent_t_name == old_name:
-                            # Found the old InputLayer, change its name to the new one
-                            new_parent_tensor_names += [new_name]
-                            continue
-                        new_parent_tensor_names += [parent_t_name]
-                    # Update parent tensor names
-                    mt_info[MakiTensor.PARENT_TENSOR_NAMES] = new_parent_tensor_names
-
-                layers[new_name] = layer
-                name = new_name
+                renamed[name] = layer.get_name()
+                name = layer.get_name()
+                layers[name] = layer
 
             if layers.get(name) is None:
                 layers[name] = MakiBuilder.__layer_from_dict(parent_layer_info)
 
             return layers[name]
 
-        for name_output in outputs:
-            restore_makitensor(name_output)
+        def restore_makitensor(makitensor_name):
+            """
+            Restores the requested MakiTensor. All its parent MakiTensors must be already restored.
+            """
+            makitensor_info = graph_info[makitensor_name]
+            parent_makitensor_names = makitensor_info[MakiTensor.PARENT_TENSOR_NAMES]
+            # Check if we at the beginning of the graph. In this case we create InputLayer.
+            if len(parent_makitensor_names) == 0:
+                layer = get_parent_layer(makitensor_info[MakiTensor.PARENT_LAYER_INFO], layer=input_layer)
+                # The input layer is a MakiTensor as well.
+                makitensors[layer.get_name()] = layer
+                restored[makitensor_name] = layer
+                return
+
+            parent_makitensors = [restored[name] for name in parent_makitensor_names]
+            # If only one MakiTensor was used to create the current one,
+            # then the layer does not expect a list as input
+            if len(parent_makitensors) == 1:
+                parent_makitensors = parent_makitensors[0]
+
+            # Get the parent layer object and pass the parent makitensors through it.
+            parent_layer = get_parent_layer(makitensor_info[MakiTensor.PARENT_LAYER_INFO])
+            output_makitensors = parent_layer(parent_makitensors)
+
+            # The rest of the code expects `output_makitensors` to be a list.
+            if not isinstance(output_makitensors, list):
+                output_makitensors = [output_makitensors]
+
+            # Save the output makitensors to the dictionaries.
+            first_parent_name = renamed.get(parent_makitensor_names[0], parent_makitensor_names[0])
+            output_makitensors_names = parent_layer.get_children(first_parent_name)
+            for output_makitensor, output_makitensor_name in zip(output_makitensors, output_makitensors_names):
+                makitensors[output_makitensor_name] = output_makitensor
+                restored[output_makitensor_name] = output_makitensor
+
+        # Depth-first traversal with an explicit stack, so that the depth of the graph
+        # is not limited by the recursion limit. The MakiTensors are restored in the same
+        # order as the recursive traversal would do.
+        stack = list(reversed(outputs))
+        while len(stack) != 0:
+            makitensor_name = stack[-1]
+            if makitensor_name in restored:
+                stack.pop()
+                continue
+
+            not_restored = [
+                name for name in graph_info[makitensor_name][MakiTensor.PARENT_TENSOR_NAMES]
+                if name not in restored
+            ]
+            if len(not_restored) != 0:
+                stack += reversed(not_restored)
+                continue
+
+            stack.pop()
+            restore_makitensor(makitensor_name)
 
         return makitensors
 
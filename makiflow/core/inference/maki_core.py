@@ -18,6 +18,7 @@
 from abc import abstractmethod, ABC
 import tensorflow as tf
 import json
+from ..graph_entities import MakiLayer
 
 
 class MakiCore(ABC):
@@ -57,6 +58,11 @@ class MakiCore(ABC):
         self._outputs = outputs
         self._inputs = inputs
         self._session = None
+        # Savers and assign ops are cached, so repeated loads and saves do not grow the graph.
+        # Contains pairs { sorted variables names: tf.train.Saver }
+        self._savers = {}
+        # Contains pairs { var_name: (tf.placeholder, assign op) }
+        self._assign_ops = {}
 
         # Extracted output tf.Tensors
         self._output_data_tensors = []
@@ -115,7 +121,19 @@ class MakiCore(ABC):
         for key in self._named_dict_params:
             params += [self._named_dict_params[key]]
         init_op = tf.variables_initializer(params)
-        self._session.run(init_op)
+        # The initial values of the layers' parameters are not stored in the graph and must be fed
+        self._session.run(init_op, feed_dict=MakiLayer.get_init_feed_dict(params))
+        # The values now live in the session, keeping them in the registry would only waste memory
+        MakiLayer.release_init_fns(params)
+
+    def get_named_params(self):
+        """
+        Returns
+        -------
+        dict
+            Contains pairs { var_name: tf.Variable } with all the model's parameters.
+        """
+        return self._named_dict_params.copy()
 
     def get_session(self):
         assert self._session is not None, 'The session is not set.'
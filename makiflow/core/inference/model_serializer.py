@@ -18,6 +18,7 @@
 from .maki_core import MakiCore
 from ..graph_entities import MakiTensor
 from makiflow.core.debug import ExceptionScope
+import numpy as np
 import tensorflow as tf
 from abc import abstractmethod
 import json
@@ -27,10 +28,15 @@ class ModelSerializer(MakiCore):
     MODEL_INFO = 'model_info'
     GRAPH_INFO = 'graph_info'
 
+    NPZ_EXTENSION = '.npz'
+
     def load_weights(self, path, layer_names=None):
         """
         This function uses default TensorFlow's way for restoring models - checkpoint files.
         Example: '/home/student401/my_model/model.ckpt'
+        Weights can also be loaded from a .npz file (see `save_weights`). Its arrays are read lazily,
+        so only the requested layers' weights are read from the disk.
+        The restore ops are cached, so repeated calls do not add new nodes to the graph.
 
         Parameters
         ----------
@@ -39,21 +45,18 @@ class ModelSerializer(MakiCore):
             layer_names : list of str
                 Names of layer which weights need load from file into model
         """
-        vars_to_load = {}
-        if layer_names is not None:
-            for layer_name in layer_names:
-                layer = self._graph_tensors[layer_name].get_parent_layer()
-                vars_to_load.update(layer.get_params_dict())
+        vars_to_load = self._get_vars(layer_names)
+        if path.endswith(ModelSerializer.NPZ_EXTENSION):
+            self._load_npz(path, vars_to_load)
         else:
-            vars_to_load = self._named_dict_params
-        saver = tf.train.Saver(vars_to_load)
-        saver.restore(self._session, path)
+            self._get_saver(vars_to_load).restore(self._session, path)
         print('Weights are loaded.')
 
     def save_weights(self, path, layer_names=None):
         """
         This function uses default TensorFlow's way for saving models - checkpoint files.
         Example: '/home/student401/my_model/model.ckpt'
+        If the `path` ends with .npz, the weights are saved as a single uncompressed .npz file instead.
         Parameters
         ----------
             path : str
@@ -61,17 +64,49 @@ class ModelSerializer(MakiCore):
             layer_names : list of str
                 Names of layer which weights need save from model
         """
-        vars_to_save = {}
-        if layer_names is not None:
-            for layer_name in layer_names:
-                layer = self._graph_tensors[layer_name].get_parent_layer()
-                vars_to_save.update(layer.get_params_dict())
+        vars_to_save = self._get_vars(layer_names)
+        if path.endswith(ModelSerializer.NPZ_EXTENSION):
+            np.savez(path, **self._session.run(vars_to_save))
+            save_path = path
         else:
-            vars_to_save = self._named_dict_params
-        saver = tf.train.Saver(vars_to_save)
-        save_path = saver.save(self._session, path)
+            save_path = self._get_saver(vars_to_save).save(self._session, path)
         print(f'Weights are saved to {save_path}')
 
+    def _get_vars(self, layer_names):
+        if layer_names is None:
+            return self._named_dict_params
+
+        variables = {}
+        for layer_name in layer_names:
+            layer = self._graph_tensors[layer_name].get_parent_layer()
+            variables.update(layer.get_params_dict())
+        return variables
+
+    def _get_saver(self, variables):
+        key = tuple(sorted(variables.keys()))
+        saver = self._savers.get(key)
+        if saver is None:
+            saver = tf.train.Saver(variables)
+            self._savers[key] = saver
+        return saver
+
+    def _load_npz(self, path, variables):
+        # The assign ops are created once per variable and fed with the values from the file
+        assign_ops = []
+        feed_dict = {}
+        with np.load(path) as weights:
+            for var_name, variable in variables.items():
+                if var_name not in weights.files:
+                    raise KeyError(f'Could not find weights for variable={var_name} in {path}')
+
+                if var_name not in self._assign_ops:
+                    placeholder = tf.placeholder(variable.dtype.base_dtype, shape=variable.shape)
+                    self._assign_ops[var_name] = (placeholder, variable.assign(placeholder))
+                placeholder, assign_op = self._assign_ops[var_name]
+                assign_ops.append(assign_op)
+                feed_dict[placeholder] = weights[var_name]
+        self._session.run(assign_ops, feed_dict=feed_dict)
+
     def save_model_as_pb(self, path_to_save: str, file_name: str):
         """
         Save model (i. e. tensorflow graph) as pb (protobuf) file,
@@ -18,6 +18,8 @@
 from .athena import Athena
 from .hermes import Hermes
 from .tensorboard import TensorBoard
+from .feature_cache import FeatureCache
+from .checkpoint_manager import CheckpointManager
 from .loss_builder import Loss
 from .trainer_builder import TrainerBuilder
 from abc import ABC
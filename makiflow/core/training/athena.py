@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
+import json
 import tensorflow as tf
 from .utils import print_train_info, moving_average
 from .utils import new_optimizer_used, loss_is_built
@@ -22,7 +23,11 @@ from .core import TrainingCore
 from tqdm import tqdm
 from abc import abstractmethod
 from .hermes import Hermes
-from makiflow.core.training.utils import pack_data, IteratorCloser
+from .tensorboard import TensorBoard
+from makiflow.core.training.utils import pack_data, IteratorCloser, StepTimer
+from .prefetcher import FeedDictPrefetcher
+from .feature_cache import FeatureCache
+import time
 from ..inference import MakiModel
 
 
@@ -30,6 +35,9 @@ class Athena(TrainingCore):
     # Athena is the goddess of wisdom and intelligence.
     # This entity is responsible for training the model.
     TRAINING_LOSS = 'TRAINING_LOSS'
+    # Names of the tensors stored in the feature cache
+    FEATURE_FORM = 'feature_{0}'
+    LABEL_FORM = 'label_{0}'
 
     def __init__(self, model: MakiModel, train_inputs: list, label_tensors: dict = None):
         """
@@ -52,7 +60,27 @@ class Athena(TrainingCore):
         self._training_loss = None
         self._hermes = Hermes(model)
         self._optimizer = None
+        self._global_step = None
         self._grads_and_vars = None
+        # Train ops are cached, so the graph does not grow when the training is reconfigured.
+        # Contains pairs {(optimizer key, trainable vars key, n_micro_batches, global step id): cache entry}
+        self._train_op_cache = {}
+        self._train_op_key = None
+        # Contains pairs {trainable vars key: grads_and_vars}
+        self._grads_and_vars_cache = {}
+        # Trainable vars key of the gradients shown in the tensorboard
+        self._summarized_vars_key = None
+        # Gradient accumulation
+        self._n_micro_batches = 1
+        # Contains pairs {trainable vars key: list of the accumulators}
+        self._accumulators = {}
+        self._accumulate_op = None
+        self._micro_batch_counter = 0
+        # Multi-tower training
+        self._tower_label_tensors = None
+        self._tower_losses = None
+        # Contains pairs {loss_name: list of the tower losses}
+        self._tower_track_losses = {}
 
     def get_label_tensors(self):
         """
@@ -60,10 +88,23 @@ class Athena(TrainingCore):
         -------
         dict
             Contains pairs (tensor_name, tf.Tensor) of required tensors of labels.
+            In the multi-tower mode, while the loss of a tower is being built, the tensors
+            contain the tower's slice of the batch.
         """
         if self._label_tensors is None:
             self._label_tensors = self._setup_label_placeholders()
-        return self._label_tensors.copy()
+
+        tower_id = super().get_active_tower()
+        if tower_id is None:
+            return self._label_tensors.copy()
+
+        if self._tower_label_tensors is None:
+            n_towers = len(super().get_tower_devices())
+            with tf.name_scope('TowerLabels'):
+                self._tower_label_tensors = {
+                    name: tf.split(tensor, n_towers, axis=0) for name, tensor in self._label_tensors.items()
+                }
+        return {name: slices[tower_id] for name, slices in self._tower_label_tensors.items()}
 
     @abstractmethod
     def _setup_label_placeholders(self):
@@ -92,12 +133,33 @@ class Athena(TrainingCore):
         Builds the training loss and adds it to the track list.
         """
         # noinspection PyAttributeOutsideInit
-        loss = self._build_loss()
-        assert loss is not None, '_build_loss method returned None, but must return the loss scalar.'
-        self._training_loss = super()._build_final_loss(loss)
+        if super().get_tower_devices() is None:
+            loss = self._build_loss()
+            assert loss is not None, '_build_loss method returned None, but must return the loss scalar.'
+            self._training_loss = super()._build_final_loss(loss)
+        else:
+            self._training_loss = self.__build_tower_losses()
         self.track_loss(self._training_loss, Athena.TRAINING_LOSS)
         loss_is_built()
 
+    def __build_tower_losses(self):
+        # Builds the loss for each tower on its device. Returns the mean loss of the towers.
+        self._tower_losses = []
+        self._tower_track_losses = {}
+        for tower_id, device in enumerate(super().get_tower_devices()):
+            super().set_active_tower(tower_id)
+            with tf.device(device), tf.name_scope(f'Tower{tower_id}Loss'):
+                loss = self._build_loss()
+                assert loss is not None, '_build_loss method returned None, but must return the loss scalar.'
+                self._tower_losses.append(super()._build_final_loss(loss))
+        super().set_active_tower(None)
+
+        # The losses tracked by the towers are averaged as well
+        for loss_name, losses in self._tower_track_losses.items():
+            self.track_loss(tf.add_n(losses) / len(losses), loss_name)
+        self._tower_track_losses = {}
+        return tf.add_n(self._tower_losses) / len(self._tower_losses)
+
     @abstractmethod
     def _build_loss(self):
         # Must return the training loss scalar
@@ -116,6 +178,11 @@ class Athena(TrainingCore):
         loss_name : str
             Name of the loss.
         """
+        if super().get_active_tower() is not None:
+            # The tower losses are averaged after all the towers are built
+            self._tower_track_losses.setdefault(loss_name, []).append(loss_tensor)
+            return
+
         loss = self._track_losses.get(loss_name)
         if loss is not None:
             print(f'Overriding already existing {loss_name} loss tensor.')
@@ -126,20 +193,71 @@ class Athena(TrainingCore):
     def get_track_losses(self):
         return self._track_losses.copy()
 
+    def set_gradient_accumulation(self, n_micro_batches):
+        """
+        Enables gradient accumulation. The gradients are summed over `n_micro_batches` training iterations
+        in non-trainable accumulators and then applied once, averaged. It allows to train with the
+        effective batch size of `n_micro_batches` * batch size using the memory of a single batch.
+        Note that the `iter` argument of the fit methods counts micro-batches. If a fit call ends in the middle
+        of the accumulation, the accumulated gradients are applied during the next fit call.
+
+        Parameters
+        ----------
+        n_micro_batches : int
+            Number of micro-batches to accumulate the gradients over. Set it to 1 to disable the accumulation.
+        """
+        assert n_micro_batches >= 1, f'n_micro_batches must be positive, got {n_micro_batches}'
+        self._n_micro_batches = n_micro_batches
+        # The train op must be reselected
+        self._train_op_key = None
+
+    def set_optimizer(self, optimizer, global_step=None):
+        """
+        Creates (or takes from the cache) the train op for the `optimizer` without training.
+        Fit calls with the same `optimizer` and `global_step` continue with its current state. Can be used
+        to create the optimizer's variables before restoring them from a checkpoint.
+
+        Parameters
+        ----------
+        optimizer : TensorFlow optimizer or dict
+            See `fit`.
+        global_step
+            Please refer to TensorFlow documentation about the global step for more info.
+        """
+        self.__minimize_loss(optimizer, global_step)
+
+    def get_optimizer_variables(self):
+        """
+        Returns
+        -------
+        list
+            Variables of the current optimizer (slots) and the global step. Empty if no optimizer was used yet.
+        """
+        if self._optimizer is None:
+            return []
+
+        variables = self._optimizer.variables()
+        if self._global_step is not None:
+            variables.append(self._global_step)
+        return variables
+
     def fit(self, optimizer, epochs=1, iter=10, print_period=None, global_step=None):
         """
         Performs fitting of the model.
 
         Parameters
         ----------
-        optimizer : TensorFlow optimizer
-            Model uses TensorFlow optimizers in order train itself.
+        optimizer : TensorFlow optimizer or dict
+            Model uses TensorFlow optimizers in order train itself. It can also be an optimizer config
+            for `OptimizerBuilder`. The train ops are cached by the optimizer (or its config) and the set of
+            the trainable variables, so switching back to them does not grow the graph.
         epochs : int
             Number of epochs to run.
         iter : int
             Number of training iterations per update.
         print_period : int
             Every `print_period` training iterations the training info will be displayed.
+            It is also the default period of the summaries (see `Hermes.set_summary_periods`).
         global_step
             Please refer to TensorFlow documentation about the global step for more info.
         Returns
@@ -147,7 +265,7 @@ class Athena(TrainingCore):
         dict
             Dictionary with values of the tracked losses.
         """
-        train_op = self.__minimize_loss(optimizer, global_step)
+        self.__minimize_loss(optimizer, global_step)
 
         if print_period is None:
             print_period = iter
@@ -159,7 +277,7 @@ class Athena(TrainingCore):
 
         sess = super().get_session()
         track_losses = self.get_track_losses()
-        total_summary = self._hermes.get_total_summary()
+        timer = StepTimer(super().get_batch_size())
 
         # This context manager is used to prevent tqdm from breaking in case of exception
         with IteratorCloser() as ic:
@@ -172,28 +290,42 @@ class Athena(TrainingCore):
                 for loss_name in self.get_track_losses():
                     loss_holders[loss_name] = 0.0
 
+                # The data comes from the graph, so waiting for it is a part of session.run
+                timer.start_epoch()
                 # Performs training iterations
                 for j in it:
-                    tracked_losses_vals, summary, _ = sess.run(
-                        [track_losses, total_summary, train_op]
+                    timer.start_step()
+                    # Only the summaries that will be written on this iteration are evaluated
+                    summaries = self._hermes.get_scheduled_summaries(print_period)
+                    run_start = time.perf_counter()
+                    tracked_losses_vals, summaries_vals, _ = sess.run(
+                        [track_losses, summaries, self.__next_train_op()]
                     )
+                    timer.add_session_run(time.perf_counter() - run_start)
                     # Interpolate loss values and collect them
                     for loss_name in tracked_losses_vals:
                         loss_holders[loss_name] = moving_average(loss_holders[loss_name], tracked_losses_vals[loss_name], j)
                         loss_collectors[loss_name].append(loss_holders[loss_name])
 
                     self._hermes.increment()
+                    self._hermes.write_summaries(summaries_vals)
                     if (j + 1) % print_period == 0:
                         name_loss = list(loss_holders.items())
                         print_train_info(
                             i,
                             *name_loss
                         )
-                        self._hermes.write_summary(summary)
+                    timer.end_step()
+                    self.__write_timings(timer, print_period)
+
+                timer.print_epoch_report()
 
         return loss_collectors
 
-    def fit_generator(self, generator, optimizer, epochs=1, iter=10, print_period=None, global_step=None):
+    def fit_generator(
+            self, generator, optimizer, epochs=1, iter=10, print_period=None, global_step=None,
+            prefetch_size=None, prefetch_workers=1
+    ):
         """
         Performs fitting of the model.
 
@@ -201,22 +333,204 @@ class Athena(TrainingCore):
         ----------
         generator : python iterator
             Returns tuple of (data, labels). Data and labels can be tuples or lists themselves.
-        optimizer : TensorFlow optimizer
-            Model uses TensorFlow optimizers in order train itself.
+        optimizer : TensorFlow optimizer or dict
+            Model uses TensorFlow optimizers in order train itself. It can also be an optimizer config
+            for `OptimizerBuilder`. The train ops are cached by the optimizer (or its config) and the set of
+            the trainable variables, so switching back to them does not grow the graph.
         epochs : int
             Number of epochs to run.
         iter : int
             Number of training iterations per update.
         print_period : int
             Every `print_period` training iterations the training info will be displayed.
+            It is also the default period of the summaries (see `Hermes.set_summary_periods`).
         global_step
             Please refer to TensorFlow documentation about the global step for more info.
+        prefetch_size : int
+            If provided, feed dicts are prepared in background threads while the session runs the previous step.
+            This is the maximum number of the prepared feed dicts waiting in the queue.
+        prefetch_workers : int
+            Number of the background threads preparing the feed dicts. Used only if `prefetch_size` is provided.
+            Note that with several workers the order of the batches is not guaranteed.
         Returns
         -------
         dict
             Dictionary with values of the tracked losses.
         """
-        train_op = self.__minimize_loss(optimizer, global_step)
+        return self._fit_packed(
+            generator, self.get_pack_fn(), optimizer, epochs, iter, print_period, global_step,
+            prefetch_size, prefetch_workers
+        )
+
+    def cache_frozen_features(self, cache_dir, n_batches, generator=None):
+        """
+        Runs the frozen prefix of the training graph (see `get_frozen_boundary`) over the dataset once
+        and stores its output tensors along with the labels in a memory-mapped cache. Then the trainable head
+        can be trained from the cache via `fit_feature_cache` without recomputing the backbone on every epoch.
+        Makes sense only if the inputs are not augmented, otherwise the cached features are stale.
+        Must be called after the compilation.
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory to store the cache in.
+        n_batches : int
+            Number of batches to cache.
+        generator : python iterator
+            Returns tuple of (data, labels) as in `fit_generator`. If not provided, the data is taken
+            from the tf.data pipeline the trainer is built on.
+
+        Returns
+        -------
+        FeatureCache
+        """
+        assert super().is_compiled(), 'The model is not compiled.'
+        assert super().get_tower_devices() is None, 'Feature caching does not support the multi-tower training.'
+        assert self._checkpoint_layers is None and self._checkpoint_every_k is None, \
+            'Feature caching does not support gradient checkpointing.'
+
+        boundary = super().get_frozen_boundary()
+        print(f'Frozen boundary tensors: {boundary}')
+        fetches = {
+            Athena.FEATURE_FORM.format(name): super().get_traingraph_tensor(name) for name in boundary
+        }
+        # Fed placeholders are returned as is, so the labels from the generator are stored as well
+        for name, tensor in self.get_label_tensors().items():
+            fetches[Athena.LABEL_FORM.format(name)] = tensor
+
+        feed_dicts = None
+        if generator is not None:
+            pack = self.get_pack_fn()
+            feed_dicts = (pack(data) for data in generator)
+        return FeatureCache.create(cache_dir, super().get_session(), fetches, n_batches, feed_dicts)
+
+    def fit_feature_cache(
+            self, cache, optimizer, epochs=1, print_period=None, global_step=None, shuffle=True,
+            prefetch_size=None, prefetch_workers=1, batch_size=None
+    ):
+        """
+        Trains the trainable head of the model on the features stored via `cache_frozen_features`.
+        The cached tensors are fed instead of the frozen prefix, so the backbone is not run at all.
+        The trainable layers must be the same as the ones the cache was created with.
+
+        Parameters
+        ----------
+        cache : FeatureCache
+            The cache returned by `cache_frozen_features`.
+        optimizer : TensorFlow optimizer or dict
+            Model uses TensorFlow optimizers in order train itself. It can also be an optimizer config
+            for `OptimizerBuilder`. The train ops are cached by the optimizer (or its config) and the set of
+            the trainable variables, so switching back to them does not grow the graph.
+        epochs : int
+            Number of epochs to run. One epoch is a pass over the whole cache.
+        print_period : int
+            Every `print_period` training iterations the training info will be displayed.
+        global_step
+            Please refer to TensorFlow documentation about the global step for more info.
+        shuffle : bool
+            Set to True to shuffle the cached data points on each epoch.
+        prefetch_size : int
+            See `fit_generator`.
+        prefetch_workers : int
+            See `fit_generator`.
+        batch_size : int
+            Number of the cached data points in a batch. Required if the model's batch size is not defined.
+            By default equal to the model's batch size.
+        Returns
+        -------
+        dict
+            Dictionary with values of the tracked losses.
+        """
+        label_tensors = self.get_label_tensors()
+        name2tensor = {}
+        for name in cache.get_names():
+            if name.startswith(Athena.LABEL_FORM.format('')):
+                name2tensor[name] = label_tensors[name[len(Athena.LABEL_FORM.format('')):]]
+            else:
+                name2tensor[name] = super().get_traingraph_tensor(name[len(Athena.FEATURE_FORM.format('')):])
+
+        return self.fit_cache(
+            cache, name2tensor, optimizer, epochs, print_period, global_step, shuffle,
+            prefetch_size, prefetch_workers, batch_size
+        )
+
+    def fit_cache(
+            self, cache, name2tensor, optimizer, epochs=1, print_period=None, global_step=None, shuffle=True,
+            prefetch_size=None, prefetch_workers=1, batch_size=None
+    ):
+        """
+        Trains the model on the data stored in a FeatureCache. The cached arrays are fed into the given tensors.
+        It is the training cycle of `fit_feature_cache`, it is also used by the trainer decorators
+        that store their own data in the cache (see Distillator).
+
+        Parameters
+        ----------
+        cache : FeatureCache
+            The cache to train on.
+        name2tensor : dict
+            Contains pairs {cached name: tf.Tensor to feed the cached values into}. The cached names that
+            are not in the dictionary are not fed.
+        optimizer : TensorFlow optimizer or dict
+            See `fit_generator`.
+        epochs : int
+            Number of epochs to run. One epoch is a pass over the whole cache.
+        print_period : int
+            Every `print_period` training iterations the training info will be displayed.
+        global_step
+            Please refer to TensorFlow documentation about the global step for more info.
+        shuffle : bool
+            Set to True to shuffle the cached data points on each epoch.
+        prefetch_size : int
+            See `fit_generator`.
+        prefetch_workers : int
+            See `fit_generator`.
+        batch_size : int
+            See `fit_feature_cache`.
+        Returns
+        -------
+        dict
+            Dictionary with values of the tracked losses.
+        """
+        if batch_size is None:
+            batch_size = super().get_batch_size()
+        assert batch_size is not None, 'The model has no static batch size, please provide the `batch_size`.'
+
+        def pack(batch):
+            return {name2tensor[name]: value for name, value in batch.items() if name in name2tensor}
+
+        return self._fit_packed(
+            cache.batch_generator(batch_size, shuffle=shuffle), pack, optimizer, epochs,
+            cache.get_n_samples() // batch_size, print_period, global_step, prefetch_size, prefetch_workers,
+            batch_size
+        )
+
+    def get_pack_fn(self):
+        """
+        Returns
+        -------
+        function
+            Turns the (data, labels) tuple returned by the generator in `fit_generator` into a feed dict.
+        """
+        input_feed_dict = self.get_input_feed_dict_config()
+        label_feed_dict = self.get_label_feed_dict_config()
+
+        def pack(data):
+            input_data, labels = data
+            packed_data = pack_data(input_feed_dict, input_data)
+            packed_labels = pack_data(label_feed_dict, labels)
+            packed_data.update(packed_labels)
+            return packed_data
+
+        return pack
+
+    def _fit_packed(
+            self, generator, pack, optimizer, epochs, iter, print_period, global_step, prefetch_size, prefetch_workers,
+            batch_size=None
+    ):
+        # The training cycle of `fit_generator`. `pack` turns the outputs of the `generator` into feed dicts.
+        # It is also used by the trainer decorators that feed the data in their own way (see Distillator).
+        # `batch_size` is the number of examples in the fed batches, by default equal to the model's batch size.
+        self.__minimize_loss(optimizer, global_step)
 
         if print_period is None:
             print_period = iter
@@ -228,74 +542,227 @@ class Athena(TrainingCore):
 
         sess = super().get_session()
         track_losses = self.get_track_losses()
-        total_summary = self._hermes.get_total_summary()
-        input_feed_dict = self.get_input_feed_dict_config()
-        label_feed_dict = self.get_label_feed_dict_config()
-
-        # This context manager is used to prevent tqdm from breaking in case of exception
-        with IteratorCloser() as ic:
-            for i in range(epochs):
-                it = tqdm(range(iter))
-                ic.set_iterator(it)
-
-                # Loss value holders. They will hold an interpolated loss value for one iteration.
-                # This loss value will then be passed to an appropriate loss value collector.
-                loss_holders = {}
-                for loss_name in self.get_track_losses():
-                    loss_holders[loss_name] = 0.0
-
-                # Performs training iterations
-                for j in it:
-                    input_data, labels = next(generator)
-                    packed_data = pack_data(input_feed_dict, input_data)
-                    packed_labels = pack_data(label_feed_dict, labels)
-                    packed_data.update(packed_labels)
-                    tracked_losses_vals, summary, _ = sess.run(
-                        [track_losses, total_summary, train_op],
-                        feed_dict=packed_data
-                    )
-                    # Interpolate loss values and collect them
-                    for loss_name in tracked_losses_vals:
-                        loss_holders[loss_name] = moving_average(loss_holders[loss_name], tracked_losses_vals[loss_name], j)
-                        loss_collectors[loss_name].append(loss_holders[loss_name])
-
-                    self._hermes.increment()
-                    if (j + 1) % print_period == 0:
-                        name_loss = list(loss_holders.items())
-                        print_train_info(
-                            i,
-                            *name_loss
+        if batch_size is None:
+            batch_size = super().get_batch_size()
+        timer = StepTimer(batch_size)
+
+        prefetcher = None
+        if prefetch_size is not None:
+            # The workers must not pull more batches from the generator than the training cycle consumes
+            prefetcher = FeedDictPrefetcher(
+                generator, pack, buffer_size=prefetch_size, n_workers=prefetch_workers, max_items=epochs * iter
+            )
+            prefetcher.start()
+
+        try:
+            # This context manager is used to prevent tqdm from breaking in case of exception
+            with IteratorCloser() as ic:
+                for i in range(epochs):
+                    it = tqdm(range(iter))
+                    ic.set_iterator(it)
+
+                    # Loss value holders. They will hold an interpolated loss value for one iteration.
+                    # This loss value will then be passed to an appropriate loss value collector.
+                    loss_holders = {}
+                    for loss_name in self.get_track_losses():
+                        loss_holders[loss_name] = 0.0
+
+                    timer.start_epoch()
+                    # Performs training iterations
+                    for j in it:
+                        timer.start_step()
+                        if prefetcher is not None:
+                            packed_data = prefetcher.get()
+                            timer.add_data_wait(prefetcher.pop_wait_time())
+                        else:
+                            wait_start = time.perf_counter()
+                            packed_data = pack(next(generator))
+                            timer.add_data_wait(time.perf_counter() - wait_start)
+                        # Only the summaries that will be written on this iteration are evaluated
+                        summaries = self._hermes.get_scheduled_summaries(print_period)
+                        run_start = time.perf_counter()
+                        tracked_losses_vals, summaries_vals, _ = sess.run(
+                            [track_losses, summaries, self.__next_train_op()],
+                            feed_dict=packed_data
                         )
-                        self._hermes.write_summary(summary)
+                        timer.add_session_run(time.perf_counter() - run_start)
+                        # Interpolate loss values and collect them
+                        for loss_name in tracked_losses_vals:
+                            loss_holders[loss_name] = moving_average(loss_holders[loss_name], tracked_losses_vals[loss_name], j)
+                            loss_collectors[loss_name].append(loss_holders[loss_name])
+
+                        self._hermes.increment()
+                        self._hermes.write_summaries(summaries_vals)
+                        if (j + 1) % print_period == 0:
+                            name_loss = list(loss_holders.items())
+                            print_train_info(
+                                i,
+                                *name_loss
+                            )
+                        timer.end_step()
+                        self.__write_timings(timer, print_period)
+
+                    timer.print_epoch_report()
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
 
         return loss_collectors
 
+    def __write_timings(self, timer, print_period):
+        # The timings are written along with the scalar summaries, averaged over the steps in between
+        if self._hermes.is_scheduled(TensorBoard.SCALAR, print_period):
+            self._hermes.write_scalar_values(timer.pop_window_values())
+
     def __minimize_loss(self, optimizer, global_step):
         assert optimizer is not None, 'No optimizer is provided.'
         assert super().is_compiled(), 'The model is not compiled.'
 
-        if self._optimizer != optimizer:
-            self.__create_train_op(optimizer, global_step)
-
+        if isinstance(optimizer, dict):
+            # The optimizers built from the same config are interchangeable
+            optimizer_key = json.dumps(optimizer, sort_keys=True)
+        else:
+            # The cache entry holds a reference to the optimizer, so its id can't be reused
+            optimizer_key = id(optimizer)
+        vars_key = tuple([var.name for var in super().get_trainable_params()])
+        key = (optimizer_key, vars_key, self._n_micro_batches, id(global_step))
+        if key == self._train_op_key:
+            return self._train_op
+
+        entry = self._train_op_cache.get(key)
+        if entry is None:
+            if isinstance(optimizer, dict):
+                # Imported here since the trainers package depends on the core
+                from makiflow.trainers.utils.optimizer_builder import OptimizerBuilder
+                optimizer, built_global_step = OptimizerBuilder.build_optimizer(optimizer)
+                if global_step is None and built_global_step is not None:
+                    global_step = built_global_step
+                    # The global step is initialized only once, so the schedule is not restarted on the reuse
+                    self.get_session().run(tf.variables_initializer([global_step]))
+            entry = self.__create_train_op(optimizer, global_step, vars_key)
+            self._train_op_cache[key] = entry
+            new_optimizer_used()
+        else:
+            print('Cached train op is used.')
+
+        self._optimizer, self._train_op, self._accumulate_op, reset_op, self._global_step = entry
+        self._train_op_key = key
+        self._grads_and_vars = self._grads_and_vars_cache[vars_key]
+        if vars_key != self._summarized_vars_key:
+            # The gradients histograms must show the currently trained variables.
+            # The histograms and merged summaries of the cached gradients are reused, no new ops are created.
+            self._hermes.set_vars_grads([(var, grad) for grad, var in self._grads_and_vars])
+            self._hermes.setup_tensorboard()
+            self._summarized_vars_key = vars_key
+        # The slots (and the accumulators) are reinitialized in place, no new ops are created
+        self.get_session().run(reset_op)
+        self._micro_batch_counter = 0
         return self._train_op
 
-    def __create_train_op(self, optimizer, global_step):
-        self._optimizer = optimizer
-
-        if self._grads_and_vars is None:
+    def __create_train_op(self, optimizer, global_step, vars_key):
+        """
+        Returns
+        -------
+        tuple
+            (optimizer, train op, accumulate op or None, op that reinitializes the optimizer's variables, global step).
+        """
+        grads_and_vars = self._grads_and_vars_cache.get(vars_key)
+        if grads_and_vars is None:
             training_vars = super().get_trainable_params()
             # Returns list of tuples: [ (grad, var) ]
-            self._grads_and_vars = optimizer.compute_gradients(self._training_loss, training_vars)
-            vars_and_grads = [(var, grad) for grad, var in self._grads_and_vars]
-            self._hermes.set_vars_grads(vars_and_grads)
-            self._hermes.setup_tensorboard()
-
-        self._train_op = optimizer.apply_gradients(
-            grads_and_vars=self._grads_and_vars, global_step=global_step
-        )
-
-        self.get_session().run(tf.variables_initializer(optimizer.variables()))
-        new_optimizer_used()
+            if super().get_tower_devices() is None:
+                grads_and_vars = optimizer.compute_gradients(self._training_loss, training_vars)
+            else:
+                grads_and_vars = self.__compute_tower_gradients(optimizer, training_vars)
+            super()._check_checkpointed_gradients(grads_and_vars)
+            self._grads_and_vars_cache[vars_key] = grads_and_vars
+        self._grads_and_vars = grads_and_vars
+
+        reset_vars = []
+        if self._n_micro_batches == 1:
+            train_op = optimizer.apply_gradients(
+                grads_and_vars=grads_and_vars, global_step=global_step
+            )
+            accumulate_op = None
+        else:
+            accumulate_op, train_op = self.__build_accumulation_ops(optimizer, global_step, vars_key)
+            reset_vars += self._accumulators[vars_key]
+
+        reset_vars += optimizer.variables()
+        return optimizer, train_op, accumulate_op, tf.variables_initializer(reset_vars), global_step
+
+    def __compute_tower_gradients(self, optimizer, training_vars):
+        # Computes the gradients of each tower on its device and averages them
+        towers_grads_and_vars = []
+        for device, loss in zip(super().get_tower_devices(), self._tower_losses):
+            with tf.device(device):
+                towers_grads_and_vars.append(
+                    optimizer.compute_gradients(loss, training_vars, colocate_gradients_with_ops=True)
+                )
+
+        grads_and_vars = []
+        with tf.name_scope('TowerGradientsAveraging'):
+            for i, var in enumerate(training_vars):
+                grads = [
+                    tf.convert_to_tensor(tower_grads_and_vars[i][0])
+                    for tower_grads_and_vars in towers_grads_and_vars
+                    if tower_grads_and_vars[i][0] is not None
+                ]
+                if len(grads) == 0:
+                    grads_and_vars.append((None, var))
+                    continue
+                grads_and_vars.append((tf.add_n(grads) / len(grads), var))
+        return grads_and_vars
+
+    def __build_accumulation_ops(self, optimizer, global_step, vars_key):
+        """
+        Returns
+        -------
+        tf.Operation
+            Adds the gradients of the current micro-batch to the accumulators.
+        tf.Operation
+            Adds the gradients of the current micro-batch to the accumulators, applies the averaged
+            accumulated gradients and zeroes the accumulators.
+        """
+        grads_and_vars = [(grad, var) for grad, var in self._grads_and_vars if grad is not None]
+        accumulators = self._accumulators.get(vars_key)
+        if accumulators is None:
+            with tf.name_scope('GradientAccumulation'):
+                accumulators = [
+                    tf.Variable(tf.zeros(var.shape, dtype=var.dtype.base_dtype), trainable=False)
+                    for _, var in grads_and_vars
+                ]
+            self._accumulators[vars_key] = accumulators
+
+        accumulate_op = tf.group(*[
+            # Sparse gradients (of embeddings for example) are converted to dense ones
+            accumulator.assign_add(tf.convert_to_tensor(grad))
+            for accumulator, (grad, _) in zip(accumulators, grads_and_vars)
+        ])
+
+        # `read_value` creates a new read op, so it respects the control dependencies
+        with tf.control_dependencies([accumulate_op]):
+            mean_grads_and_vars = [
+                (accumulator.read_value() / self._n_micro_batches, var)
+                for accumulator, (_, var) in zip(accumulators, grads_and_vars)
+            ]
+            apply_op = optimizer.apply_gradients(grads_and_vars=mean_grads_and_vars, global_step=global_step)
+
+        with tf.control_dependencies([apply_op]):
+            reset_op = tf.group(*[
+                accumulator.assign(tf.zeros_like(accumulator)) for accumulator in accumulators
+            ])
+        return accumulate_op, reset_op
+
+    def __next_train_op(self):
+        # Returns the op to run on the current training iteration
+        if self._accumulate_op is None:
+            return self._train_op
+
+        self._micro_batch_counter += 1
+        if self._micro_batch_counter % self._n_micro_batches == 0:
+            return self._train_op
+        return self._accumulate_op
 
     def get_input_feed_dict_config(self):
         """
@@ -0,0 +1,285 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import glob
+import json
+import os
+from queue import Queue
+from threading import Thread
+
+import tensorflow as tf
+
+
+class CheckpointManager:
+    CKPT_FORM = 'ckpt-{0}'
+    STATE_FILE = 'checkpoints.json'
+
+    # State fields
+    CHECKPOINTS = 'checkpoints'
+    PATH = 'path'
+    STEP = 'step'
+    METRIC = 'metric'
+    COUNTER = 'counter'
+
+    MODE_MIN = 'min'
+    MODE_MAX = 'max'
+
+    # Used to stop the writer thread
+    _END = object()
+
+    def __init__(self, trainer, save_dir, max_to_keep=5, keep_best=0, mode=MODE_MIN):
+        """
+        Saves the model's weights, the optimizer's variables and the Hermes step counter without blocking
+        the training for long: the variables are copied to the host memory and written to the disk in
+        a background thread. The checkpoints are written by a single Saver that lives in a separate
+        CPU-only graph, so the training graph does not grow with the number of saves.
+        The checkpoints are usual TensorFlow checkpoints, the model can be restored via `load_weights`.
+
+        Parameters
+        ----------
+        trainer : Athena
+            The trainer which model and optimizer are saved.
+        save_dir : str
+            Directory to save the checkpoints to.
+        max_to_keep : int
+            Number of the latest checkpoints to keep.
+        keep_best : int
+            Number of the best (by the metric passed to `save`) checkpoints to keep additionally.
+        mode : str
+            CheckpointManager.MODE_MIN if the lower metric is better, CheckpointManager.MODE_MAX otherwise.
+        """
+        assert max_to_keep >= 1, f'max_to_keep must be positive, got {max_to_keep}'
+        assert keep_best >= 0, f'keep_best must be non-negative, got {keep_best}'
+        assert mode in (CheckpointManager.MODE_MIN, CheckpointManager.MODE_MAX), f'Unknown mode: {mode}'
+        self._trainer = trainer
+        self._save_dir = save_dir
+        self._max_to_keep = max_to_keep
+        self._keep_best = keep_best
+        self._mode = mode
+        os.makedirs(save_dir, exist_ok=True)
+
+        self._checkpoints = []
+        state_path = os.path.join(save_dir, CheckpointManager.STATE_FILE)
+        if os.path.isfile(state_path):
+            with open(state_path) as f:
+                self._checkpoints = json.load(f)[CheckpointManager.CHECKPOINTS]
+
+        # Contains pairs { sorted variables names: tf.train.Saver } used for the restoring
+        self._restore_savers = {}
+        # Writer graph entities
+        self._writer_graph = None
+        self._writer_session = None
+        self._writer_placeholders = None
+        self._writer_assign_op = None
+        self._writer_saver = None
+
+        # Holds at most one snapshot, so a slow disk does not make the snapshots pile up in memory
+        self._queue = Queue(maxsize=1)
+        self._error = None
+        self._thread = Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def _collect_variables(self):
+        # Contains pairs { checkpoint name: tf.Variable }
+        variables = self._trainer.get_model().get_named_params()
+        for variable in self._trainer.get_optimizer_variables():
+            variables[variable.op.name] = variable
+        return variables
+
+    def save(self, step, metric=None):
+        """
+        Copies the variables' values and schedules writing them to the disk. Returns right after the copy.
+
+        Parameters
+        ----------
+        step : int
+            Number of the checkpoint (epoch, iteration etc). Used in the checkpoint's name.
+        metric : float
+            Value of the metric used to pick the best checkpoints. Required if `keep_best` > 0.
+
+        Returns
+        -------
+        str
+            Path of the checkpoint, once it is written.
+        """
+        self._raise_error()
+        assert self._keep_best == 0 or metric is not None, 'The metric must be provided to keep the best checkpoints.'
+        variables = self._collect_variables()
+        values = self._trainer.get_session().run(variables)
+        path = os.path.join(self._save_dir, CheckpointManager.CKPT_FORM.format(step))
+        info = {
+            CheckpointManager.PATH: path,
+            CheckpointManager.STEP: step,
+            CheckpointManager.METRIC: None if metric is None else float(metric),
+            CheckpointManager.COUNTER: self._trainer.get_hermes().get_counter()
+        }
+        self._queue.put((values, info))
+        return path
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is CheckpointManager._END:
+                self._queue.task_done()
+                return
+
+            try:
+                self._write(*item)
+            except Exception as ex:
+                # The exception will be re-raised in the main thread
+                self._error = ex
+            self._queue.task_done()
+
+    def _write(self, values, info):
+        if self._writer_placeholders is None or set(values) != set(self._writer_placeholders):
+            self._build_writer(values)
+
+        feed_dict = {self._writer_placeholders[name]: value for name, value in values.items()}
+        self._writer_session.run(self._writer_assign_op, feed_dict=feed_dict)
+        self._writer_saver.save(self._writer_session, info[CheckpointManager.PATH], write_meta_graph=False)
+
+        self._checkpoints = [
+            ckpt for ckpt in self._checkpoints if ckpt[CheckpointManager.PATH] != info[CheckpointManager.PATH]
+        ]
+        self._checkpoints.append(info)
+        self._apply_retention()
+        print(f'Checkpoint is saved to {info[CheckpointManager.PATH]}')
+
+    def _build_writer(self, values):
+        if self._writer_session is not None:
+            self._writer_session.close()
+
+        self._writer_graph = tf.Graph()
+        with self._writer_graph.as_default():
+            self._writer_placeholders = {}
+            variables = {}
+            for name, value in values.items():
+                self._writer_placeholders[name] = tf.placeholder(value.dtype, shape=value.shape)
+                variables[name] = tf.Variable(tf.zeros(value.shape, dtype=value.dtype))
+            self._writer_assign_op = tf.group(*[
+                variables[name].assign(self._writer_placeholders[name]) for name in variables
+            ])
+            # The retention is managed by the CheckpointManager
+            self._writer_saver = tf.train.Saver(variables, max_to_keep=None)
+            init_op = tf.variables_initializer(list(variables.values()))
+        self._writer_graph.finalize()
+
+        # The writer graph must not take the GPU memory
+        self._writer_session = tf.Session(
+            graph=self._writer_graph, config=tf.ConfigProto(device_count={'GPU': 0})
+        )
+        self._writer_session.run(init_op)
+
+    def _apply_retention(self):
+        keep = set([ckpt[CheckpointManager.PATH] for ckpt in self._checkpoints[-self._max_to_keep:]])
+        if self._keep_best > 0:
+            rated = [ckpt for ckpt in self._checkpoints if ckpt[CheckpointManager.METRIC] is not None]
+            rated.sort(
+                key=lambda ckpt: ckpt[CheckpointManager.METRIC], reverse=self._mode == CheckpointManager.MODE_MAX
+            )
+            keep.update([ckpt[CheckpointManager.PATH] for ckpt in rated[:self._keep_best]])
+
+        for ckpt in self._checkpoints:
+            if ckpt[CheckpointManager.PATH] not in keep:
+                for file in glob.glob(ckpt[CheckpointManager.PATH] + '.*'):
+                    os.remove(file)
+        self._checkpoints = [ckpt for ckpt in self._checkpoints if ckpt[CheckpointManager.PATH] in keep]
+
+        state_path = os.path.join(self._save_dir, CheckpointManager.STATE_FILE)
+        with open(state_path + '.tmp', 'w') as f:
+            json.dump({CheckpointManager.CHECKPOINTS: self._checkpoints}, f, indent=1)
+        os.replace(state_path + '.tmp', state_path)
+
+    def _raise_error(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def wait(self):
+        """
+        Blocks until all the scheduled checkpoints are written.
+        """
+        self._queue.join()
+        self._raise_error()
+
+    def get_checkpoints(self):
+        """
+        Returns
+        -------
+        list
+            Info of the kept checkpoints, from the oldest to the latest.
+        """
+        self.wait()
+        return [ckpt.copy() for ckpt in self._checkpoints]
+
+    def get_best_checkpoint(self):
+        """
+        Returns
+        -------
+        str
+            Path of the checkpoint with the best metric. None if no checkpoint has the metric.
+        """
+        rated = [ckpt for ckpt in self.get_checkpoints() if ckpt[CheckpointManager.METRIC] is not None]
+        if len(rated) == 0:
+            return None
+        pick = max if self._mode == CheckpointManager.MODE_MAX else min
+        return pick(rated, key=lambda ckpt: ckpt[CheckpointManager.METRIC])[CheckpointManager.PATH]
+
+    def restore(self, path=None):
+        """
+        Restores the model's weights, the optimizer's variables and the Hermes step counter.
+        To restore the optimizer's variables, the optimizer must be passed to the trainer beforehand,
+        see `Athena.set_optimizer`. Otherwise only the model's weights are restored.
+
+        Parameters
+        ----------
+        path : str
+            Path of the checkpoint. If not provided, the latest checkpoint is restored.
+        """
+        checkpoints = self.get_checkpoints()
+        if path is None:
+            assert len(checkpoints) > 0, f'There are no checkpoints in {self._save_dir}'
+            path = checkpoints[-1][CheckpointManager.PATH]
+
+        # Checkpoints saved before the optimizer was used do not have its variables
+        saved_names = set([name for name, _ in tf.train.list_variables(path)])
+        variables = {
+            name: variable for name, variable in self._collect_variables().items() if name in saved_names
+        }
+        key = tuple(sorted(variables.keys()))
+        saver = self._restore_savers.get(key)
+        if saver is None:
+            saver = tf.train.Saver(variables)
+            self._restore_savers[key] = saver
+        saver.restore(self._trainer.get_session(), path)
+
+        for ckpt in checkpoints:
+            if ckpt[CheckpointManager.PATH] == path:
+                self._trainer.get_hermes().set_counter(ckpt[CheckpointManager.COUNTER])
+        print(f'Checkpoint {path} is restored.')
+
+    def close(self):
+        """
+        Waits for the scheduled checkpoints and stops the writer thread.
+        """
+        self._queue.put(CheckpointManager._END)
+        self._thread.join()
+        if self._writer_session is not None:
+            self._writer_session.close()
+            self._writer_session = None
+        self._raise_error()
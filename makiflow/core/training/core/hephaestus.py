@@ -15,7 +15,8 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
-from makiflow.core.graph_entities import MakiTensor, MakiRestorable
+import tensorflow as tf
+from makiflow.core.graph_entities import MakiTensor, MakiRestorable, FrozenStats
 from makiflow.core.inference.maki_core import MakiCore
 
 
@@ -89,6 +90,96 @@ class Hephaestus:
         # Setup external loss
         self._uses_external_loss = False
 
+        # Setup multi-tower training
+        self._tower_devices = None
+        # Contains dictionaries {MakiTensor name: tf.Tensor} of each tower
+        self._towers_traingraph_tensors = []
+        self._active_tower = None
+
+        # Setup gradient checkpointing
+        self._checkpoint_layers = None
+        self._checkpoint_every_k = None
+        # Names of the parameters used inside the checkpointed segments
+        self._checkpointed_params = set()
+
+    def set_gradient_checkpointing(self, layer_names=None, every_k=None):
+        """
+        Enables gradient checkpointing (activation recomputation). The training graph is split into segments
+        by the checkpoint tensors. Only the checkpoints are kept in memory after the forward pass, the activations
+        inside the segments are recomputed during the backward pass. With checkpoints every ~sqrt(n) layers
+        the peak memory drops roughly to sqrt of the depth at the cost of one extra forward pass.
+        Must be called before the compilation.
+        WARNING! Layers inside the segments are run twice, therefore, the running statistics
+        of the normalization layers are updated twice per iteration.
+
+        Parameters
+        ----------
+        layer_names : list
+            Names of the layers which outputs are the checkpoints.
+        every_k : int
+            If provided, the output of every k-th layer (in topological order) is a checkpoint.
+            Can't be used along with `layer_names`.
+        """
+        assert not self._is_compiled, 'Gradient checkpointing must be set before the compilation.'
+        assert (layer_names is None) != (every_k is None), 'Exactly one of layer_names and every_k must be provided.'
+        assert every_k is None or every_k > 0, f'every_k must be positive, got {every_k}'
+        self._checkpoint_layers = None if layer_names is None else set(layer_names)
+        self._checkpoint_every_k = every_k
+
+    def set_towers(self, devices):
+        """
+        Enables the data-parallel multi-tower mode. The training graph is replicated on each of the `devices`,
+        the replicas (towers) share the variables and each of them processes its own slice of the batch.
+        The gradients of the towers are averaged before being applied.
+        Must be called before the compilation.
+        Tip: several logical CPU devices can be exposed on one machine by creating the session
+        with tf.ConfigProto(device_count={'CPU': n_devices}).
+
+        Parameters
+        ----------
+        devices : list
+            List of the device names, for example: ['/cpu:0', '/cpu:1'].
+            The batch size must be divisible by the number of the devices.
+        """
+        assert not self._is_compiled, 'The towers must be set before the compilation.'
+        batch_size = self.get_batch_size()
+        assert batch_size is None or batch_size % len(devices) == 0, \
+            f'Batch size {batch_size} is not divisible by the number of the towers {len(devices)}.'
+        self._tower_devices = list(devices)
+
+    def get_tower_devices(self):
+        """
+        Returns
+        -------
+        list
+            Devices of the towers or None if the multi-tower mode is not used.
+        """
+        if self._tower_devices is None:
+            return None
+        return self._tower_devices.copy()
+
+    def set_active_tower(self, tower_id):
+        """
+        Sets the tower which tensors are returned by `get_traingraph_tensor`. It is used during building
+        the loss for each of the towers.
+
+        Parameters
+        ----------
+        tower_id : int
+            Index of the tower. If None, the tensors of the first tower are returned, except for the input tensors
+            which are the full-batch ones.
+        """
+        self._active_tower = tower_id
+        if tower_id is None:
+            self._traingraph_tensors = self._towers_traingraph_tensors[0].copy()
+            for name, train_input in self._train_inputs.items():
+                self._traingraph_tensors[name] = train_input.get_data_tensor()
+        else:
+            self._traingraph_tensors = self._towers_traingraph_tensors[tower_id]
+
+    def get_active_tower(self):
+        return self._active_tower
+
     def set_layers_trainable(self, layers):
         """
         Parameters
@@ -118,6 +209,45 @@ class Hephaestus:
     def get_trainable_params(self):
         return self._trainable_vars
 
+    def get_frozen_boundary(self):
+        """
+        Finds the frozen prefix of the graph: the tensors that depend only on the inputs
+        and the untrainable layers. Such tensors are the same on every epoch unless the inputs change.
+
+        Returns
+        -------
+        list
+            Names of the frozen MakiTensors that are consumed by the trainable part of the graph
+            or are the model's outputs. Values of these tensors are all that the trainable part needs.
+        """
+        # Collect all the MakiTensors in topological order
+        ordered = {}
+        for output in self._model.get_outputs():
+            ordered.update(output.get_previous_tensors())
+            ordered.update(output.get_self_pair())
+
+        frozen = set()
+        boundary = []
+        for name, maki_tensor in ordered.items():
+            parent_names = maki_tensor.get_parent_tensor_names()
+            if len(parent_names) == 0:
+                frozen.add(name)
+                continue
+
+            layer = maki_tensor.get_parent_layer()
+            if layer.get_name() not in self._trainable_layers and all([p in frozen for p in parent_names]):
+                frozen.add(name)
+                continue
+
+            for parent_name in parent_names:
+                if parent_name in frozen and parent_name not in boundary:
+                    boundary.append(parent_name)
+
+        for output in self._model.get_outputs():
+            if output.get_name() in frozen and output.get_name() not in boundary:
+                boundary.append(output.get_name())
+        return boundary
+
     # noinspection PyAttributeOutsideInit
     def add_loss(self, loss):
         """
@@ -139,6 +269,46 @@ class Hephaestus:
         return training_loss
 
     def compile_training_graph(self):
+        train_inputs = {}
+        for name, train_input in self._train_inputs.items():
+            train_inputs[name] = train_input.get_data_tensor()
+
+        if self._tower_devices is None:
+            self._traingraph_tensors = self._build_training_graph(train_inputs)
+            self._is_compiled = True
+            return
+
+        n_towers = len(self._tower_devices)
+        # Each tower gets its own slice of the batch
+        with tf.name_scope('TowerInputs'):
+            input_slices = {name: tf.split(x, n_towers, axis=0) for name, x in train_inputs.items()}
+
+        self._towers_traingraph_tensors = []
+        for tower_id, device in enumerate(self._tower_devices):
+            tower_inputs = {name: slices[tower_id] for name, slices in input_slices.items()}
+            with tf.device(device), tf.name_scope(f'Tower{tower_id}'):
+                self._towers_traingraph_tensors.append(self._build_training_graph(tower_inputs))
+
+        self.set_active_tower(None)
+        self._is_compiled = True
+
+    def _build_training_graph(self, train_inputs):
+        """
+        Builds one replica of the training graph.
+
+        Parameters
+        ----------
+        train_inputs : dict
+            Contains pairs {input MakiTensor name: tf.Tensor} with the training input data.
+
+        Returns
+        -------
+        dict
+            Contains all the tf.Tensors of the training graph: {MakiTensor name: tf.Tensor}.
+        """
+        if self._checkpoint_layers is not None or self._checkpoint_every_k is not None:
+            return self._build_checkpointed_graph(train_inputs)
+
         # The algorithm recursively goes down the graph until it finds the input layer
         # and then passes its tensor through all the layers it has encountered so far.
 
@@ -146,7 +316,7 @@ class Hephaestus:
         # contains all the MakiTensor that were produced by the layer with the `layer_name` name.
         layer_name2output_tensors = {}
         # Collection of all the tf.Tensor that stem from the training graph.
-        self._traingraph_tensors = {}
+        traingraph_tensors = {}
 
         def create_tensor(maki_tensor: MakiTensor):
             # If the parent layer has been used, the required tensor is already constructed.
@@ -169,16 +339,15 @@ class Hephaestus:
             if len(maki_tensor.get_parent_tensor_names()) == 0:
                 # Replace an inference input tensor with its training counterpart
                 name = maki_tensor.get_name()
-                training_makitensor = self._train_inputs.get(name)
-                if training_makitensor is None:
+                X = train_inputs.get(name)
+                if X is None:
                     raise KeyError(f'There is no training input tensor with name {name}. The names of the training'
                                    f'input tensors must be the same with their corresponding inference counterparts.')
 
-                X = training_makitensor.get_data_tensor()
                 outputs.update(
                     {maki_tensor.get_name(): X}
                 )
-                self._traingraph_tensors.update(
+                traingraph_tensors.update(
                     {name: X}
                 )
                 return X
@@ -193,20 +362,7 @@ class Hephaestus:
             if len(parent_tensors) == 1:
                 parent_tensors = parent_tensors[0]
 
-            if layer.get_name() in self._trainable_layers:
-                X = layer.training_forward(
-                    parent_tensors
-                )
-            else:
-                X = layer.forward(
-                    parent_tensors,
-                    computation_mode=MakiRestorable.TRAINING_MODE
-                )
-
-            # Check if the layer outputs several tensors.
-            # If not, put the returned tensor into a list.
-            if not isinstance(X, tuple):
-                X = [X]
+            X = self._forward_layer(layer, parent_tensors)
 
             # Get names of the MakiTensors that were created
             # after passing parent of the `maki_tensor` through the `layer`.
@@ -217,7 +373,7 @@ class Hephaestus:
             output_names = layer.get_children(parent_name)
             for _x, x_name in zip(X, output_names):
                 outputs.update({x_name: _x})
-                self._traingraph_tensors[x_name] = _x
+                traingraph_tensors[x_name] = _x
 
             return outputs.get(maki_tensor.get_name())
 
@@ -227,7 +383,213 @@ class Hephaestus:
             # via the `get_traingraph_tensor` method.
             create_tensor(output)
 
-        self._is_compiled = True
+        return traingraph_tensors
+
+    def _forward_layer(self, layer, parent_tensors):
+        """
+        Passes the tensors through the layer in the training mode.
+
+        Returns
+        -------
+        list
+            Output tensors of the layer.
+        """
+        if layer.get_name() in self._trainable_layers:
+            X = layer.training_forward(
+                parent_tensors
+            )
+        else:
+            X = layer.forward(
+                parent_tensors,
+                computation_mode=MakiRestorable.TRAINING_MODE
+            )
+
+        # Check if the layer outputs several tensors.
+        # If not, put the returned tensor into a list.
+        if not isinstance(X, tuple):
+            X = [X]
+        return X
+
+    def _run_layer_calls(self, calls, tensors):
+        """
+        Runs the layer calls one by one.
+
+        Parameters
+        ----------
+        calls : list
+            MakiTensors in topological order. Each one represents the layer call that created it.
+        tensors : dict
+            Contains pairs {MakiTensor name: tf.Tensor} with all the tensors the calls depend on.
+            The output tensors of the calls are added to it.
+        """
+        for maki_tensor in calls:
+            parent_tensors = [tensors[name] for name in maki_tensor.get_parent_tensor_names()]
+            if len(parent_tensors) == 1:
+                parent_tensors = parent_tensors[0]
+
+            layer = maki_tensor.get_parent_layer()
+            X = self._forward_layer(layer, parent_tensors)
+            output_names = layer.get_children(maki_tensor.get_parent_tensor_names()[0])
+            for _x, x_name in zip(X, output_names):
+                tensors[x_name] = _x
+
+    def _plan_checkpointed_segments(self):
+        """
+        Splits the layer calls of the model into segments that end with the checkpoints.
+
+        Returns
+        -------
+        list
+            List of segments. Each segment is a tuple (calls, input names, output names), where
+            calls are MakiTensors representing the layer calls in topological order, inputs are the
+            tensors the segment depends on and outputs are the tensors required outside of the segment.
+        """
+        # Collect all the MakiTensors in topological order
+        ordered = {}
+        for output in self._model.get_outputs():
+            ordered.update(output.get_previous_tensors())
+            ordered.update(output.get_self_pair())
+
+        # Contains pairs {MakiTensor name: index of the segment that produces it}
+        producer = {}
+        segments_calls = [[]]
+        n_calls = 0
+        for name, maki_tensor in ordered.items():
+            if len(maki_tensor.get_parent_tensor_names()) == 0 or name in producer:
+                # Input tensors and the tensors produced by an already planned call
+                continue
+
+            layer = maki_tensor.get_parent_layer()
+            segments_calls[-1].append(maki_tensor)
+            for child_name in layer.get_children(maki_tensor.get_parent_tensor_names()[0]):
+                producer[child_name] = len(segments_calls) - 1
+            n_calls += 1
+
+            if self._checkpoint_layers is not None:
+                is_checkpoint = layer.get_name() in self._checkpoint_layers
+            else:
+                is_checkpoint = n_calls % self._checkpoint_every_k == 0
+            if is_checkpoint:
+                segments_calls.append([])
+
+        if len(segments_calls[-1]) == 0:
+            segments_calls.pop()
+
+        model_outputs = set([output.get_name() for output in self._model.get_outputs()])
+        # Contains pairs {MakiTensor name: set of indices of the segments that consume it}
+        consumers = {}
+        for segment_id, calls in enumerate(segments_calls):
+            for maki_tensor in calls:
+                for parent_name in maki_tensor.get_parent_tensor_names():
+                    consumers.setdefault(parent_name, set()).add(segment_id)
+
+        segments = []
+        for segment_id, calls in enumerate(segments_calls):
+            input_names = []
+            for maki_tensor in calls:
+                for parent_name in maki_tensor.get_parent_tensor_names():
+                    if producer.get(parent_name) != segment_id and parent_name not in input_names:
+                        input_names.append(parent_name)
+
+            output_names = [
+                name for name, tensor_segment in producer.items()
+                if tensor_segment == segment_id and
+                (name in model_outputs or len(consumers.get(name, set()) - {segment_id}) != 0)
+            ]
+            segments.append((calls, input_names, output_names))
+        return segments
+
+    def _build_checkpointed_graph(self, train_inputs):
+        """
+        Builds the training graph which segments recompute their activations during the backward pass.
+        See `set_gradient_checkpointing`.
+        """
+        traingraph_tensors = dict(train_inputs)
+
+        for calls, input_names, output_names in self._plan_checkpointed_segments():
+            inputs = [traingraph_tensors[name] for name in input_names]
+            outputs = self._checkpointed_segment(calls, input_names, output_names, traingraph_tensors)(*inputs)
+            # The segment's outputs must be taken from the custom gradient's outputs,
+            # otherwise the recomputation is bypassed
+            for name, output in zip(output_names, outputs):
+                traingraph_tensors[name] = output
+        return traingraph_tensors
+
+    def _checkpointed_segment(self, calls, input_names, output_names, traingraph_tensors):
+        """
+        Creates a function that runs the segment in the forward pass and recomputes it in the backward pass.
+        The internal tensors of the forward pass are saved to the `traingraph_tensors`.
+        The function takes the segment's input tensors followed by the parameters of its layers.
+        """
+        # tf.custom_gradient cuts the forward pass off the gradient computation and does not track
+        # the (non-resource) variables read inside it. Therefore, the parameters are passed explicitly
+        # as inputs and their gradients are returned along with the gradients of the input tensors.
+        name2param = {}
+        for maki_tensor in calls:
+            for param in maki_tensor.get_parent_layer().get_params():
+                name2param[param.name] = param
+        self._checkpointed_params.update(name2param.keys())
+        params = list(name2param.values())
+        n_inputs = len(input_names)
+
+        @tf.custom_gradient
+        def segment(*args):
+            inputs = args[:n_inputs]
+            tensors = dict(zip(input_names, inputs))
+            self._run_layer_calls(calls, tensors)
+            for name, tensor in tensors.items():
+                if name not in input_names:
+                    traingraph_tensors[name] = tensor
+            outputs = [tensors[name] for name in output_names]
+
+            # The `variables` argument is passed only if resource variables are used in the segment,
+            # it is taken from **kwargs since older TensorFlow versions do not accept keyword-only arguments.
+            def grad_fn(*grad_ys, **kwargs):
+                # The recomputation must start only when the gradients arrive, otherwise TensorFlow may
+                # compute it right away and keep the activations in memory.
+                # The gradient is stopped so the parameters' gradients do not leak through the inputs
+                # in case a layer is reused in the previous segments.
+                with tf.control_dependencies([grad for grad in grad_ys if grad is not None]):
+                    recomputed_inputs = [tf.stop_gradient(tf.identity(x)) for x in inputs]
+
+                recomputed = dict(zip(input_names, recomputed_inputs))
+                # The running statistics have already been updated in the forward pass
+                with FrozenStats():
+                    self._run_layer_calls(calls, recomputed)
+                ys = [recomputed[name] for name in output_names]
+                grad_ys = [
+                    tf.zeros_like(y) if grad is None else grad
+                    for y, grad in zip(ys, grad_ys)
+                ]
+
+                variables = list(kwargs.get('variables') or [])
+                # The segment's parameters are differentiated as its inputs already
+                other_variables = [var for var in variables if var.name not in name2param]
+                grads = tf.gradients(ys, recomputed_inputs + params + other_variables, grad_ys=grad_ys)
+                n_args = n_inputs + len(params)
+                if len(variables) == 0:
+                    return grads
+                other_grads = dict(zip([var.name for var in other_variables], grads[n_args:]))
+                return grads[:n_args], [other_grads.get(var.name) for var in variables]
+
+            return outputs, grad_fn
+
+        return lambda *inputs: segment(*(list(inputs) + params))
+
+    def _check_checkpointed_gradients(self, grads_and_vars):
+        """
+        Makes sure the gradients reach the parameters used inside the checkpointed segments.
+
+        Parameters
+        ----------
+        grads_and_vars : list
+            List of tuples (grad, var) as returned by the optimizer's `compute_gradients`.
+        """
+        missing = [
+            var.name for grad, var in grads_and_vars
+            if grad is None and var.name in self._checkpointed_params
+        ]
+        assert len(missing) == 0, f'Gradient checkpointing: the following parameters got no gradients: {missing}'
 
     def get_traingraph_tensor(self, tensor_name):
         """
@@ -0,0 +1,181 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import os
+
+import numpy as np
+from tqdm import tqdm
+
+
+class FeatureCache:
+    # Data of the i-th cached tensor is stored in the file `i`.npy
+    DATA_FORM = '{0}.npy'
+    META_FILE = 'cache_meta.json'
+
+    # Meta fields
+    NAMES = 'names'
+    FLOAT16_NAMES = 'float16_names'
+    N_SAMPLES = 'n_samples'
+
+    def __init__(self, cache_dir):
+        """
+        Memory-mapped storage of precomputed tensors. Each tensor is stored in its own .npy file,
+        the rows (first dimension) are the data points. The data is read lazily, so the cache
+        may be larger than RAM.
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory with the cache created via `FeatureCache.create`.
+        """
+        meta_path = os.path.join(cache_dir, FeatureCache.META_FILE)
+        assert os.path.isfile(meta_path), f'There is no complete feature cache in {cache_dir}'
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        self._names = meta[FeatureCache.NAMES]
+        self._float16_names = meta.get(FeatureCache.FLOAT16_NAMES, [])
+        self._n_samples = meta[FeatureCache.N_SAMPLES]
+        self._data = {
+            name: np.load(os.path.join(cache_dir, FeatureCache.DATA_FORM.format(i)), mmap_mode='r')
+            for i, name in enumerate(self._names)
+        }
+
+    @staticmethod
+    def create(cache_dir, session, fetches: dict, n_batches, feed_dicts=None, float16_names=None):
+        """
+        Runs the `fetches` `n_batches` times and stores the results.
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory to store the cache in. It is created if does not exist.
+        session : tf.Session
+            Session to run the `fetches` in.
+        fetches : dict
+            Contains pairs { name: tf.Tensor }. All the tensors must have the same batch dimension.
+        n_batches : int
+            Number of batches to store.
+        feed_dicts : python iterator
+            Yields feed dicts for the `fetches`. If not provided, the tensors are run without feed dicts
+            (the data comes from a tf.data pipeline).
+        float16_names : list
+            Names of the tensors to store in float16. Halves their size on the disk.
+            They are converted back to float32 when read.
+
+        Returns
+        -------
+        FeatureCache
+        """
+        if float16_names is None:
+            float16_names = []
+        os.makedirs(cache_dir, exist_ok=True)
+        meta_path = os.path.join(cache_dir, FeatureCache.META_FILE)
+        # The meta file marks a complete cache, so the old one must go first
+        if os.path.isfile(meta_path):
+            os.remove(meta_path)
+
+        names = list(fetches.keys())
+        data = None
+        n_samples = 0
+        for _ in tqdm(range(n_batches)):
+            feed_dict = next(feed_dicts) if feed_dicts is not None else None
+            values = session.run(fetches, feed_dict=feed_dict)
+            batch_size = len(values[names[0]])
+
+            if data is None:
+                # The shapes are known only after the first run
+                data = {
+                    name: np.lib.format.open_memmap(
+                        os.path.join(cache_dir, FeatureCache.DATA_FORM.format(i)), mode='w+',
+                        dtype=np.float16 if name in float16_names else values[name].dtype,
+                        shape=(n_batches * batch_size,) + values[name].shape[1:]
+                    )
+                    for i, name in enumerate(names)
+                }
+
+            for name in names:
+                assert len(values[name]) == batch_size, f'Batch dimension of {name} differs from the others.'
+                data[name][n_samples: n_samples + batch_size] = values[name]
+            n_samples += batch_size
+
+        for array in data.values():
+            array.flush()
+        del data
+
+        with open(meta_path, 'w') as f:
+            json.dump({
+                FeatureCache.NAMES: names,
+                FeatureCache.FLOAT16_NAMES: list(float16_names),
+                FeatureCache.N_SAMPLES: n_samples
+            }, f, indent=1)
+        print(f'Cached {n_samples} data points to {cache_dir}')
+        return FeatureCache(cache_dir)
+
+    def get_names(self):
+        return self._names.copy()
+
+    def get_n_samples(self):
+        return self._n_samples
+
+    def get_batch(self, indices):
+        """
+        Parameters
+        ----------
+        indices : list
+            Indices of the data points.
+
+        Returns
+        -------
+        dict
+            Contains pairs { name: np.ndarray }.
+        """
+        # Sorted indices make the reads from the disk sequential
+        indices = np.sort(indices)
+        batch = {name: np.asarray(array[indices]) for name, array in self._data.items()}
+        for name in self._float16_names:
+            batch[name] = batch[name].astype(np.float32)
+        return batch
+
+    def batch_generator(self, batch_size, shuffle=True):
+        """
+        Endlessly iterates over the cache. The last incomplete batch of an epoch is dropped.
+
+        Parameters
+        ----------
+        batch_size : int
+            Number of data points in a batch.
+        shuffle : bool
+            Set to True to shuffle the data points on each epoch.
+
+        Yields
+        ------
+        dict
+            Contains pairs { name: np.ndarray }.
+        """
+        assert batch_size is not None and batch_size > 0, f'The batch size must be positive, got {batch_size}'
+        assert self._n_samples >= batch_size, 'The cache contains less data points than the batch size.'
+        n_batches = self._n_samples // batch_size
+        while True:
+            if shuffle:
+                order = np.random.permutation(self._n_samples)
+            else:
+                order = np.arange(self._n_samples)
+
+            for i in range(n_batches):
+                yield self.get_batch(order[i * batch_size: (i + 1) * batch_size])
@@ -26,6 +26,13 @@ class Hermes(TensorBoard):
         self._model = model
         self._layers_to_show = []
         self._var2grad = None
+        # Names of the weights which histograms are added
+        self._weight_histograms = set()
+        # Contains pairs { gradient tensor name: histogram summary }. The gradients are cached by the trainer
+        # for each set of the trainable variables, so the histograms are reused when the set is trained again.
+        self._grad_histograms = {}
+        # Gradients histograms that are currently added
+        self._shown_grad_histograms = []
 
     def set_vars_grads(self, var_grad):
         self._var2grad = dict(var_grad)
@@ -39,13 +46,21 @@ class Hermes(TensorBoard):
         self._layers_to_show = layer_names
 
     def setup_tensorboard(self):
-        # Collect all layers histograms
+        # It is called again each time the gradients change (set of the trainable variables is changed).
+        # The weights histograms are added once, the gradients histograms are replaced with the ones
+        # of the new gradients.
+        for summary in self._shown_grad_histograms:
+            self._tb_summaries[TensorBoard.HISTOGRAM].remove(summary)
+        self._shown_grad_histograms = []
+
         for layer_name in self._layers_to_show:
             # Add weights histograms
             layer_weights = self._model.get_layer(layer_name).get_params()
             with tf.name_scope(f'{layer_name}/weight'):
                 for weight in layer_weights:
-                    self.add_histogram(weight, weight.name)
+                    if weight.name not in self._weight_histograms:
+                        self.add_histogram(weight, weight.name)
+                        self._weight_histograms.add(weight.name)
 
             # Add grads histograms
             with tf.name_scope(f'{layer_name}/grad'):
@@ -54,5 +69,13 @@ class Hermes(TensorBoard):
                     if grad is None:
                         print(f'Did not find gradient for layer={layer_name}, var={weight.name}')
                         continue
-                    self.add_summary(tf.summary.histogram(name=weight.name, values=grad))
+
+                    summary = self._grad_histograms.get(grad.name)
+                    if summary is None:
+                        summary = tf.summary.histogram(name=weight.name, values=grad)
+                        self._grad_histograms[grad.name] = summary
+                    self._shown_grad_histograms.append(summary)
+
+        for summary in self._shown_grad_histograms:
+            self.add_summary(summary, TensorBoard.HISTOGRAM)
         super().setup_tensorboard()
@@ -0,0 +1,162 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from queue import Queue, Empty, Full
+from threading import Thread, Lock, Event
+import time
+
+
+class FeedDictPrefetcher:
+    # Used to signal the end of the generator
+    _END = object()
+    # How often (in seconds) the workers check whether they must stop
+    _POLL_PERIOD = 0.1
+
+    def __init__(self, generator, pack_fn, buffer_size=4, n_workers=1, max_items=None):
+        """
+        Prepares feed dicts in background threads while the session is busy with the previous step.
+
+        Parameters
+        ----------
+        generator : python iterator
+            The data source. It is accessed under a lock, so it doesn't have to be thread safe.
+        pack_fn : function
+            Receives the output of the `generator` and returns a ready-to-run feed dict.
+        buffer_size : int
+            Maximum number of the prepared feed dicts. Bounds the memory used by the prefetcher.
+        n_workers : int
+            Number of the background threads. Note that with several workers the order of the
+            batches is not guaranteed.
+        max_items : int
+            Maximum number of the items pulled from the `generator`. Set it to the number of the batches
+            that will be consumed, otherwise the workers pull up to `buffer_size` + `n_workers` extra batches
+            from the generator, which are discarded on `close`.
+        """
+        assert buffer_size > 0, f'buffer_size must be positive, got {buffer_size}'
+        assert n_workers > 0, f'n_workers must be positive, got {n_workers}'
+        self._generator = generator
+        self._pack_fn = pack_fn
+        self._queue = Queue(maxsize=buffer_size)
+        self._generator_lock = Lock()
+        self._max_items = max_items
+        self._n_pulled = 0
+        # Number of the workers that have not reached `max_items` yet
+        self._n_pulling_workers = n_workers
+        self._stop_event = Event()
+        self._workers = [Thread(target=self._work, daemon=True) for _ in range(n_workers)]
+        self._is_started = False
+        # Total time (in seconds) spent waiting in the `get` method
+        self._wait_time = 0.0
+
+    def start(self):
+        if self._is_started:
+            return
+        for worker in self._workers:
+            worker.start()
+        self._is_started = True
+
+    def _work(self):
+        while not self._stop_event.is_set():
+            try:
+                with self._generator_lock:
+                    if self._max_items is not None and self._n_pulled >= self._max_items:
+                        self._n_pulling_workers -= 1
+                        is_last = self._n_pulling_workers == 0
+                    else:
+                        data = next(self._generator)
+                        self._n_pulled += 1
+                        is_last = None
+                if is_last is not None:
+                    # The last worker signals the end once the others have put their batches
+                    if is_last:
+                        self._put(FeedDictPrefetcher._END)
+                    return
+                item = self._pack_fn(data)
+            except StopIteration:
+                item = FeedDictPrefetcher._END
+            except Exception as ex:
+                # The exception will be re-raised in the main thread
+                item = ex
+
+            if not self._put(item) or not isinstance(item, dict):
+                return
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=FeedDictPrefetcher._POLL_PERIOD)
+                return True
+            except Full:
+                continue
+        return False
+
+    def get(self):
+        """
+        Returns
+        -------
+        dict
+            The next prepared feed dict. Blocks until one is ready.
+        """
+        assert self._is_started, 'The prefetcher is not started.'
+        start = time.perf_counter()
+        item = self._queue.get()
+        self._wait_time += time.perf_counter() - start
+
+        if item is FeedDictPrefetcher._END:
+            # Let the other consumers see the end of the generator as well
+            try:
+                self._queue.put_nowait(item)
+            except Full:
+                pass
+            raise StopIteration()
+
+        if isinstance(item, Exception):
+            raise item
+
+        return item
+
+    def pop_wait_time(self):
+        """
+        Returns
+        -------
+        float
+            Time (in seconds) spent waiting for the data since the last call of this method.
+        """
+        wait_time = self._wait_time
+        self._wait_time = 0.0
+        return wait_time
+
+    def close(self):
+        self._stop_event.set()
+        # Free the queue so that the blocked workers could see the stop event
+        try:
+            while True:
+                self._queue.get_nowait()
+        except Empty:
+            pass
+
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.join(timeout=FeedDictPrefetcher._POLL_PERIOD * 10)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -14,57 +14,221 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from queue import Queue
+from threading import Thread
 import tensorflow as tf
 
 
+class SummaryWriterThread:
+    # Used to signal the end of the writing
+    _END = object()
+
+    def __init__(self, writer):
+        """
+        Writes the summaries to the disk in a background thread, so that the training loop is not blocked.
+
+        Parameters
+        ----------
+        writer : tf.summary.FileWriter
+            The writer that does actual writing.
+        """
+        self._writer = writer
+        self._queue = Queue()
+        self._thread = Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is SummaryWriterThread._END:
+                self._queue.task_done()
+                return
+
+            summary, step = item
+            try:
+                self._writer.add_summary(summary, step)
+            except Exception as ex:
+                print(f'Could not write the summary for step={step}: {ex}')
+            self._queue.task_done()
+
+    def write(self, summary, step):
+        self._queue.put((summary, step))
+
+    def flush(self):
+        """
+        Blocks until all the queued summaries are written.
+        """
+        self._queue.join()
+        self._writer.flush()
+
+    def close(self):
+        self._queue.put(SummaryWriterThread._END)
+        self._thread.join()
+        self._writer.close()
+
+
 class TensorBoard:
+    # Kinds of the summaries. Each kind is evaluated and written with its own period.
+    SCALAR = 'scalar'
+    HISTOGRAM = 'histogram'
+    IMAGE = 'image'
+
     def __init__(self):
         self._tb_is_setup = False
         self._tb_writer = None
-        # Counter for total number of training iterations.
-        self._tb_summaries = []
+        # Contains pairs { summary kind: list of summaries }
+        self._tb_summaries = {
+            TensorBoard.SCALAR: [],
+            TensorBoard.HISTOGRAM: [],
+            TensorBoard.IMAGE: []
+        }
+        # Contains pairs { summary kind: period }. None means that the default period is used.
+        self._periods = {
+            TensorBoard.SCALAR: None,
+            TensorBoard.HISTOGRAM: None,
+            TensorBoard.IMAGE: None
+        }
+        # Contains pairs { summary kind: merged summary }
+        self._merged_summaries = {}
         self._total_summary = None
-        # Counter of iterations
+        # Contains pairs { names of the summaries: merged summary }, so the tensorboard can be set up
+        # several times without growing the graph
+        self._merge_cache = {}
+        # Counter for total number of training iterations.
         self._counter = 0
 
     def set_tensorboard_writer(self, writer):
         """
-        Creates logging file for the Tensorboard in the given `logdir_path` directory.
+        Sets the writer for the Tensorboard logs. The summaries are written in a background thread.
         Parameters
         ----------
         writer : tf.FileWriter
-            Path to the log directory.
+            Writer of the log directory.
         """
-        self._tb_writer = writer
+        if self._tb_writer is not None:
+            self._tb_writer.close()
+        self._tb_writer = SummaryWriterThread(writer)
+
+    def set_summary_periods(self, scalar_period=None, histogram_period=None, image_period=None):
+        """
+        Sets how often (in training iterations) each kind of summaries is evaluated and written.
+        The summaries are evaluated only on the iterations they are written on.
+        Parameters
+        ----------
+        scalar_period : int
+            Period for the scalar summaries. If None, the print period of the training loop is used.
+        histogram_period : int
+            Period for the histogram summaries. If None, the print period of the training loop is used.
+        image_period : int
+            Period for the image summaries. If None, the print period of the training loop is used.
+        """
+        self._periods[TensorBoard.SCALAR] = scalar_period
+        self._periods[TensorBoard.HISTOGRAM] = histogram_period
+        self._periods[TensorBoard.IMAGE] = image_period
 
     def add_scalar(self, scalar, name):
         summary = tf.summary.scalar(name, scalar)
-        self.add_summary(summary)
+        self.add_summary(summary, TensorBoard.SCALAR)
 
     def add_histogram(self, tensor, name):
         summary = tf.summary.histogram(name, tensor)
-        self.add_summary(summary)
+        self.add_summary(summary, TensorBoard.HISTOGRAM)
+
+    def add_image(self, tensor, name, max_outputs=3):
+        summary = tf.summary.image(name, tensor, max_outputs=max_outputs)
+        self.add_summary(summary, TensorBoard.IMAGE)
 
-    def add_summary(self, summary):
-        self._tb_summaries.append(summary)
+    def add_summary(self, summary, kind=SCALAR):
+        assert kind in self._tb_summaries, f'Unknown summary kind: {kind}'
+        self._tb_summaries[kind].append(summary)
 
     def close_tensorboard(self):
         """
-        Closes the logging writer for the Tensorboard
+        Writes the remaining summaries and closes the logging writer for the Tensorboard
         """
         self._tb_writer.close()
+        self._tb_writer = None
 
     def setup_tensorboard(self):
-        assert len(self._tb_summaries) != 0, 'No summaries found.'
+        all_summaries = []
+        for summaries in self._tb_summaries.values():
+            all_summaries += summaries
+        assert len(all_summaries) != 0, 'No summaries found.'
         print('Collecting histogram tensors...')
 
-        self._total_summary = tf.summary.merge(self._tb_summaries)
+        self._merged_summaries = {}
+        for kind, summaries in self._tb_summaries.items():
+            if len(summaries) != 0:
+                self._merged_summaries[kind] = self._merge(summaries)
+        self._total_summary = self._merge(all_summaries)
         self._tb_is_setup = True
 
+    def _merge(self, summaries):
+        key = tuple([summary.name for summary in summaries])
+        merged = self._merge_cache.get(key)
+        if merged is None:
+            merged = tf.summary.merge(summaries)
+            self._merge_cache[key] = merged
+        return merged
+
     def get_total_summary(self):
         assert self._total_summary is not None, 'The tensorboard is not setup.'
         return self._total_summary
 
+    def get_scheduled_summaries(self, default_period):
+        """
+        Returns the summaries that must be written on the current iteration. Only these should be
+        evaluated, so the iterations without writing do not pay for the summaries.
+        Parameters
+        ----------
+        default_period : int
+            Period for the summary kinds whose period is not set.
+        Returns
+        -------
+        list
+            Merged summaries to evaluate. Pass their values to `write_summaries`.
+            Empty if there is no writer.
+        """
+        # Nothing would be written, so nothing is evaluated
+        if self._tb_writer is None:
+            return []
+
+        assert self._tb_is_setup, 'The tensorboard is not setup.'
+        # The summaries are written after the iteration is done, i.e. after the counter is incremented
+        step = self._counter + 1
+        scheduled = []
+        for kind, summary in self._merged_summaries.items():
+            period = self._periods[kind]
+            if period is None:
+                period = default_period
+            if step % period == 0:
+                scheduled.append(summary)
+        return scheduled
+
+    def is_scheduled(self, kind, default_period):
+        """
+        Checks whether the summaries of the `kind` are written on the current iteration.
+        Must be called after the `increment` method.
+        """
+        period = self._periods[kind]
+        if period is None:
+            period = default_period
+        return self._counter % period == 0
+
+    def write_scalar_values(self, values):
+        """
+        Writes scalars computed outside of the graph (timings for example). No graph ops are created.
+        Parameters
+        ----------
+        values : dict
+            Contains pairs (scalar name, float value).
+        """
+        summary = tf.Summary(value=[
+            tf.Summary.Value(tag=name, simple_value=float(value)) for name, value in values.items()
+        ])
+        self.write_summary(summary)
+
     def is_setup(self):
         return self._tb_is_setup
 
@@ -72,9 +236,17 @@ class TensorBoard:
         # Must be called during each iteration of the training cycle
         self._counter += 1
 
+    def get_counter(self):
+        return self._counter
+
+    def set_counter(self, counter):
+        # Used to resume the training from a checkpoint
+        self._counter = counter
+
     def write_summary(self, summary):
         """
         Writes the summary to the Tensorboard. If the tensorboard writer is not provided, does nothing.
+        The writing is done in a background thread, so this method does not block.
         Parameters
         ----------
         summary : tf.Summary
@@ -85,4 +257,18 @@ class TensorBoard:
         """
         if self._tb_writer is None:
             return
-        self._tb_writer.add_summary(summary, self._counter)
+        self._tb_writer.write(summary, self._counter)
+
+    def write_summaries(self, summaries):
+        """
+        Writes values of the summaries received from the `get_scheduled_summaries` method.
+        """
+        for summary in summaries:
+            self.write_summary(summary)
+
+    def flush_tensorboard(self):
+        """
+        Blocks until all the summaries are written to the disk.
+        """
+        if self._tb_writer is not None:
+            self._tb_writer.flush()
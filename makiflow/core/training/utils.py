@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 from makiflow.core import MakiTensor
+import time
 
 EPOCH = 'Epoch:'
 
@@ -30,6 +31,25 @@ def print_train_info(epoch, *args):
     print('\n')
 
 
+def print_data_wait_info(wait_time, total_time):
+    share = wait_time / total_time * 100 if total_time > 0 else 0.0
+    print('Time spent waiting for data: {:0.3f}s ({:0.1f}% of the epoch)'.format(wait_time, share))
+
+
+def print_timing_info(data_wait, session_run, overhead, n_steps, examples_per_sec=None):
+    total_time = data_wait + session_run + overhead
+    print_data_wait_info(data_wait, total_time)
+    share = session_run / total_time * 100 if total_time > 0 else 0.0
+    print('Time spent in session.run: {:0.3f}s ({:0.1f}% of the epoch)'.format(session_run, share))
+    share = overhead / total_time * 100 if total_time > 0 else 0.0
+    print('Python overhead: {:0.3f}s ({:0.1f}% of the epoch)'.format(overhead, share))
+    step_time = total_time / n_steps * 1000 if n_steps > 0 else 0.0
+    output = 'Mean step time: {:0.1f}ms'.format(step_time)
+    if examples_per_sec is not None:
+        output += ', examples/s: {:0.1f}'.format(examples_per_sec)
+    print(output)
+
+
 def moving_average(old_val, new_val, iteration):
     if iteration == 0:
         return new_val
@@ -102,3 +122,88 @@ class IteratorCloser:
 
         # Re-raise exception
         return False
+
+
+class StepTimer:
+    # Names of the timing scalars shown on the tensorboard
+    DATA_WAIT = 'Timing/data_wait_ms'
+    SESSION_RUN = 'Timing/session_run_ms'
+    PYTHON_OVERHEAD = 'Timing/python_overhead_ms'
+    EXAMPLES_PER_SEC = 'Timing/examples_per_sec'
+
+    def __init__(self, batch_size=None):
+        """
+        Splits the time of the training steps into the time spent waiting for the data, the time spent
+        in session.run and the rest (Python overhead: summaries, loss interpolation, printing etc).
+        It tells whether the training is input-bound or compute-bound.
+
+        Parameters
+        ----------
+        batch_size : int
+            Number of examples in a training step. If not provided, examples per second are not measured.
+        """
+        self._batch_size = batch_size
+        # Totals of the epoch
+        self._epoch = [0.0, 0.0, 0.0]
+        self._epoch_steps = 0
+        # Totals since the last `pop_window_values` call
+        self._window = [0.0, 0.0, 0.0]
+        self._window_steps = 0
+        self._step_start = None
+        self._data_wait = 0.0
+        self._session_run = 0.0
+
+    def start_epoch(self):
+        self._epoch = [0.0, 0.0, 0.0]
+        self._epoch_steps = 0
+
+    def start_step(self):
+        self._step_start = time.perf_counter()
+        self._data_wait = 0.0
+        self._session_run = 0.0
+
+    def add_data_wait(self, wait_time):
+        self._data_wait += wait_time
+
+    def add_session_run(self, run_time):
+        self._session_run += run_time
+
+    def end_step(self):
+        total = time.perf_counter() - self._step_start
+        overhead = max(total - self._data_wait - self._session_run, 0.0)
+        for totals in (self._epoch, self._window):
+            totals[0] += self._data_wait
+            totals[1] += self._session_run
+            totals[2] += overhead
+        self._epoch_steps += 1
+        self._window_steps += 1
+
+    def pop_window_values(self):
+        """
+        Returns
+        -------
+        dict
+            Contains pairs (scalar name, value) with the mean step timings (in milliseconds) and
+            examples per second since the last call of this method.
+        """
+        data_wait, session_run, overhead = [value / max(self._window_steps, 1) for value in self._window]
+        values = {
+            StepTimer.DATA_WAIT: data_wait * 1000,
+            StepTimer.SESSION_RUN: session_run * 1000,
+            StepTimer.PYTHON_OVERHEAD: overhead * 1000
+        }
+        step_time = data_wait + session_run + overhead
+        if self._batch_size is not None and step_time > 0:
+            values[StepTimer.EXAMPLES_PER_SEC] = self._batch_size / step_time
+
+        self._window = [0.0, 0.0, 0.0]
+        self._window_steps = 0
+        return values
+
+    def print_epoch_report(self):
+        data_wait, session_run, overhead = self._epoch
+        examples_per_sec = None
+        total_time = data_wait + session_run + overhead
+        if self._batch_size is not None and total_time > 0:
+            examples_per_sec = self._batch_size * self._epoch_steps / total_time
+        print_timing_info(data_wait, session_run, overhead, self._epoch_steps, examples_per_sec)
@@ -24,6 +24,7 @@ from makiflow.core.debug import ExceptionScope
 import tensorflow as tf
 from makiflow.core.dev import ClassDecorator, overloaded
 from makiflow.core import MakiModel, MakiTrainer
+from makiflow.core.training import FeatureCache
 from .builder import build_method
 
 
@@ -32,6 +33,11 @@ class Distillator(ClassDecorator, ABC):
     TEACHER = 'TEACHER MODEL'
     DISTILLATION_LOSS = 'DISTILLATION_LOSS'
 
+    # Names of the tensors stored in the teacher cache
+    INPUT_FORM = 'input_{0}'
+    LABEL_FORM = 'label_{0}'
+    TEACHER_FORM = 'teacher_{0}'
+
     LOSS_SCALE = 'scale'
     TRACK_LAYER_LOSSES = 'track_losses'
 
@@ -128,6 +134,9 @@ class Distillator(ClassDecorator, ABC):
 
     @overloaded
     def build_loss(self):
+        # The teacher graph is not replicated and the distillation loss is built outside of the towers
+        assert self.get_student_trainer().get_tower_devices() is None, \
+            'Distillation does not support multi-tower training.'
         with ExceptionScope(Distillator.DISTILLATION_LOSS + ' construction'):
             distillation_loss = self._build_loss()
 
@@ -163,6 +172,105 @@ class Distillator(ClassDecorator, ABC):
 
         return output_tensor_pairs
 
+    def __get_cache_tensors(self):
+        # Returns pairs { cache name: tf.Tensor } of all the data the student's training step consumes
+        student_trainer = self.get_student_trainer()
+        assert student_trainer.get_tower_devices() is None, 'Teacher caching does not support the multi-tower training.'
+
+        tensors = {}
+        for train_input in student_trainer.get_train_inputs_list():
+            name = train_input.get_name()
+            tensors[Distillator.INPUT_FORM.format(name)] = student_trainer.get_traingraph_tensor(name)
+
+        for name, tensor in student_trainer.get_label_tensors().items():
+            tensors[Distillator.LABEL_FORM.format(name)] = tensor
+
+        for _, teacher_layer_name in self._layer_pairs:
+            tensors[Distillator.TEACHER_FORM.format(teacher_layer_name)] = \
+                self._teacher_train_graph.get_traingraph_tensor(teacher_layer_name)
+        return tensors
+
+    def cache_teacher_outputs(self, cache_dir, n_batches, generator=None, use_float16=False):
+        """
+        Runs the teacher over the dataset once and stores its outputs of the distilled layers along with
+        the student's input data and labels in a memory-mapped on-disk cache. Then the student can be trained from
+        the cache via `fit_teacher_cache` without running the teacher. Makes sense only if the inputs
+        are not augmented. Must be called after the compilation.
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory to store the cache in.
+        n_batches : int
+            Number of batches to cache.
+        generator : python iterator
+            Returns tuple of (data, labels) as in `fit_generator`. If not provided, the data is taken
+            from the tf.data pipeline the trainer is built on.
+        use_float16 : bool
+            Set to True to store the teacher's outputs in float16. Halves the size of the cache.
+
+        Returns
+        -------
+        FeatureCache
+        """
+        tensors = self.__get_cache_tensors()
+        feed_dicts = None
+        if generator is not None:
+            pack = self.get_student_trainer().get_pack_fn()
+            feed_dicts = (pack(data) for data in generator)
+
+        float16_names = []
+        if use_float16:
+            float16_names = [name for name in tensors if name.startswith(Distillator.TEACHER_FORM.format(''))]
+        # Fed placeholders are returned as is, so the data from the generator is stored as well
+        return FeatureCache.create(
+            cache_dir, self.get_student_trainer().get_session(), tensors, n_batches, feed_dicts,
+            float16_names=float16_names
+        )
+
+    def fit_teacher_cache(
+            self, cache, optimizer, epochs=1, print_period=None, global_step=None, shuffle=True,
+            prefetch_size=None, prefetch_workers=1, batch_size=None
+    ):
+        """
+        Trains the student on the data stored via `cache_teacher_outputs`. The cached teacher's outputs are
+        fed instead of computing them, so the teacher is not run at all. The distillation losses
+        are the same as in the usual training.
+
+        Parameters
+        ----------
+        cache : FeatureCache
+            The cache returned by `cache_teacher_outputs`.
+        optimizer : TensorFlow optimizer or dict
+            See `Athena.fit_generator`.
+        epochs : int
+            Number of epochs to run. One epoch is a pass over the whole cache.
+        print_period : int
+            Every `print_period` training iterations the training info will be displayed.
+        global_step
+            Please refer to TensorFlow documentation about the global step for more info.
+        shuffle : bool
+            Set to True to shuffle the cached data on each epoch.
+        prefetch_size : int
+            See `Athena.fit_generator`.
+        prefetch_workers : int
+            See `Athena.fit_generator`.
+        batch_size : int
+            See `Athena.fit_feature_cache`.
+        Returns
+        -------
+        dict
+            Dictionary with values of the tracked losses.
+        """
+        tensors = self.__get_cache_tensors()
+        missing = [name for name in tensors if name not in cache.get_names()]
+        assert len(missing) == 0, f'The cache does not contain {missing}'
+
+        return self.get_student_trainer().fit_cache(
+            cache, tensors, optimizer, epochs, print_period, global_step, shuffle,
+            prefetch_size, prefetch_workers, batch_size
+        )
+
     def get_student_trainer(self) -> MakiTrainer:
         return super().get_obj()
 
@@ -17,10 +17,9 @@
 
 from __future__ import absolute_import
 import tensorflow as tf
+from functools import partial
 from makiflow.generators.pipeline.tfr.utils import _tensor_to_byte_feature
-
-# Save form
-SAVE_FORM = "{0}_{1}.tfrecord"
+from makiflow.generators.pipeline.tfr.tfr_writer import record_shards
 
 # Feature names
 IMAGE_FNAME = 'IMAGE'
@@ -46,7 +45,7 @@ def record_nnr_train_data(images, uvmaps, tfrecord_path, sess=None):
 
 
 # Record data into multiple tfrecords
-def record_mp_nnr_train_data(images, uvmaps, prefix, dp_per_record, sess=None):
+def record_mp_nnr_train_data(images, uvmaps, prefix, dp_per_record, sess=None, compression=None, n_workers=1):
     """
     Creates tfrecord dataset where each tfrecord contains `dp_per_second` data points.
     Parameters
@@ -64,16 +63,27 @@ def record_mp_nnr_train_data(images, uvmaps, prefix, dp_per_record, sess=None):
         yields tfrecords of size 300-200 megabytes.
     sess : tf.Session
         In case if you can't or don't want to run TensorFlow eagerly, you can pass in the session object.
-    """
-    for i in range(len(images) // dp_per_record):
-        image_batch = images[dp_per_record*i: (i+1)*dp_per_record]
-        loc_mask_batch = uvmaps[dp_per_record * i: (i + 1) * dp_per_record]
+        Can't be used with several `n_workers`.
+    compression : str
+        Compression type of the tfrecords: 'GZIP', 'ZLIB' or None.
+    n_workers : int
+        Number of processes writing the tfrecords.
 
-        tfrecord_name = SAVE_FORM.format(prefix, i)
+    Returns
+    -------
+    str
+        Path to the manifest file (`prefix`_manifest.json) with the number of records in each tfrecord.
+    """
+    assert sess is None or n_workers == 1, 'The session can be used only with a single worker.'
+    serialize_fn = serialize_nnr_data_point
+    if sess is not None:
+        serialize_fn = partial(serialize_nnr_data_point, sess=sess)
 
-        record_nnr_train_data(
-            images=image_batch,
-            uvmaps=loc_mask_batch,
-            tfrecord_path=tfrecord_name,
-            sess=sess
-        )
+    return record_shards(
+        serialize_fn=serialize_fn,
+        columns=[images, uvmaps],
+        prefix=prefix,
+        dp_per_record=dp_per_record,
+        compression=compression,
+        n_workers=n_workers
+    )
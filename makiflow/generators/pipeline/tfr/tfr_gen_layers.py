@@ -18,6 +18,7 @@
 import tensorflow as tf
 from makiflow.generators.pipeline.tfr.tfr_pathgenerator import TFRPathGenerator
 from .tfr_map_method import TFRMapMethod
+from .tfr_pipeline import TFRPipelineBuilder
 from makiflow.generators.pipeline.gen_base import GenLayer, PathGenerator
 
 
@@ -25,7 +26,7 @@ class InputGenLayerV1(GenLayer):
     def __init__(
             self, prefetch_size, batch_size, tf_records, name, input_data_type: str,
             map_operation: TFRMapMethod, num_parallel_calls=None,
-            shuffle=False, buffer_size=512, tfr_buffer_size=None
+            shuffle=False, buffer_size=512, tfr_buffer_size=None, compression_type=None
     ):
         """
         Tensor
@@ -61,12 +62,15 @@ class InputGenLayerV1(GenLayer):
             A scalar representing the number of bytes in the read buffer. If your input pipeline is I/O
             bottlenecked, consider setting this parameter to a value 1-100 MBs. If None, a sensible default for both
             local and remote file systems is used.
+        compression_type : str
+            Compression type of the tfrecords: 'GZIP', 'ZLIB' or None.
         """
         self.prefetch_size = prefetch_size
         self.batch_size = batch_size
         self.shuffle = shuffle
         self.buffer_size = buffer_size
         self.tfr_buffer_size = tfr_buffer_size
+        self.compression_type = compression_type
         self.iterator = self.build_iterator(tf_records, map_operation, num_parallel_calls)
         super().__init__(
             name=name,
@@ -76,7 +80,8 @@ class InputGenLayerV1(GenLayer):
     def build_iterator(self, tf_records, map_operation: TFRMapMethod, num_parallel_calls):
         dataset = tf.data.TFRecordDataset(
             tf_records,
-            buffer_size=self.tfr_buffer_size
+            buffer_size=self.tfr_buffer_size,
+            compression_type=self.compression_type
         )
         dataset = dataset.repeat(-1)  # repeat infinitely
         dataset = dataset.map(map_func=map_operation.read_record, num_parallel_calls=num_parallel_calls)
@@ -161,7 +166,9 @@ class InputGenLayerV2Batched(GenLayer):
             }
         )
         dataset = tf_records.interleave(
-            map_func=lambda x: tf.data.TFRecordDataset(x[TFRPathGenerator.TFRECORD]),
+            map_func=lambda x: tf.data.TFRecordDataset(
+                x[TFRPathGenerator.TFRECORD], compression_type=gen.get_compression_type()
+            ),
             cycle_length=self.cycle_length,
             block_length=self.block_length,
         )
@@ -247,7 +254,9 @@ class InputGenLayerV2(GenLayer):
             }
         )
         dataset = tf_records.interleave(
-            map_func=lambda x: tf.data.TFRecordDataset(x[TFRPathGenerator.TFRECORD]),
+            map_func=lambda x: tf.data.TFRecordDataset(
+                x[TFRPathGenerator.TFRECORD], compression_type=gen.get_compression_type()
+            ),
             cycle_length=self.cycle_length,
             block_length=self.block_length,
         )
@@ -323,7 +332,9 @@ class InputGenLayerV3(GenLayer):
             }
         )
         dataset = tf_records.flat_map(
-            map_func=lambda x: tf.data.TFRecordDataset(x[TFRPathGenerator.TFRECORD])
+            map_func=lambda x: tf.data.TFRecordDataset(
+                x[TFRPathGenerator.TFRECORD], compression_type=gen.get_compression_type()
+            )
         )
         if self.shuffle:
             dataset = dataset.shuffle(buffer_size=self.buffer_size)
@@ -403,7 +414,9 @@ class InputGenLayerV4(GenLayer):
             }
         )
         dataset = tf_records.interleave(
-            map_func=lambda x: tf.data.TFRecordDataset(x[TFRPathGenerator.TFRECORD]),
+            map_func=lambda x: tf.data.TFRecordDataset(
+                x[TFRPathGenerator.TFRECORD], compression_type=gen.get_compression_type()
+            ),
             cycle_length=self.cycle_length,
             block_length=self.block_length,
         )
@@ -421,3 +434,34 @@ class InputGenLayerV4(GenLayer):
 
     def get_iterator(self):
         return self.iterator
+
+
+class InputGenLayerV5(GenLayer):
+    def __init__(self, pipeline_builder: TFRPipelineBuilder, input_data_type: str, name):
+        """
+        Input layer built on the autotuned pipeline. Prefer it to the previous versions: it reads the tfrecords
+        in parallel, shuffles the serialized records instead of the decoded ones, fuses decoding with
+        batching and autotunes the parallelism and the prefetch depth.
+
+        Parameters
+        ----------
+        pipeline_builder : TFRPipelineBuilder
+            The configured builder of the pipeline.
+        input_data_type : str
+            Name of the data that is being fed into the network. You have to use iterator classes
+            provided for each model in order to refer to the necessary data type.
+            For SSD - SSDIterator.IMAGE.
+            For NeuralRenderer - NNRIterator.UVMAP.
+            For Segmentator - SegmentIterator.IMAGE.
+        name : str
+            Name of the input layer of the model. You can find it in the
+            architecture file.
+        """
+        self.iterator = pipeline_builder.build()
+        super().__init__(
+            name=name,
+            input_tensor=self.iterator[input_data_type]
+        )
+
+    def get_iterator(self):
+        return self.iterator
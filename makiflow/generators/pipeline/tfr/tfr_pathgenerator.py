@@ -21,15 +21,30 @@ import numpy as np
 from sklearn.utils import shuffle
 
 from makiflow.generators.pipeline.gen_base import PathGenerator
+from .tfr_writer import load_manifest
 
 
 class TFRPathGenerator(PathGenerator):
     TFRECORD = 'tfrecord'
 
+    _compression_type = None
+
     @abstractmethod
     def next_element(self) -> dict:
         pass
 
+    def get_compression_type(self):
+        """
+        Returns
+        -------
+        str
+            Compression type of the tfrecords ('GZIP', 'ZLIB') or None if they are not compressed.
+        """
+        return self._compression_type
+
+    def set_compression_type(self, compression_type):
+        self._compression_type = compression_type
+
 
 class CycleGenerator(TFRPathGenerator):
     def __init__(self, tfrecords, init_shuffle=True):
@@ -63,9 +78,30 @@ class CycleGenerator(TFRPathGenerator):
                 index = 0
                 self._tfrecords = shuffle(self._tfrecords)
 
+    @staticmethod
+    def from_manifest(manifest_path, init_shuffle=True):
+        """
+        Creates the generator from the manifest written along with the tfrecords.
+
+        Parameters
+        ----------
+        manifest_path : str
+            Path to the manifest json.
+        init_shuffle : bool
+            If True, shuffle of tfrecords will be performed before the cycle begins
+
+        Returns
+        -------
+        CycleGenerator
+        """
+        tfrecords, _, compression = load_manifest(manifest_path)
+        gen = CycleGenerator(tfrecords, init_shuffle=init_shuffle)
+        gen.set_compression_type(compression)
+        return gen
+
 
 class RandomGeneratorSegment(TFRPathGenerator):
-    def __init__(self, tfrecords: list):
+    def __init__(self, tfrecords: list, n_records: list = None):
         """
         Generator for the SSD pipeline, which gives next tfrecord in random order.
 
@@ -73,12 +109,38 @@ class RandomGeneratorSegment(TFRPathGenerator):
         ----------
         tfrecords : list
             List of paths to the tfrecords.
+        n_records : list
+            Number of records in each of the `tfrecords`. If provided, tfrecords are sampled
+            proportionally to their size, so each record has the same chance to be picked.
         """
         self._tfrecords = tfrecords
+        self._probs = None
+        if n_records is not None:
+            assert len(n_records) == len(tfrecords), 'Number of the tfrecords and record counts is not aligned.'
+            self._probs = np.asarray(n_records, dtype='float64') / np.sum(n_records)
+
+    @staticmethod
+    def from_manifest(manifest_path):
+        """
+        Creates the generator from the manifest written along with the tfrecords.
+
+        Parameters
+        ----------
+        manifest_path : str
+            Path to the manifest json.
+
+        Returns
+        -------
+        RandomGeneratorSegment
+        """
+        tfrecords, n_records, compression = load_manifest(manifest_path)
+        gen = RandomGeneratorSegment(tfrecords, n_records=n_records)
+        gen.set_compression_type(compression)
+        return gen
 
     def next_element(self):
         while True:
-            index = np.random.randint(low=0, high=len(self._tfrecords))
+            index = np.random.choice(len(self._tfrecords), p=self._probs)
 
             el = {
                 TFRPathGenerator.TFRECORD: self._tfrecords[index],
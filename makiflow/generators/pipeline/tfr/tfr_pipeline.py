@@ -0,0 +1,257 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import tensorflow as tf
+from .tfr_pathgenerator import TFRPathGenerator
+from .tfr_map_method import TFRMapMethod
+from .tfr_random_access import TFRRandomAccessReader
+
+
+class TFRPipelineBuilder:
+    # Lets tf.data pick the parallelism and the buffer sizes at runtime
+    AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+    def __init__(self, batch_size, map_operation: TFRMapMethod):
+        """
+        Declarative builder of the tfrecord input pipeline. Whatever the settings, the stages always go in
+        the same order, which is the efficient one:
+        1. The tfrecords are read in parallel via interleave.
+        2. The serialized records are shuffled, so the shuffle buffer holds small strings instead of
+        decoded tensors.
+        Alternatively, 1 and 2 are replaced with reading the records in a global random order via
+        the random access reader (see `set_random_access`).
+        3. The records are decoded and batched, the map and batch stages are fused.
+        4. The batches are post-processed (optionally) and prefetched.
+        The parallelism and the prefetch depth are autotuned unless set explicitly.
+
+        Parameters
+        ----------
+        batch_size : int
+            The batch size.
+        map_operation : TFRMapMethod
+            Method for mapping the serialized records to the actual data.
+        """
+        self._batch_size = batch_size
+        self._map_operation = map_operation
+        self._batched_map_operation = None
+        self._tf_records = None
+        self._path_generator = None
+        self._reader = None
+        self._reader_seed = None
+        self._compression_type = None
+        self._tfr_buffer_size = None
+        self._cycle_length = TFRPipelineBuilder.AUTOTUNE
+        self._block_length = 1
+        self._shuffle_buffer_size = None
+        self._num_parallel_calls = TFRPipelineBuilder.AUTOTUNE
+        self._prefetch_size = TFRPipelineBuilder.AUTOTUNE
+        self._deterministic = False
+
+    def set_tfrecords(self, tf_records, compression_type=None):
+        """
+        Sets a fixed list of the tfrecords. They are read in a new random order on every pass if shuffling is on.
+
+        Parameters
+        ----------
+        tf_records : list
+            List of the tfrecord filenames.
+        compression_type : str
+            Compression type of the tfrecords: 'GZIP', 'ZLIB' or None.
+        """
+        self._tf_records = tf_records
+        self._path_generator = None
+        self._reader = None
+        self._compression_type = compression_type
+        return self
+
+    def set_path_generator(self, tfr_path_generator: TFRPathGenerator):
+        """
+        Sets the path generator that yields the tfrecords to read. Its compression type is used.
+        """
+        self._path_generator = tfr_path_generator
+        self._tf_records = None
+        self._reader = None
+        self._compression_type = tfr_path_generator.get_compression_type()
+        return self
+
+    def set_random_access(self, reader: TFRRandomAccessReader, seed=None):
+        """
+        Sets the reader that fetches the records by their offsets. The records are read in a global
+        random order (a new permutation on every pass), so the shuffle buffer and the interleave
+        settings are not used.
+
+        Parameters
+        ----------
+        reader : TFRRandomAccessReader
+            Reader of the indexed tfrecords.
+        seed : int
+            Seed of the permutations.
+        """
+        self._reader = reader
+        self._reader_seed = seed
+        self._tf_records = None
+        self._path_generator = None
+        return self
+
+    def set_interleave(self, cycle_length=AUTOTUNE, block_length=1, tfr_buffer_size=None):
+        """
+        Parameters
+        ----------
+        cycle_length : int
+            Number of the tfrecords read concurrently.
+        block_length : int
+            Each tfrecord in the dataset will be read by blocks of length `block_length`.
+        tfr_buffer_size : int
+            Number of bytes in the read buffer of each tfrecord. If None, a sensible default is used.
+        """
+        self._cycle_length = cycle_length
+        self._block_length = block_length
+        self._tfr_buffer_size = tfr_buffer_size
+        return self
+
+    def set_shuffle(self, buffer_size):
+        """
+        Parameters
+        ----------
+        buffer_size : int
+            Number of the serialized records the shuffled ones are sampled from. Since the records are not
+            decoded yet, the buffer can be much larger than a buffer of decoded tensors of the same memory size.
+            Set to None to disable shuffling.
+        """
+        self._shuffle_buffer_size = buffer_size
+        return self
+
+    def set_parallel_calls(self, num_parallel_calls=AUTOTUNE):
+        """
+        Parameters
+        ----------
+        num_parallel_calls : int
+            Number of the records decoded in parallel.
+        """
+        self._num_parallel_calls = num_parallel_calls
+        return self
+
+    def set_batched_map(self, map_operation: TFRMapMethod):
+        """
+        Sets a method that is applied to the whole batches, for example, a batched augmentation.
+        """
+        self._batched_map_operation = map_operation
+        return self
+
+    def set_prefetch(self, prefetch_size=AUTOTUNE):
+        """
+        Parameters
+        ----------
+        prefetch_size : int
+            Number of batches to prepare before feeding into the network.
+        """
+        self._prefetch_size = prefetch_size
+        return self
+
+    def set_deterministic(self, deterministic):
+        """
+        Parameters
+        ----------
+        deterministic : bool
+            If False (default), the parallel stages may output the elements out of order when that
+            lets them go faster.
+        """
+        self._deterministic = deterministic
+        return self
+
+    def _build_files(self):
+        if self._path_generator is not None:
+            files = tf.data.Dataset.from_generator(
+                self._path_generator.next_element,
+                output_types={
+                    TFRPathGenerator.TFRECORD: tf.string
+                }
+            )
+            return files.map(lambda x: x[TFRPathGenerator.TFRECORD])
+
+        assert self._tf_records is not None, 'Neither tfrecords, path generator nor random access reader are set.'
+        files = tf.data.Dataset.from_tensor_slices(self._tf_records)
+        if self._shuffle_buffer_size is not None:
+            files = files.shuffle(buffer_size=len(self._tf_records), reshuffle_each_iteration=True)
+        return files.repeat(-1)
+
+    def _build_random_access(self):
+        indices = tf.data.Dataset.from_generator(
+            lambda: self._reader.index_generator(seed=self._reader_seed),
+            output_types=tf.int64,
+            output_shapes=()
+        )
+        # The reads release the GIL, so several records are read concurrently.
+        # py_func loses the shape, the records are scalar strings
+        return indices.map(
+            map_func=lambda i: tf.reshape(tf.py_func(self._reader.get_record, [i], tf.string, stateful=False), []),
+            num_parallel_calls=self._num_parallel_calls
+        )
+
+    def _build_records(self):
+        if self._reader is not None:
+            return self._build_random_access()
+
+        dataset = self._build_files().interleave(
+            map_func=lambda x: tf.data.TFRecordDataset(
+                x, compression_type=self._compression_type, buffer_size=self._tfr_buffer_size
+            ),
+            cycle_length=self._cycle_length,
+            block_length=self._block_length,
+            num_parallel_calls=TFRPipelineBuilder.AUTOTUNE
+        )
+
+        if self._shuffle_buffer_size is not None:
+            dataset = dataset.shuffle(buffer_size=self._shuffle_buffer_size)
+        return dataset
+
+    def build_dataset(self):
+        """
+        Returns
+        -------
+        tf.data.Dataset
+            Endless dataset of the batches.
+        """
+        dataset = self._build_records()
+
+        dataset = dataset.map(map_func=self._map_operation.read_record, num_parallel_calls=self._num_parallel_calls)
+        # Set `drop_remainder` to True since otherwise the batch dimension
+        # would be None. Example: [None, 1024, 1024, 3]
+        dataset = dataset.batch(self._batch_size, drop_remainder=True)
+
+        if self._batched_map_operation is not None:
+            dataset = dataset.map(
+                map_func=self._batched_map_operation.read_record, num_parallel_calls=self._num_parallel_calls
+            )
+
+        dataset = dataset.prefetch(self._prefetch_size)
+
+        options = tf.data.Options()
+        options.experimental_deterministic = self._deterministic
+        options.experimental_optimization.autotune = True
+        options.experimental_optimization.map_and_batch_fusion = True
+        return dataset.with_options(options)
+
+    def build(self):
+        """
+        Returns
+        -------
+        dict
+            Tensors of the next batch, the output of `iterator.get_next()`.
+        """
+        iterator = self.build_dataset().make_one_shot_iterator()
+        return iterator.get_next()
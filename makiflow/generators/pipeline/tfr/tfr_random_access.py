@@ -0,0 +1,162 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import os
+import struct
+from threading import Lock
+
+import numpy as np
+
+from .tfr_writer import load_manifest, load_manifest_indices, load_index, RECORD_HEADER_SIZE
+
+
+class TFRRandomAccessReader:
+    def __init__(self, tfrecords, indices):
+        """
+        Reads arbitrary records of uncompressed tfrecords using their offset indices (see `save_index`).
+        Allows iterating over the whole dataset in a global random order, which does not require
+        a shuffle buffer: only the permutation of the record numbers is kept in memory.
+        The reader is thread-safe.
+
+        Parameters
+        ----------
+        tfrecords : list
+            Paths to the tfrecords.
+        indices : list
+            Paths to the offset indices of the `tfrecords`.
+        """
+        assert len(tfrecords) == len(indices), 'Each tfrecord must have its index.'
+        self._tfrecords = tfrecords
+        self._indices = [load_index(index_path) for index_path in indices]
+        n_records = np.asarray([len(index) for index in self._indices], dtype=np.int64)
+        # Global number of the first record of each shard
+        self._starts = np.cumsum(n_records) - n_records
+        self._n_records = int(n_records.sum())
+        # Contains pairs { shard number: file descriptor }, the files are opened on the first read
+        self._files = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def from_manifest(manifest_path):
+        """
+        Creates the reader for the tfrecords written via `record_shards` without compression.
+
+        Parameters
+        ----------
+        manifest_path : str
+            Path to the manifest json.
+
+        Returns
+        -------
+        TFRRandomAccessReader
+        """
+        tfrecords, _, compression = load_manifest(manifest_path)
+        assert compression is None, 'Compressed tfrecords do not support random access.'
+        return TFRRandomAccessReader(tfrecords, load_manifest_indices(manifest_path))
+
+    def get_n_records(self):
+        return self._n_records
+
+    def _get_file(self, shard):
+        fd = self._files.get(shard)
+        if fd is None:
+            with self._lock:
+                fd = self._files.get(shard)
+                if fd is None:
+                    fd = os.open(self._tfrecords[shard], os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+                    self._files[shard] = fd
+        return fd
+
+    def _read(self, fd, offset, size):
+        if hasattr(os, 'pread'):
+            # Does not move the file position, so the threads do not interfere
+            return os.pread(fd, size, offset)
+
+        with self._lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.read(fd, size)
+
+    def get_record(self, i):
+        """
+        Parameters
+        ----------
+        i : int
+            Global number of the record, counting from the first record of the first tfrecord.
+
+        Returns
+        -------
+        bytes
+            The serialized record.
+        """
+        i = int(i)
+        assert 0 <= i < self._n_records, f'Record number {i} is out of range [0, {self._n_records}).'
+        shard = int(np.searchsorted(self._starts, i, side='right')) - 1
+        offset, length = self._indices[shard][i - self._starts[shard]]
+
+        # The length stored in the record's header is read as well to make sure the index is valid
+        data = self._read(self._get_file(shard), int(offset) - RECORD_HEADER_SIZE, int(length) + RECORD_HEADER_SIZE)
+        assert struct.unpack('<Q', data[:8])[0] == length, \
+            f'The index does not match the tfrecord {self._tfrecords[shard]}. Record number: {i}.'
+        return data[RECORD_HEADER_SIZE:]
+
+    def get_records(self, indices):
+        """
+        Returns
+        -------
+        list
+            Serialized records with the given global numbers.
+        """
+        return [self.get_record(i) for i in indices]
+
+    def index_generator(self, shuffle=True, seed=None):
+        """
+        Endlessly yields the global numbers of the records. Each pass over the dataset uses a new permutation.
+
+        Parameters
+        ----------
+        shuffle : bool
+            Set to False to iterate over the records in the order they are written.
+        seed : int
+            Seed of the permutations.
+
+        Yields
+        ------
+        int
+        """
+        random_state = np.random.RandomState(seed)
+        while True:
+            order = random_state.permutation(self._n_records) if shuffle else range(self._n_records)
+            for i in order:
+                yield int(i)
+
+    def record_generator(self, shuffle=True, seed=None):
+        """
+        Endlessly yields the serialized records, see `index_generator`.
+
+        Yields
+        ------
+        bytes
+        """
+        for i in self.index_generator(shuffle, seed):
+            yield self.get_record(i)
+
+    def close(self):
+        with self._lock:
+            for fd in self._files.values():
+                os.close(fd)
+            self._files = {}
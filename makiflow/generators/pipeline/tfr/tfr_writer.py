@@ -0,0 +1,259 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+
+# Save form
+SAVE_FORM = "{0}_{1}.tfrecord"
+MANIFEST_FORM = "{0}_manifest.json"
+INDEX_FORM = "{0}.index.npy"
+
+# Each record is framed as: uint64 length, uint32 masked crc32 of the length, data, uint32 masked crc32 of the data
+RECORD_HEADER_SIZE = 12
+RECORD_FOOTER_SIZE = 4
+
+# Compression types supported by the TFRecord files
+COMPRESSION_GZIP = 'GZIP'
+COMPRESSION_ZLIB = 'ZLIB'
+
+# Manifest fields
+COMPRESSION = 'compression'
+SHARDS = 'shards'
+PATH = 'path'
+N_RECORDS = 'n_records'
+INDEX = 'index'
+TOTAL_RECORDS = 'total_records'
+
+
+def _init_worker():
+    # Numpy arrays are serialized without TensorFlow, but other tensors still require eager mode.
+    # The worker is a fresh process, so it can still be switched.
+    if not tf.executing_eagerly():
+        tf.enable_eager_execution()
+
+
+def _write_shard(serialize_fn, shard_columns, tfrecord_path, compression):
+    """
+    Writes one tfrecord file. If the tfrecord is not compressed, its offset index is written
+    next to it, see `save_index`.
+
+    Returns
+    -------
+    str
+        Path to the tfrecord.
+    int
+        Number of the written records.
+    str
+        Path to the offset index or None if the tfrecord is compressed.
+    """
+    options = tf.io.TFRecordOptions(compression_type=compression) if compression is not None else None
+    lengths = []
+    with tf.io.TFRecordWriter(tfrecord_path, options=options) as writer:
+        for data_point in zip(*shard_columns):
+            serialized = serialize_fn(*data_point)
+            writer.write(serialized)
+            lengths.append(len(serialized))
+
+    # Offsets inside the compressed stream do not correspond to the file offsets
+    index_path = None
+    if compression is None:
+        index_path = save_index(tfrecord_path, lengths)
+    return tfrecord_path, len(lengths), index_path
+
+
+def save_index(tfrecord_path, lengths):
+    """
+    Saves the offset index of an uncompressed tfrecord. The index is an int64 array of shape [n_records, 2]
+    with pairs (offset of the record's data in the file, length of the data).
+
+    Parameters
+    ----------
+    tfrecord_path : str
+        Path to the tfrecord.
+    lengths : list
+        Lengths of the serialized records in the order they are written.
+
+    Returns
+    -------
+    str
+        Path to the index.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    frame_sizes = lengths + RECORD_HEADER_SIZE + RECORD_FOOTER_SIZE
+    offsets = np.cumsum(frame_sizes) - frame_sizes + RECORD_HEADER_SIZE
+    index_path = INDEX_FORM.format(tfrecord_path)
+    np.save(index_path, np.stack([offsets, lengths], axis=1))
+    return index_path
+
+
+def load_index(index_path):
+    """
+    Loads the offset index saved via `save_index`. The index is memory-mapped, so only the used parts
+    of it are read from the disk.
+
+    Returns
+    -------
+    np.ndarray
+        Int64 array of shape [n_records, 2] with pairs (offset, length).
+    """
+    return np.load(index_path, mmap_mode='r')
+
+
+def record_shards(serialize_fn, columns, prefix, dp_per_record, compression=None, n_workers=1):
+    """
+    Splits the data into tfrecord shards with `dp_per_record` data points each and writes them
+    along with a manifest file.
+
+    Parameters
+    ----------
+    serialize_fn : function
+        Receives one data point (one element from each of the `columns`) and returns a serialized tf.train.Example.
+        If `n_workers` > 1, it must be picklable, i.e. a module-level function.
+    columns : list
+        List of arrays (or lists) of the same length. Each array contains one kind of data.
+    prefix : str
+        Prefix for the tfrecords' names. All the filenames will have the same naming pattern:
+        `prefix`_`tfrecord index`.tfrecord
+    dp_per_record : int
+        Data point per tfrecord. Only full shards are written, the remaining data points are dropped.
+    compression : str
+        Compression type of the tfrecords: COMPRESSION_GZIP, COMPRESSION_ZLIB or None.
+    n_workers : int
+        Number of processes writing the shards. If set to 1, the shards are written in the current process.
+
+    Returns
+    -------
+    str
+        Path to the manifest file.
+    """
+    assert compression in (None, COMPRESSION_GZIP, COMPRESSION_ZLIB), f'Unknown compression type: {compression}'
+    n_shards = len(columns[0]) // dp_per_record
+    tasks = []
+    for i in range(n_shards):
+        shard_columns = [column[dp_per_record * i: (i + 1) * dp_per_record] for column in columns]
+        tasks.append((shard_columns, SAVE_FORM.format(prefix, i)))
+
+    if n_workers == 1:
+        shards = [_write_shard(serialize_fn, shard_columns, path, compression) for shard_columns, path in tasks]
+    else:
+        # Spawn is used since TensorFlow does not survive forking
+        with ProcessPoolExecutor(
+                max_workers=n_workers, mp_context=mp.get_context('spawn'), initializer=_init_worker
+        ) as executor:
+            futures = [
+                executor.submit(_write_shard, serialize_fn, shard_columns, path, compression)
+                for shard_columns, path in tasks
+            ]
+            shards = [future.result() for future in futures]
+
+    manifest_path = MANIFEST_FORM.format(prefix)
+    save_manifest(manifest_path, shards, compression)
+    return manifest_path
+
+
+def save_manifest(manifest_path, shards, compression=None):
+    """
+    Saves the manifest of the tfrecord dataset.
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path to the manifest json.
+    shards : list
+        List of tuples (tfrecord path, number of records) or (tfrecord path, number of records, index path).
+    compression : str
+        Compression type of the tfrecords.
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    # Paths are stored relative to the manifest, so the dataset can be moved
+    def relpath(path):
+        return os.path.relpath(os.path.abspath(path), manifest_dir)
+
+    manifest_shards = []
+    for shard in shards:
+        manifest_shard = {PATH: relpath(shard[0]), N_RECORDS: shard[1]}
+        if len(shard) > 2 and shard[2] is not None:
+            manifest_shard[INDEX] = relpath(shard[2])
+        manifest_shards.append(manifest_shard)
+
+    manifest = {
+        COMPRESSION: compression,
+        SHARDS: manifest_shards,
+        TOTAL_RECORDS: sum([shard[1] for shard in shards])
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+
+def load_manifest(manifest_path):
+    """
+    Loads the manifest of the tfrecord dataset.
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path to the manifest json.
+
+    Returns
+    -------
+    tfrecords : list
+        Paths to the tfrecords.
+    n_records : list
+        Number of records in each of the `tfrecords`.
+    compression : str
+        Compression type of the tfrecords.
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    tfrecords = [os.path.join(manifest_dir, shard[PATH]) for shard in manifest[SHARDS]]
+    n_records = [shard[N_RECORDS] for shard in manifest[SHARDS]]
+    return tfrecords, n_records, manifest[COMPRESSION]
+
+
+def load_manifest_indices(manifest_path):
+    """
+    Loads paths to the offset indices of the tfrecords listed in the manifest.
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path to the manifest json.
+
+    Returns
+    -------
+    list
+        Paths to the indices in the same order as the tfrecords returned by `load_manifest`.
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    indices = []
+    for shard in manifest[SHARDS]:
+        assert INDEX in shard, f'The tfrecord {shard[PATH]} has no offset index. ' \
+                               f'Only uncompressed tfrecords written via record_shards have it.'
+        indices.append(os.path.join(manifest_dir, shard[INDEX]))
+    return indices
@@ -15,8 +15,84 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
+import numpy as np
 import tensorflow as tf
 
+# TensorFlow's DataType enum values (see tensorflow/core/framework/types.proto)
+_NP_TO_TF_DTYPE = {
+    np.dtype(np.float32): 1,
+    np.dtype(np.float64): 2,
+    np.dtype(np.int32): 3,
+    np.dtype(np.uint8): 4,
+    np.dtype(np.int16): 5,
+    np.dtype(np.int8): 6,
+    np.dtype(np.complex64): 8,
+    np.dtype(np.int64): 9,
+    np.dtype(np.bool_): 10,
+    np.dtype(np.uint16): 17,
+    np.dtype(np.complex128): 18,
+    np.dtype(np.float16): 19,
+    np.dtype(np.uint32): 22,
+    np.dtype(np.uint64): 23,
+}
+
+# Wire tags of the used TensorProto and TensorShapeProto fields: (field_number << 3) | wire_type
+_TENSOR_DTYPE_TAG = b'\x08'            # TensorProto.dtype = 1, varint
+_TENSOR_SHAPE_TAG = b'\x12'            # TensorProto.tensor_shape = 2, length-delimited
+_TENSOR_CONTENT_TAG = b'\x22'          # TensorProto.tensor_content = 4, length-delimited
+_SHAPE_DIM_TAG = b'\x12'               # TensorShapeProto.dim = 2, length-delimited
+_DIM_SIZE_TAG = b'\x08'                # TensorShapeProto.Dim.size = 1, varint
+
+
+def _encode_varint(value):
+    result = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(bits | 0x80)
+        else:
+            result.append(bits)
+            return bytes(result)
+
+
+def _length_delimited(tag, payload):
+    return tag + _encode_varint(len(payload)) + payload
+
+
+def serialize_ndarray(array: np.ndarray):
+    """
+    Serializes the numpy array into a TensorProto without using TensorFlow. The result is byte-identical
+    to the output of tf.io.serialize_tensor, therefore, it can be parsed with tf.io.parse_tensor.
+
+    Parameters
+    ----------
+    array : np.ndarray
+        Array of a numeric or boolean type.
+
+    Returns
+    -------
+    bytes
+        Serialized TensorProto.
+    """
+    tf_dtype = _NP_TO_TF_DTYPE.get(array.dtype.newbyteorder('='))
+    if tf_dtype is None:
+        raise TypeError(f'Arrays of type {array.dtype} cannot be serialized without TensorFlow.')
+
+    shape = b''.join([
+        # Zero sizes are not written, since they are default values of the field
+        _length_delimited(_SHAPE_DIM_TAG, _DIM_SIZE_TAG + _encode_varint(dim) if dim != 0 else b'')
+        for dim in array.shape
+    ])
+    # TensorFlow stores the tensor content in the little-endian byte order
+    content = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<')).tobytes()
+
+    serialized = _TENSOR_DTYPE_TAG + _encode_varint(tf_dtype) + _length_delimited(_TENSOR_SHAPE_TAG, shape)
+    # Empty content is not written, since it is the default value of the field
+    if len(content) != 0:
+        serialized += _length_delimited(_TENSOR_CONTENT_TAG, content)
+    return serialized
+
 
 def _bytes_feature(value):
     """
@@ -31,12 +107,16 @@ def _bytes_feature(value):
     -------
 
     """
-    if tf.executing_eagerly():
+    if not isinstance(value, bytes) and tf.executing_eagerly():
         value = value.numpy()
     return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
 
 
 def _tensor_to_byte_feature(tensor, sess=None):
+    # Numpy arrays are serialized without TensorFlow, so no ops are added to the graph
+    if isinstance(tensor, (np.ndarray, np.generic)) and tensor.dtype.newbyteorder('=') in _NP_TO_TF_DTYPE:
+        return _bytes_feature(serialize_ndarray(np.asarray(tensor)))
+
     serialized_image = tf.io.serialize_tensor(tensor)
     if sess is not None:
         serialized_image = sess.run(serialized_image)
@@ -52,3 +132,100 @@ def _float_feature(value):
 def _int64_feature(value):
     return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
 
+
+# Image encodings
+ENCODING_TENSOR = 'tensor'
+ENCODING_RAW_UINT8 = 'raw_uint8'
+ENCODING_PNG = 'png'
+ENCODING_JPEG = 'jpeg'
+IMAGE_ENCODINGS = (ENCODING_TENSOR, ENCODING_RAW_UINT8, ENCODING_PNG, ENCODING_JPEG)
+
+
+def _image_to_uint8(image, sess=None):
+    if not isinstance(image, (np.ndarray, np.generic)):
+        image = sess.run(image) if sess is not None else np.asarray(image)
+    # Round the values instead of truncating them, so float images in [0, 255] are stored exactly
+    if image.dtype != np.uint8:
+        image = np.clip(np.round(image), 0, 255).astype(np.uint8)
+    return image
+
+
+def _image_to_byte_feature(image, encoding=ENCODING_TENSOR, sess=None, jpeg_quality=95):
+    """
+    Serializes the image using the given encoding.
+
+    Parameters
+    ----------
+    image : np.ndarray or tf.Tensor
+        Image of shape [h, w, c]. For the compact encodings it must have values in [0, 255].
+    encoding : str
+        ENCODING_TENSOR - the image is stored as is, as a serialized tensor.
+        ENCODING_RAW_UINT8 - the image is stored as uint8 bytes, 4x smaller than float32.
+        ENCODING_PNG - the image is stored as lossless PNG.
+        ENCODING_JPEG - the image is stored as lossy JPEG, the smallest option.
+    sess : tf.Session
+        Used to evaluate the image if it is a graph tensor.
+    jpeg_quality : int
+        Quality of the JPEG compression, from 0 to 100.
+
+    Returns
+    -------
+    tf.train.Feature
+    """
+    assert encoding in IMAGE_ENCODINGS, f'Unknown image encoding: {encoding}'
+    if encoding == ENCODING_TENSOR:
+        return _tensor_to_byte_feature(image, sess)
+
+    image = _image_to_uint8(image, sess)
+    if encoding == ENCODING_RAW_UINT8:
+        return _bytes_feature(np.ascontiguousarray(image).tobytes())
+
+    # OpenCV is imported only if it is really used
+    import cv2
+    # OpenCV treats the channels as BGR(A), swap them so the image is decoded in the original order
+    if image.ndim == 3 and image.shape[-1] in (3, 4):
+        image = np.concatenate([image[..., 2::-1], image[..., 3:]], axis=-1)
+    if encoding == ENCODING_PNG:
+        success, encoded = cv2.imencode('.png', image)
+    else:
+        success, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    assert success, f'Could not encode the image with {encoding} encoding.'
+    return _bytes_feature(encoded.tobytes())
+
+
+def _decode_image_feature(serialized_image, image_shape, encoding=ENCODING_TENSOR, dtype=tf.float32):
+    """
+    Decodes the image serialized by `_image_to_byte_feature`. Meant to be used inside the tf.data map stage.
+
+    Parameters
+    ----------
+    serialized_image : tf.Tensor
+        String tensor with the serialized image.
+    image_shape : list
+        Shape of the image [h, w, c].
+    encoding : str
+        Encoding used when the image was written.
+    dtype : tf.dtypes
+        If `encoding` is ENCODING_TENSOR, it is the type of the stored tensor.
+        Otherwise, the decoded uint8 image is cast to this type.
+
+    Returns
+    -------
+    tf.Tensor
+        The image of shape `image_shape`.
+    """
+    assert encoding in IMAGE_ENCODINGS, f'Unknown image encoding: {encoding}'
+    if encoding == ENCODING_TENSOR:
+        image = tf.io.parse_tensor(serialized_image, out_type=dtype)
+    else:
+        if encoding == ENCODING_RAW_UINT8:
+            image = tf.reshape(tf.io.decode_raw(serialized_image, tf.uint8), image_shape)
+        elif encoding == ENCODING_PNG:
+            image = tf.image.decode_png(serialized_image, channels=image_shape[-1])
+        else:
+            image = tf.image.decode_jpeg(serialized_image, channels=image_shape[-1])
+        image = tf.cast(image, dtype=dtype)
+
+    # Give the image its shape because it doesn't have it right after being extracted
+    image.set_shape(image_shape)
+    return image
@@ -17,11 +17,9 @@
 
 from __future__ import absolute_import
 import tensorflow as tf
-from makiflow.generators.pipeline.tfr.utils import _tensor_to_byte_feature
-
-# Save form
-SAVE_FORM = "{0}_{1}.tfrecord"
-
+from functools import partial
+from makiflow.generators.pipeline.tfr.utils import _tensor_to_byte_feature, _image_to_byte_feature, ENCODING_TENSOR
+from makiflow.generators.pipeline.tfr.tfr_writer import record_shards
 
 # Feature names
 INPUT_X_FNAME = 'INPUT_X_FNAME'
@@ -30,9 +28,11 @@ WEIGHT_MASK_FNAME = 'WEIGHT_MASK_FNAME'
 
 
 # Serialize Object Detection Data Point
-def serialize_regressor_data_point(input_tensor, target_tensor, weight_mask_tensor=None, sess=None):
+def serialize_regressor_data_point(
+        input_tensor, target_tensor, weight_mask_tensor=None, sess=None, input_encoding=ENCODING_TENSOR
+):
     feature = {
-        INPUT_X_FNAME: _tensor_to_byte_feature(input_tensor, sess),
+        INPUT_X_FNAME: _image_to_byte_feature(input_tensor, input_encoding, sess),
         TARGET_X_FNAME: _tensor_to_byte_feature(target_tensor, sess)
     }
 
@@ -44,7 +44,9 @@ def serialize_regressor_data_point(input_tensor, target_tensor, weight_mask_tens
     return example_proto.SerializeToString()
 
 
-def record_regressor_train_data(input_tensors, target_tensors, weight_mask_tensors, tfrecord_path, sess=None):
+def record_regressor_train_data(
+        input_tensors, target_tensors, weight_mask_tensors, tfrecord_path, sess=None, input_encoding=ENCODING_TENSOR
+):
     with tf.io.TFRecordWriter(tfrecord_path) as writer:
         for i, (input_tensor, target_tensor) in enumerate(zip(input_tensors, target_tensors)):
 
@@ -57,14 +59,16 @@ def record_regressor_train_data(input_tensors, target_tensors, weight_mask_tenso
                 input_tensor=input_tensor,
                 target_tensor=target_tensor,
                 weight_mask_tensor=weight_mask_tensor,
-                sess=sess
+                sess=sess,
+                input_encoding=input_encoding
             )
             writer.write(serialized_data_point)
 
 
 # Record data into multiple tfrecords
 def record_mp_regressor_train_data(input_tensors, target_tensors, prefix,
-                                   dp_per_record, weight_mask_tensors=None, sess=None):
+                                   dp_per_record, weight_mask_tensors=None, sess=None,
+                                   compression=None, n_workers=1, input_encoding=ENCODING_TENSOR):
     """
     Creates tfrecord dataset where each tfrecord contains `dp_per_second` data points
 
@@ -83,24 +87,34 @@ def record_mp_regressor_train_data(input_tensors, target_tensors, prefix,
         yields tfrecords of size 300-200 megabytes.
     sess : tf.Session
         In case if you can't or don't want to run TensorFlow eagerly, you can pass in the session object.
+        Can't be used with several `n_workers`.
     weight_mask_tensors : list or ndarray
         Array of weight masks. By default equal to None, i. e. not used in recording data.
+    compression : str
+        Compression type of the tfrecords: 'GZIP', 'ZLIB' or None.
+    n_workers : int
+        Number of processes writing the tfrecords.
+    input_encoding : str
+        Encoding of the input images: ENCODING_TENSOR (tensors as is), ENCODING_RAW_UINT8, ENCODING_PNG
+        or ENCODING_JPEG. The compact encodings require the inputs to be images with values in [0, 255].
+        The same encoding must be passed to the LoadDataMethod.
+
+    Returns
+    -------
+    str
+        Path to the manifest file (`prefix`_manifest.json) with the number of records in each tfrecord.
     """
-    for i in range(len(input_tensors) // dp_per_record):
-        input_tensor = input_tensors[dp_per_record * i: (i + 1) * dp_per_record]
-        target_tensor = target_tensors[dp_per_record * i: (i + 1) * dp_per_record]
-
-        if weight_mask_tensors is not None:
-            weight_mask_tensor = weight_mask_tensors[dp_per_record * i: (i + 1) * dp_per_record]
-        else:
-            weight_mask_tensor = None
-
-        tfrecord_name = SAVE_FORM.format(prefix, i)
-
-        record_regressor_train_data(
-            input_tensors=input_tensor,
-            target_tensors=target_tensor,
-            weight_mask_tensors=weight_mask_tensor,
-            tfrecord_path=tfrecord_name,
-            sess=sess
-        )
+    assert sess is None or n_workers == 1, 'The session can be used only with a single worker.'
+    if weight_mask_tensors is None:
+        weight_mask_tensors = [None] * len(input_tensors)
+
+    serialize_fn = partial(serialize_regressor_data_point, sess=sess, input_encoding=input_encoding)
+
+    return record_shards(
+        serialize_fn=serialize_fn,
+        columns=[input_tensors, target_tensors, weight_mask_tensors],
+        prefix=prefix,
+        dp_per_record=dp_per_record,
+        compression=compression,
+        n_workers=n_workers
+    )
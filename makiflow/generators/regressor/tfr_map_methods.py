@@ -16,6 +16,7 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 from makiflow.generators.pipeline.tfr.tfr_map_method import TFRMapMethod, TFRPostMapMethod
+from makiflow.generators.pipeline.tfr.utils import _decode_image_feature, ENCODING_TENSOR
 from .data_preparation import INPUT_X_FNAME, TARGET_X_FNAME, WEIGHT_MASK_FNAME
 import tensorflow as tf
 
@@ -34,7 +35,8 @@ class LoadDataMethod(TFRMapMethod):
             weight_mask_shape=None,
             input_x_dtype=tf.float32,
             target_x_dtype=tf.float32,
-            weight_mask_dtype=tf.float32
+            weight_mask_dtype=tf.float32,
+            input_x_encoding=ENCODING_TENSOR
     ):
         """
         Method to load data from records
@@ -53,6 +55,9 @@ class LoadDataMethod(TFRMapMethod):
             Type of target tensor. By default equal to tf.float32
         weight_mask_dtype : tf.dtypes
             Type of target tensor. By default equal to tf.float32
+        input_x_encoding : str
+            Encoding the input tensors were written with, see `record_mp_regressor_train_data`. If the inputs are
+            stored compactly (uint8, PNG or JPEG), they are decoded and cast to `input_x_dtype`.
         """
         self.input_x_shape = input_x_shape
         self.target_x_shape = target_x_shape
@@ -62,6 +67,8 @@ class LoadDataMethod(TFRMapMethod):
         self.target_x_dtype = target_x_dtype
         self.weight_mask_dtype = weight_mask_dtype
 
+        self.input_x_encoding = input_x_encoding
+
     def read_record(self, serialized_example):
         r_feature_description = {
             INPUT_X_FNAME: tf.io.FixedLenFeature((), tf.string),
@@ -74,7 +81,9 @@ class LoadDataMethod(TFRMapMethod):
         example = tf.io.parse_single_example(serialized_example, r_feature_description)
 
         # Extract the data from the example
-        input_tensor = tf.io.parse_tensor(example[INPUT_X_FNAME], out_type=self.input_x_dtype)
+        input_tensor = _decode_image_feature(
+            example[INPUT_X_FNAME], self.input_x_shape, self.input_x_encoding, self.input_x_dtype
+        )
         target_tensor = tf.io.parse_tensor(example[TARGET_X_FNAME], out_type=self.target_x_dtype)
 
         if self.weight_mask_shape is not None:
@@ -83,7 +92,6 @@ class LoadDataMethod(TFRMapMethod):
             weights_mask_tensor = None
 
         # Give the data its shape because it doesn't have it right after being extracted
-        input_tensor.set_shape(self.input_x_shape)
         target_tensor.set_shape(self.target_x_shape)
 
         if weights_mask_tensor is not None:
@@ -16,7 +16,6 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 from __future__ import absolute_import
-import tensorflow as tf
 from makiflow.generators.pipeline.gen_base import GenLayer
 from makiflow.generators.segmentator.map_methods import SegmentIterator
 from makiflow.generators.segmentator.pathgenerator import SegmentPathGenerator
@@ -45,7 +44,8 @@ class InputGenLayer(GenLayer):
             Method for mapping paths to the actual data.
         num_parallel_calls : int
             Represents the number of elements to process asynchronously in parallel.
-            If not specified, elements will be processed sequentially.
+            If not specified, elements will be processed sequentially. Set to tf.data.experimental.AUTOTUNE
+            to let tf.data pick the parallelism.
         """
         self.prefetch_size = prefetch_size
         self.batch_size = batch_size
@@ -56,14 +56,8 @@ class InputGenLayer(GenLayer):
         )
 
     def build_iterator(self, gen: SegmentPathGenerator, map_operation: MapMethod, num_parallel_calls):
-        dataset = tf.data.Dataset.from_generator(
-            gen.next_element,
-            output_types={
-                SegmentPathGenerator.IMAGE: tf.string,
-                SegmentPathGenerator.MASK: tf.string
-            }
-        )
-
+        # The standard generators provide the paths from the graph, so the map stage is not limited by the GIL
+        dataset = gen.get_path_dataset()
         dataset = dataset.map(map_func=map_operation.load_data, num_parallel_calls=num_parallel_calls)
         # Set `drop_remainder` to True since otherwise the batch dimension
         # would be None. Example: [None, 1024, 1024, 3]
@@ -105,6 +105,94 @@ class LoadDataMethod(MapMethod):
         }
 
 
+class LoadDecodeCropMethod(MapMethod):
+    def __init__(self, crop_size, image_channels=3, mask_channels=1, random_crop=True):
+        """
+        Loads a crop of the image and the same crop of the mask. JPEG images are decoded only within
+        the crop window (the image size is read from the JPEG header), which is much cheaper than decoding
+        the whole image when the crop is small. Other formats are decoded fully and then cropped.
+        The masks are decoded fully, they must have the same size as the images.
+        Can be used for classification as well: set `mask_channels` to None, then only the image is loaded
+        and the rest of the element (labels, for example) is passed through as is.
+
+        Parameters
+        ----------
+        crop_size : list
+            [crop height, crop width]. Must not exceed the size of the images.
+        image_channels : int
+            Number of channels in the loaded image.
+        mask_channels : int
+            Number of channels in the loaded mask. Set to None if there are no masks.
+        random_crop : bool
+            If True, the crop window is sampled uniformly for each image. Otherwise the central crop is taken.
+        """
+        self.crop_size = crop_size
+        self.image_channels = image_channels
+        self.mask_channels = mask_channels
+        self.random_crop = random_crop
+
+    def _get_offset(self, image_size):
+        crop_size = tf.constant(self.crop_size, dtype=tf.int32)
+        check = tf.assert_greater_equal(
+            image_size, crop_size, message='The crop size exceeds the image size.'
+        )
+        with tf.control_dependencies([check]):
+            max_offset = image_size - crop_size
+
+        if not self.random_crop:
+            return max_offset // 2
+
+        # This is an adapted code from the original TensorFlow's `random_crop` method
+        return tf.random_uniform(shape=[2], dtype=tf.int32, maxval=tf.int32.max) % (max_offset + 1)
+
+    def _load_image(self, img_file):
+        crop_size = tf.constant(self.crop_size, dtype=tf.int32)
+
+        def decode_and_crop_jpeg():
+            # Reads only the header
+            image_size = tf.image.extract_jpeg_shape(img_file)[:2]
+            offset = self._get_offset(image_size)
+            window = tf.concat([offset, crop_size], axis=0)
+            img = tf.image.decode_and_crop_jpeg(img_file, window, channels=self.image_channels)
+            return img, offset
+
+        def decode_and_crop():
+            img = tf.image.decode_image(img_file, channels=self.image_channels)
+            img.set_shape([None, None, self.image_channels])
+            offset = self._get_offset(tf.shape(img)[:2])
+            img = tf.slice(img, tf.concat([offset, [0]], axis=0), tf.concat([crop_size, [-1]], axis=0))
+            return img, offset
+
+        img, offset = tf.cond(tf.image.is_jpeg(img_file), decode_and_crop_jpeg, decode_and_crop)
+        img.set_shape(list(self.crop_size) + [self.image_channels])
+        return img, offset
+
+    def load_data(self, data_paths):
+        img_file = tf.read_file(data_paths[SegmentIterator.IMAGE])
+        img, offset = self._load_image(img_file)
+
+        element = {
+            key: value for key, value in data_paths.items()
+            if key not in (SegmentIterator.IMAGE, SegmentIterator.MASK)
+        }
+        element[SegmentIterator.IMAGE] = tf.cast(img, dtype=tf.float32)
+
+        if self.mask_channels is not None:
+            mask_file = tf.read_file(data_paths[SegmentIterator.MASK])
+            mask = tf.image.decode_image(mask_file, channels=self.mask_channels)
+            mask.set_shape([None, None, self.mask_channels])
+            # The mask is cut with the same window as the image
+            mask = tf.slice(
+                mask,
+                tf.concat([offset, [0]], axis=0),
+                tf.concat([tf.constant(self.crop_size, dtype=tf.int32), [-1]], axis=0)
+            )
+            mask.set_shape(list(self.crop_size) + [self.mask_channels])
+            element[SegmentIterator.MASK] = tf.cast(mask, dtype=tf.int32)
+
+        return element
+
+
 class ResizePostMethod(PostMapMethod):
     def __init__(self, image_size=None, mask_size=None, image_resize_method=tf.image.ResizeMethod.BILINEAR,
                  mask_resize_method=tf.image.ResizeMethod.NEAREST_NEIGHBOR):
@@ -20,6 +20,7 @@ from makiflow.generators.pipeline.gen_base import PathGenerator
 from glob import glob
 import os
 import numpy as np
+import tensorflow as tf
 from sklearn.utils import shuffle
 
 
@@ -27,6 +28,30 @@ class SegmentPathGenerator(PathGenerator, ABC):
     IMAGE = 'image'
     MASK = 'mask'
 
+    def get_path_dataset(self):
+        """
+        Returns
+        -------
+        tf.data.Dataset
+            Endless dataset of dictionaries { IMAGE: image path, MASK: mask path }. By default it is built
+            from `next_element`, which runs in Python. The standard generators build it from in-graph tensors
+            of the paths instead, so the pipeline does not hold the GIL.
+        """
+        return tf.data.Dataset.from_generator(
+            self.next_element,
+            output_types={
+                SegmentPathGenerator.IMAGE: tf.string,
+                SegmentPathGenerator.MASK: tf.string
+            }
+        )
+
+    @staticmethod
+    def _paths_to_dataset(images, masks):
+        return tf.data.Dataset.from_tensor_slices({
+            SegmentPathGenerator.IMAGE: images,
+            SegmentPathGenerator.MASK: masks
+        })
+
 
 class CyclicGeneratorSegment(SegmentPathGenerator):
     def __init__(self, path_images, path_masks):
@@ -58,6 +83,11 @@ class CyclicGeneratorSegment(SegmentPathGenerator):
 
             yield el
 
+    def get_path_dataset(self):
+        # The paths are reshuffled on every pass
+        dataset = SegmentPathGenerator._paths_to_dataset(self.images, self.masks)
+        return dataset.shuffle(buffer_size=len(self.images), reshuffle_each_iteration=True).repeat()
+
 
 class RandomGeneratorSegment(SegmentPathGenerator):
     def __init__(self, path_images, path_masks):
@@ -85,6 +115,20 @@ class RandomGeneratorSegment(SegmentPathGenerator):
 
             yield el
 
+    def get_path_dataset(self):
+        # The constants are created once and captured by the map function
+        images = tf.constant(self.images)
+        masks = tf.constant(self.masks)
+
+        def sample(_):
+            index = tf.random.uniform([], maxval=len(self.images), dtype=tf.int32)
+            return {
+                SegmentPathGenerator.IMAGE: tf.gather(images, index),
+                SegmentPathGenerator.MASK: tf.gather(masks, index)
+            }
+
+        return tf.data.Dataset.from_tensors(0).repeat().map(sample)
+
 
 class SubCyclicGeneratorSegment(SegmentPathGenerator):
     def __init__(self, path_batches_images, path_batches_masks):
@@ -130,3 +174,16 @@ class SubCyclicGeneratorSegment(SegmentPathGenerator):
             current_batch = (current_batch + 1) % len(self.batches_images)
 
             yield el
+
+    def get_path_dataset(self):
+        # Each group is cycled independently and reshuffled on every pass over it
+        groups = [
+            SegmentPathGenerator._paths_to_dataset(images, masks)
+            .shuffle(buffer_size=len(images), reshuffle_each_iteration=True)
+            .repeat()
+            for images, masks in zip(self.batches_images, self.batches_masks)
+        ]
+        # Every round takes one element from each group, the order of the groups is reshuffled every round
+        n_groups = len(groups)
+        choice = tf.data.Dataset.range(n_groups).shuffle(buffer_size=n_groups, reshuffle_each_iteration=True).repeat()
+        return tf.data.experimental.choose_from_datasets(groups, choice)
@@ -17,7 +17,9 @@
 
 from __future__ import absolute_import
 import tensorflow as tf
-from makiflow.generators.pipeline.tfr.utils import _tensor_to_byte_feature
+from functools import partial
+from makiflow.generators.pipeline.tfr.utils import _tensor_to_byte_feature, _image_to_byte_feature, ENCODING_TENSOR
+from makiflow.generators.pipeline.tfr.tfr_writer import record_shards
 
 # Feature names
 IMAGE_FNAME = 'IMAGE'
@@ -40,9 +42,9 @@ LABEL_LEN_FNAME = 'LABEL_LEN'
 
 
 # Serialize Object Detection Data Point
-def serialize_od_data_point(image, loc_mask, loc, label):
+def serialize_od_data_point(image, loc_mask, loc, label, image_encoding=ENCODING_TENSOR):
     feature = {
-        IMAGE_FNAME: _tensor_to_byte_feature(image),
+        IMAGE_FNAME: _image_to_byte_feature(image, image_encoding),
         LOC_MASK_FNAME: _tensor_to_byte_feature(loc_mask),
         LOC_FNAME: _tensor_to_byte_feature(loc),
         LABEL_FNAME: _tensor_to_byte_feature(label)
@@ -52,15 +54,18 @@ def serialize_od_data_point(image, loc_mask, loc, label):
     return example_proto.SerializeToString()
 
 
-def record_od_train_data(images, loc_masks, locs, labels, tfrecord_path):
+def record_od_train_data(images, loc_masks, locs, labels, tfrecord_path, image_encoding=ENCODING_TENSOR):
     with tf.io.TFRecordWriter(tfrecord_path) as writer:
         for image, loc_mask, loc, label in zip(images, loc_masks, locs, labels):
-            serialized_data_point = serialize_od_data_point(image, loc_mask, loc, label)
+            serialized_data_point = serialize_od_data_point(image, loc_mask, loc, label, image_encoding)
             writer.write(serialized_data_point)
 
 
 # Record data into multiple tfrecords
-def record_mp_od_train_data(images, loc_masks, locs, labels, prefix, dp_per_record):
+def record_mp_od_train_data(
+        images, loc_masks, locs, labels, prefix, dp_per_record, compression=None, n_workers=1,
+        image_encoding=ENCODING_TENSOR
+):
     """
     Creates tfrecord dataset where each tfrecord contains `dp_per_second` data points.
     Parameters
@@ -80,18 +85,25 @@ def record_mp_od_train_data(images, loc_masks, locs, labels, prefix, dp_per_reco
         Data point per tfrecord. Defines how many images (locs, loc_masks, labels) will be
         put into one tfrecord file. It's better to use such `dp_per_record` that
         yields tfrecords of size 300-200 megabytes.
-    """
-    for i in range(len(images) // dp_per_record):
-        image_batch = images[dp_per_record*i: (i+1)*dp_per_record]
-        loc_mask_batch = loc_masks[dp_per_record*i: (i+1)*dp_per_record]
-        loc_batch = locs[dp_per_record*i: (i+1)*dp_per_record]
-        label_batch = labels[dp_per_record*i: (i+1)*dp_per_record]
-        tfrecord_name = f'{prefix}_{i}.tfrecord'
-        record_od_train_data(
-            images=image_batch,
-            loc_masks=loc_mask_batch,
-            locs=loc_batch,
-            labels=label_batch,
-            tfrecord_path=tfrecord_name
-        )
+    compression : str
+        Compression type of the tfrecords: 'GZIP', 'ZLIB' or None.
+    n_workers : int
+        Number of processes writing the tfrecords.
+    image_encoding : str
+        Encoding of the images: ENCODING_TENSOR (float tensors as is), ENCODING_RAW_UINT8, ENCODING_PNG
+        or ENCODING_JPEG. The compact encodings require the images to have values in [0, 255].
+        The same encoding must be passed to the LoadDataMethod.
 
+    Returns
+    -------
+    str
+        Path to the manifest file (`prefix`_manifest.json) with the number of records in each tfrecord.
+    """
+    return record_shards(
+        serialize_fn=partial(serialize_od_data_point, image_encoding=image_encoding),
+        columns=[images, loc_masks, locs, labels],
+        prefix=prefix,
+        dp_per_record=dp_per_record,
+        compression=compression,
+        n_workers=n_workers
+    )
@@ -18,6 +18,7 @@
 from __future__ import absolute_import
 import tensorflow as tf
 from makiflow.generators.pipeline.tfr.tfr_map_method import TFRMapMethod
+from makiflow.generators.pipeline.tfr.utils import _decode_image_feature, ENCODING_TENSOR
 from makiflow.generators.ssd.data_preparation import IMAGE_FNAME, LABEL_FNAME, LOC_FNAME, LOC_MASK_FNAME
 
 
@@ -38,8 +39,34 @@ class LoadDataMethod(TFRMapMethod):
             image_dtype=tf.float32,
             label_dtype=tf.int32,
             loc_dtype=tf.float32,
-            loc_mask_dtype=tf.float32
+            loc_mask_dtype=tf.float32,
+            image_encoding=ENCODING_TENSOR
     ):
+        """
+        Method to load data from records
+
+        Parameters
+        ----------
+        image_shape : tuple or list
+            Shape of the image.
+        label_shape : tuple or list
+            Shape of the label vector.
+        loc_shape : tuple or list
+            Shape of the localization vector.
+        loc_mask_shape : tuple or list
+            Shape of the localization mask.
+        image_dtype : tf.dtypes
+            Type of the image. By default equal to tf.float32
+        label_dtype : tf.dtypes
+            Type of the label vector. By default equal to tf.int32
+        loc_dtype : tf.dtypes
+            Type of the localization vector. By default equal to tf.float32
+        loc_mask_dtype : tf.dtypes
+            Type of the localization mask. By default equal to tf.float32
+        image_encoding : str
+            Encoding the images were written with, see `record_mp_od_train_data`. If the images are
+            stored compactly (uint8, PNG or JPEG), they are decoded and cast to `image_dtype`.
+        """
         self.image_shape = image_shape
         self.label_shape = label_shape
         self.loc_shape = loc_shape
@@ -50,6 +77,8 @@ class LoadDataMethod(TFRMapMethod):
         self.loc_dtype = loc_dtype
         self.loc_mask_dtype = loc_mask_dtype
 
+        self.image_encoding = image_encoding
+
     def read_record(self, serialized_example):
         ssd_feature_description = {
             IMAGE_FNAME: tf.io.FixedLenFeature((), tf.string),
@@ -61,13 +90,12 @@ class LoadDataMethod(TFRMapMethod):
         example = tf.io.parse_single_example(serialized_example, ssd_feature_description)
 
         # Extract the data from the example
-        image = tf.io.parse_tensor(example[IMAGE_FNAME], out_type=self.image_dtype)
+        image = _decode_image_feature(example[IMAGE_FNAME], self.image_shape, self.image_encoding, self.image_dtype)
         label = tf.io.parse_tensor(example[LABEL_FNAME], out_type=self.label_dtype)
         loc = tf.io.parse_tensor(example[LOC_FNAME], out_type=self.loc_dtype)
         loc_mask = tf.io.parse_tensor(example[LOC_MASK_FNAME], out_type=self.loc_mask_dtype)
 
         # Give the data its shape because it doesn't have it right after being extracted
-        image.set_shape(self.image_shape)
         label.set_shape(self.label_shape)
         loc.set_shape(self.loc_shape)
         loc_mask.set_shape(self.loc_mask_shape)
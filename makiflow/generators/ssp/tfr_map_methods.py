@@ -0,0 +1,108 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+import tensorflow as tf
+from makiflow.generators.pipeline.tfr.tfr_map_method import TFRMapMethod
+from makiflow.generators.pipeline.tfr.utils import _decode_image_feature, ENCODING_TENSOR
+from makiflow.generators.ssp.data_preparation import IMAGE_FNAME, LABEL_FNAME, LOC_FNAME, LOC_MASK_FNAME
+
+
+class SSPIterator:
+    LOC = 'loc'
+    LOC_MASK = 'loc_mask'
+    LABEL = 'label'
+    IMAGE = 'IMAGE'
+
+
+class LoadDataMethod(TFRMapMethod):
+    def __init__(
+            self,
+            image_shape,
+            label_shape,
+            loc_shape,
+            loc_mask_shape,
+            image_dtype=tf.float32,
+            label_dtype=tf.int32,
+            loc_dtype=tf.float32,
+            loc_mask_dtype=tf.float32,
+            image_encoding=ENCODING_TENSOR
+    ):
+        """
+        Method to load data from records
+
+        Parameters
+        ----------
+        image_shape : tuple or list
+            Shape of the image.
+        label_shape : tuple or list
+            Shape of the label vector.
+        loc_shape : tuple or list
+            Shape of the localization vector.
+        loc_mask_shape : tuple or list
+            Shape of the localization mask.
+        image_dtype : tf.dtypes
+            Type of the image. By default equal to tf.float32
+        label_dtype : tf.dtypes
+            Type of the label vector. By default equal to tf.int32
+        loc_dtype : tf.dtypes
+            Type of the localization vector. By default equal to tf.float32
+        loc_mask_dtype : tf.dtypes
+            Type of the localization mask. By default equal to tf.float32
+        image_encoding : str
+            Encoding the images were written with, see `record_mp_od_train_data`. If the images are
+            stored compactly (uint8, PNG or JPEG), they are decoded and cast to `image_dtype`.
+        """
+        self.image_shape = image_shape
+        self.label_shape = label_shape
+        self.loc_shape = loc_shape
+        self.loc_mask_shape = loc_mask_shape
+
+        self.image_dtype = image_dtype
+        self.label_dtype = label_dtype
+        self.loc_dtype = loc_dtype
+        self.loc_mask_dtype = loc_mask_dtype
+
+        self.image_encoding = image_encoding
+
+    def read_record(self, serialized_example):
+        ssp_feature_description = {
+            IMAGE_FNAME: tf.io.FixedLenFeature((), tf.string),
+            LABEL_FNAME: tf.io.FixedLenFeature((), tf.string),
+            LOC_FNAME: tf.io.FixedLenFeature((), tf.string),
+            LOC_MASK_FNAME: tf.io.FixedLenFeature((), tf.string)
+        }
+
+        example = tf.io.parse_single_example(serialized_example, ssp_feature_description)
+
+        # Extract the data from the example
+        image = _decode_image_feature(example[IMAGE_FNAME], self.image_shape, self.image_encoding, self.image_dtype)
+        label = tf.io.parse_tensor(example[LABEL_FNAME], out_type=self.label_dtype)
+        loc = tf.io.parse_tensor(example[LOC_FNAME], out_type=self.loc_dtype)
+        loc_mask = tf.io.parse_tensor(example[LOC_MASK_FNAME], out_type=self.loc_mask_dtype)
+
+        # Give the data its shape because it doesn't have it right after being extracted
+        label.set_shape(self.label_shape)
+        loc.set_shape(self.loc_shape)
+        loc_mask.set_shape(self.loc_mask_shape)
+
+        return {
+            SSPIterator.IMAGE: image,
+            SSPIterator.LOC: loc,
+            SSPIterator.LOC_MASK: loc_mask,
+            SSPIterator.LABEL: label
+        }
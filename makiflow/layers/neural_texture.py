@@ -35,10 +35,11 @@ class SingleTextureLayer(MakiLayer):
         self._h = height
         self._num_f = num_f
 
-        if text_init is None:
-            text_init = np.random.randn(1, height, width, num_f).astype(np.float32)
         self._text_name = SingleTextureLayer.TEXTURE_NAME.format(width, height, name)
-        self._texture = tf.Variable(text_init, name=self._text_name)
+        self._texture = MakiLayer.create_variable(
+            self._text_name, shape=[1, height, width, num_f],
+            init_fn=lambda: np.random.randn(1, height, width, num_f), value=text_init
+        )
         params = [self._texture]
         named_params_dict = {self._text_name: self._texture}
         regularize_params = [self._texture]
@@ -407,8 +407,10 @@ class EmbeddingLayer(MakiLayer):
         self._num_embeddings = num_embeddings
         self._dim = dim
         name = 'Embedding_' + str(name)
-        embed = np.random.randn(num_embeddings, dim) * np.sqrt(12 / (num_embeddings + dim))
-        self.embed = tf.Variable(embed, name=name, dtype=tf.float32)
+        self.embed = MakiLayer.create_variable(
+            name, shape=[num_embeddings, dim],
+            init_fn=lambda: np.random.randn(num_embeddings, dim) * np.sqrt(12 / (num_embeddings + dim))
+        )
 
         params = [self.embed]
         named_params_dict = {name: self.embed}
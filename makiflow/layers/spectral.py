@@ -79,19 +79,19 @@ class FourierConvLayer(MakiLayer):
 
         name = str(name)
 
-        if W is None:
-            W = InitConvKernel.init_by_name(kw, kh, out_f, in_f, kernel_initializer)
-        if b is None:
-            b = np.zeros(out_f)
-
         self.name_conv = self.NAME_CONV_W.format(kw, kh, in_f, out_f, name)
-        self.W = tf.Variable(W.astype(np.float32), name=self.name_conv)
+        self.W = MakiLayer.create_variable(
+            self.name_conv, shape=[kw, kh, in_f, out_f],
+            init_fn=lambda: InitConvKernel.init_by_name(kw, kh, out_f, in_f, kernel_initializer), value=W
+        )
         params = [self.W]
         named_params_dict = {self.name_conv: self.W}
         regularize_params = [self.W]
         if use_bias:
             self.name_bias = self.NAME_BIAS.format(kw, kh, in_f, out_f, name)
-            self.b = tf.Variable(b.astype(np.float32), name=self.name_bias)
+            self.b = MakiLayer.create_variable(
+                self.name_bias, shape=[out_f], init_fn=lambda: np.zeros(out_f), value=b
+            )
             params += [self.b]
             named_params_dict[self.name_bias] = self.b
             if regularize_bias:
@@ -19,7 +19,7 @@ from __future__ import absolute_import
 import numpy as np
 import tensorflow as tf
 
-from makiflow.core.graph_entities.maki_layer import MakiRestorable, MakiLayer
+from makiflow.core.graph_entities.maki_layer import MakiRestorable, MakiLayer, DeferredInit
 from makiflow.layers.activation_converter import ActivationConverter
 from makiflow.core import BatchNormBaseLayer
 from makiflow.layers.utils import InitConvKernel, InitDenseMat
@@ -83,19 +83,19 @@ class ConvLayer(MakiLayer):
 
         name = str(name)
 
-        if W is None:
-            W = InitConvKernel.init_by_name(kw, kh, out_f, in_f, kernel_initializer)
-        if b is None:
-            b = np.zeros(out_f)
-
         self.name_conv = ConvLayer.NAME_CONV_W.format(kw, kh, in_f, out_f, name)
-        self.W = tf.Variable(W.astype(np.float32), name=self.name_conv)
+        self.W = MakiLayer.create_variable(
+            self.name_conv, shape=[kw, kh, in_f, out_f],
+            init_fn=lambda: InitConvKernel.init_by_name(kw, kh, out_f, in_f, kernel_initializer), value=W
+        )
         params = [self.W]
         named_params_dict = {self.name_conv: self.W}
         regularize_params = [self.W]
         if use_bias:
             self.name_bias = ConvLayer.NAME_BIAS.format(kw, kh, in_f, out_f, name)
-            self.b = tf.Variable(b.astype(np.float32), name=self.name_bias)
+            self.b = MakiLayer.create_variable(
+                self.name_bias, shape=[out_f], init_fn=lambda: np.zeros(out_f), value=b
+            )
             params += [self.b]
             named_params_dict[self.name_bias] = self.b
             if regularize_bias:
@@ -224,20 +224,20 @@ class UpConvLayer(MakiLayer):
 
         name = str(name)
 
-        if W is None:
-            W = InitConvKernel.init_by_name(kw, kh, in_f, out_f, kernel_initializer)
-        if b is None:
-            b = np.zeros(out_f)
-
         self.name_conv = UpConvLayer.NAME_CONV_W.format(kw, kh, out_f, in_f, name)
-        self.W = tf.Variable(W.astype(np.float32), name=self.name_conv)
+        self.W = MakiLayer.create_variable(
+            self.name_conv, shape=[kw, kh, out_f, in_f],
+            init_fn=lambda: InitConvKernel.init_by_name(kw, kh, in_f, out_f, kernel_initializer), value=W
+        )
         params = [self.W]
         named_params_dict = {self.name_conv: self.W}
         regularize_params = [self.W]
 
         if use_bias:
             self.name_bias = UpConvLayer.NAME_BIAS.format(kw, kh, in_f, out_f, name)
-            self.b = tf.Variable(b.astype(np.float32), name=self.name_bias)
+            self.b = MakiLayer.create_variable(
+                self.name_bias, shape=[out_f], init_fn=lambda: np.zeros(out_f), value=b
+            )
             params += [self.b]
             named_params_dict[self.name_bias] = self.b
             if regularize_bias:
@@ -337,16 +337,14 @@ class BiasLayer(MakiLayer):
         self.name = name
         self.trainable = trainable
 
-        if b is None:
-            b = np.zeros(D)
-        elif b.shape[0] != D:
+        if b is not None and b.shape[0] != D:
             raise ValueError(f"The initial value of `b` must have the same dimension size as D={D}")
 
         params = []
         regularize_params = []
 
         self.bias_name = BiasLayer.NAME_BIAS.format(D, name)
-        self.b = tf.Variable(b.astype(np.float32), name=self.bias_name)
+        self.b = MakiLayer.create_variable(self.bias_name, shape=[D], init_fn=lambda: np.zeros(D), value=b)
 
         if trainable:
             params = [self.b]
@@ -446,20 +444,20 @@ class DepthWiseConvLayer(MakiLayer):
 
         name = str(name)
 
-        if W is None:
-            W = InitConvKernel.init_by_name(kw, kh, multiplier, in_f, kernel_initializer)
-        if b is None:
-            b = np.zeros(in_f * multiplier)
-
         self.name_conv = DepthWiseConvLayer.NAME_CONV_W.format(kw, kh, in_f, multiplier, name)
-        self.W = tf.Variable(W.astype(np.float32), name=self.name_conv)
+        self.W = MakiLayer.create_variable(
+            self.name_conv, shape=[kw, kh, in_f, multiplier],
+            init_fn=lambda: InitConvKernel.init_by_name(kw, kh, multiplier, in_f, kernel_initializer), value=W
+        )
         params = [self.W]
         named_params_dict = {self.name_conv: self.W}
         regularize_params = [self.W]
 
         if use_bias:
             self.bias_name = DepthWiseConvLayer.NAME_BIAS.format(in_f * multiplier, name)
-            self.b = tf.Variable(b.astype(np.float32), name=self.bias_name)
+            self.b = MakiLayer.create_variable(
+                self.bias_name, shape=[in_f * multiplier], init_fn=lambda: np.zeros(in_f * multiplier), value=b
+            )
             params += [self.b]
             named_params_dict[self.bias_name] = self.b
             if regularize_bias:
@@ -596,17 +594,17 @@ class SeparableConvLayer(MakiLayer):
 
         name = str(name)
 
-        if W_dw is None:
-            W_dw = InitConvKernel.init_by_name(kw, kh, multiplier, in_f, dw_kernel_initializer)
-        if W_pw is None:
-            W_pw = InitConvKernel.init_by_name(1, 1, out_f, multiplier * in_f, pw_kernel_initializer)
-        if b is None:
-            b = np.zeros(out_f)
-
         self.name_DW = SeparableConvLayer.NAME_DW.format(kw, kh, in_f, multiplier, name)
         self.name_PW = SeparableConvLayer.NAME_PW.format(in_f * multiplier, out_f, name)
-        self.W_dw = tf.Variable(W_dw, name=self.name_DW)
-        self.W_pw = tf.Variable(W_pw, name=self.name_PW)
+        self.W_dw = MakiLayer.create_variable(
+            self.name_DW, shape=[kw, kh, in_f, multiplier],
+            init_fn=lambda: InitConvKernel.init_by_name(kw, kh, multiplier, in_f, dw_kernel_initializer), value=W_dw
+        )
+        self.W_pw = MakiLayer.create_variable(
+            self.name_PW, shape=[1, 1, multiplier * in_f, out_f],
+            init_fn=lambda: InitConvKernel.init_by_name(1, 1, out_f, multiplier * in_f, pw_kernel_initializer),
+            value=W_pw
+        )
         params = [self.W_dw, self.W_pw]
         named_params_dict = {
             self.name_DW: self.W_dw,
@@ -615,7 +613,9 @@ class SeparableConvLayer(MakiLayer):
         regularize_params = [self.W_dw, self.W_pw]
         if use_bias:
             self.bias_name = SeparableConvLayer.NAME_BIAS.format(out_f, name)
-            self.b = tf.Variable(b.astype(np.float32), name=self.bias_name)
+            self.b = MakiLayer.create_variable(
+                self.bias_name, shape=[out_f], init_fn=lambda: np.zeros(out_f), value=b
+            )
             params += [self.b]
             named_params_dict[self.bias_name] = self.b
             if regularize_bias:
@@ -730,22 +730,21 @@ class DenseLayer(MakiLayer):
         self.use_bias = use_bias
         self.init_type = mat_initializer
 
-        if W is None:
-            W = InitDenseMat.init_by_name(in_d, out_d, mat_initializer)
-
-        if b is None:
-            b = np.zeros(out_d)
-
         name = str(name)
         self.name_dense = DenseLayer.NAME_DENSE_W.format(in_d, out_d, name)
-        self.W = tf.Variable(W, name=self.name_dense)
+        self.W = MakiLayer.create_variable(
+            self.name_dense, shape=[in_d, out_d],
+            init_fn=lambda: InitDenseMat.init_by_name(in_d, out_d, mat_initializer), value=W
+        )
         params = [self.W]
         named_params_dict = {self.name_dense: self.W}
         regularize_params = [self.W]
 
         if use_bias:
             self.name_bias = DenseLayer.NAME_BIAS.format(in_d, out_d, name)
-            self.b = tf.Variable(b.astype(np.float32), name=self.name_bias)
+            self.b = MakiLayer.create_variable(
+                self.name_bias, shape=[out_d], init_fn=lambda: np.zeros(out_d), value=b
+            )
             params += [self.b]
             named_params_dict[self.name_bias] = self.b
             if regularize_bias:
@@ -861,19 +860,19 @@ class AtrousConvLayer(MakiLayer):
         name = str(name)
         self.name_conv = AtrousConvLayer.NAME_ATROUS_W.format(kw, kh, in_f, out_f, name)
 
-        if W is None:
-            W = InitConvKernel.init_by_name(kw, kh, out_f, in_f, kernel_initializer)
-        if b is None:
-            b = np.zeros(out_f)
-
-        self.W = tf.Variable(W.astype(np.float32), name=self.name_conv)
+        self.W = MakiLayer.create_variable(
+            self.name_conv, shape=[kw, kh, in_f, out_f],
+            init_fn=lambda: InitConvKernel.init_by_name(kw, kh, out_f, in_f, kernel_initializer), value=W
+        )
         params = [self.W]
         named_params_dict = {self.name_conv: self.W}
         regularize_params = [self.W]
 
         if use_bias:
             self.name_bias = AtrousConvLayer.NAME_BIAS.format(kw, kh, in_f, out_f, name)
-            self.b = tf.Variable(b.astype(np.float32), name=self.name_bias)
+            self.b = MakiLayer.create_variable(
+                self.name_bias, shape=[out_f], init_fn=lambda: np.zeros(out_f), value=b
+            )
             params += [self.b]
             named_params_dict[self.name_bias] = self.b
             if regularize_bias:
@@ -982,21 +981,20 @@ class BatchNormLayer(BatchNormBaseLayer):
                          type_norm='Batch', mean=mean, var=var, gamma=gamma, beta=beta, track_running_stats=track_running_stats)
 
     def _init_train_params(self, data):
-        if self.running_mean is None:
-            self.running_mean = np.zeros(self.D)
-        if self.running_variance is None:
-            self.running_variance = np.ones(self.D)
-
+        D = self.D
         name = str(self.get_name())
 
-        self.name_mean = BatchNormLayer.NAME_MEAN.format(self.D, name)
-        self.name_var = BatchNormLayer.NAME_VAR.format(self.D, name)
+        self.name_mean = BatchNormLayer.NAME_MEAN.format(D, name)
+        self.name_var = BatchNormLayer.NAME_VAR.format(D, name)
 
-        self.running_mean = tf.Variable(self.running_mean.astype(np.float32), trainable=False, name=self.name_mean)
+        self.running_mean = MakiLayer.create_variable(
+            self.name_mean, shape=[D], init_fn=lambda: np.zeros(D), value=self.running_mean, trainable=False
+        )
         self._named_params_dict[self.name_mean] = self.running_mean
 
-        self.running_variance = tf.Variable(self.running_variance.astype(np.float32), trainable=False,
-                                            name=self.name_var)
+        self.running_variance = MakiLayer.create_variable(
+            self.name_var, shape=[D], init_fn=lambda: np.ones(D), value=self.running_variance, trainable=False
+        )
         self._named_params_dict[self.name_var] = self.running_variance
 
     def forward(self, X, computation_mode=MakiRestorable.INFERENCE_MODE):
@@ -1049,15 +1047,7 @@ class BatchNormLayer(BatchNormBaseLayer):
 
                 batch_mean, batch_var = tf.nn.moments(X, axes=axes)
 
-                update_running_mean = tf.assign(
-                    self.running_mean,
-                    self.running_mean * self.decay + batch_mean * (1 - self.decay)
-                )
-                update_running_variance = tf.assign(
-                    self.running_variance,
-                    self.running_variance * self.decay + batch_var * (1 - self.decay)
-                )
-                with tf.control_dependencies([update_running_mean, update_running_variance]):
+                with tf.control_dependencies(self._update_running_stats(batch_mean, batch_var)):
                     out = tf.nn.batch_normalization(
                         X,
                         batch_mean,
@@ -1150,32 +1140,28 @@ class GroupNormLayer(BatchNormBaseLayer):
     def _init_train_params(self, data):
         N = data.shape[0]
         shape = data.shape
-        if self.running_mean is None:
-            if len(shape) == 4:
-                # Conv,
-                self.running_mean = np.zeros((N, 1, 1, self.G, 1))
-            elif len(shape) == 2:
-                # Dense
-                self.running_mean = np.zeros((N, self.G, 1))
-
-        if self.running_variance is None:
-            if len(shape) == 4:
-                # Conv
-                self.running_variance = np.ones((N, 1, 1, self.G, 1))
-            elif len(shape) == 2:
-                # Dense
-                self.running_variance = np.ones((N, self.G, 1))
+        if len(shape) == 4:
+            # Conv
+            stats_shape = [N, 1, 1, self.G, 1]
+        elif len(shape) == 2:
+            # Dense
+            stats_shape = [N, self.G, 1]
 
         name = str(self.get_name())
 
         self.name_mean = GroupNormLayer.NAME_MEAN.format(N, self.G, name)
         self.name_var = GroupNormLayer.NAME_VAR.format(N, self.G, name)
 
-        self.running_mean = tf.Variable(self.running_mean.astype(np.float32), trainable=False, name=self.name_mean)
+        self.running_mean = MakiLayer.create_variable(
+            self.name_mean, shape=stats_shape, init_fn=lambda: np.zeros(stats_shape),
+            value=self.running_mean, trainable=False
+        )
         self._named_params_dict[self.name_mean] = self.running_mean
 
-        self.running_variance = tf.Variable(self.running_variance.astype(np.float32), trainable=False,
-                                            name=self.name_var)
+        self.running_variance = MakiLayer.create_variable(
+            self.name_var, shape=stats_shape, init_fn=lambda: np.ones(stats_shape),
+            value=self.running_variance, trainable=False
+        )
         self._named_params_dict[self.name_var] = self.running_variance
 
     def forward(self, X, computation_mode=MakiRestorable.INFERENCE_MODE):
@@ -1239,16 +1225,7 @@ class GroupNormLayer(BatchNormBaseLayer):
                 # Output shape [N, 1, 1, self.G, 1] for Conv and [N, G, 1] for Dense
                 batch_mean, batch_var = tf.nn.moments(X, axes=axes, keep_dims=True)
 
-                update_running_mean = tf.assign(
-                    self.running_mean,
-                    self.running_mean * self.decay + batch_mean * (1 - self.decay)
-                )
-                update_running_variance = tf.assign(
-                    self.running_variance,
-                    self.running_variance * self.decay + batch_var * (1 - self.decay)
-                )
-
-                with tf.control_dependencies([update_running_mean, update_running_variance]):
+                with tf.control_dependencies(self._update_running_stats(batch_mean, batch_var)):
                     X = (X - batch_mean) / tf.sqrt(batch_var + self.eps)
 
                     X = tf.reshape(X, old_shape)
@@ -1339,31 +1316,27 @@ class NormalizationLayer(BatchNormBaseLayer):
     def _init_train_params(self, data):
         N = data.shape[0]
         shape = data.shape
-        if self.running_mean is None:
-            if len(shape) == 4:
-                # Conv
-                self.running_mean = np.zeros((N, 1, 1, 1))
-            elif len(shape) == 2:
-                # Dense
-                self.running_mean = np.zeros((N, 1))
-
-        if self.running_variance is None:
-            if len(shape) == 4:
-                # Conv
-                self.running_variance = np.ones((N, 1, 1, 1))
-            elif len(shape) == 2:
-                # Dense
-                self.running_variance = np.ones((N, 1))
+        if len(shape) == 4:
+            # Conv
+            stats_shape = [N, 1, 1, 1]
+        elif len(shape) == 2:
+            # Dense
+            stats_shape = [N, 1]
 
         name = str(self.get_name())
         self.name_mean = NormalizationLayer.NAME_MEAN.format(N, name)
         self.name_var = NormalizationLayer.NAME_VAR.format(N, name)
 
-        self.running_mean = tf.Variable(self.running_mean.astype(np.float32), trainable=False, name=self.name_mean)
+        self.running_mean = MakiLayer.create_variable(
+            self.name_mean, shape=stats_shape, init_fn=lambda: np.zeros(stats_shape),
+            value=self.running_mean, trainable=False
+        )
         self._named_params_dict[self.name_mean] = self.running_mean
 
-        self.running_variance = tf.Variable(self.running_variance.astype(np.float32), trainable=False,
-                                            name=self.name_var)
+        self.running_variance = MakiLayer.create_variable(
+            self.name_var, shape=stats_shape, init_fn=lambda: np.ones(stats_shape),
+            value=self.running_variance, trainable=False
+        )
         self._named_params_dict[self.name_var] = self.running_variance
 
     def forward(self, X, computation_mode=MakiRestorable.INFERENCE_MODE):
@@ -1418,16 +1391,7 @@ class NormalizationLayer(BatchNormBaseLayer):
                 # Output shape [N, 1, 1, 1] for Conv and [N, 1] for Dense
                 batch_mean, batch_var = tf.nn.moments(X, axes=axes, keep_dims=True)
 
-                update_running_mean = tf.assign(
-                    self.running_mean,
-                    self.running_mean * self.decay + batch_mean * (1 - self.decay)
-                )
-                update_running_variance = tf.assign(
-                    self.running_variance,
-                    self.running_variance * self.decay + batch_var * (1 - self.decay)
-                )
-
-                with tf.control_dependencies([update_running_mean, update_running_variance]):
+                with tf.control_dependencies(self._update_running_stats(batch_mean, batch_var)):
                     X = tf.nn.batch_normalization(
                         X,
                         batch_mean,
@@ -1519,31 +1483,27 @@ class InstanceNormLayer(BatchNormBaseLayer):
         N = data.shape[0]
         # [N H W C] shape
         shape = data.shape
-        if self.running_mean is None:
-            if len(shape) == 4:
-                # Conv
-                self.running_mean = np.zeros((N, 1, 1, shape[-1]))
-            elif len(shape) == 2:
-                # Dense
-                self.running_mean = np.zeros((N, shape[-1]))
-
-        if self.running_variance is None:
-            if len(shape) == 4:
-                # Conv
-                self.running_variance = np.ones((N, 1, 1, shape[-1]))
-            elif len(shape) == 2:
-                # Dense
-                self.running_variance = np.ones((N, shape[-1]))
+        if len(shape) == 4:
+            # Conv
+            stats_shape = [N, 1, 1, shape[-1]]
+        elif len(shape) == 2:
+            # Dense
+            stats_shape = [N, shape[-1]]
 
         name = str(self.get_name())
         self.name_mean = InstanceNormLayer.NAME_MEAN.format(N, shape[-1], name)
         self.name_var = InstanceNormLayer.NAME_VAR.format(N, shape[-1], name)
 
-        self.running_mean = tf.Variable(self.running_mean.astype(np.float32), trainable=False, name=self.name_mean)
+        self.running_mean = MakiLayer.create_variable(
+            self.name_mean, shape=stats_shape, init_fn=lambda: np.zeros(stats_shape),
+            value=self.running_mean, trainable=False
+        )
         self._named_params_dict[self.name_mean] = self.running_mean
 
-        self.running_variance = tf.Variable(self.running_variance.astype(np.float32), trainable=False,
-                                            name=self.name_var)
+        self.running_variance = MakiLayer.create_variable(
+            self.name_var, shape=stats_shape, init_fn=lambda: np.ones(stats_shape),
+            value=self.running_variance, trainable=False
+        )
         self._named_params_dict[self.name_var] = self.running_variance
 
     def forward(self, X, computation_mode=MakiRestorable.INFERENCE_MODE):
@@ -1598,16 +1558,7 @@ class InstanceNormLayer(BatchNormBaseLayer):
                     # Output shape [N, 1, 1, C] for Conv and [N, F] for Dense
                     batch_mean, batch_var = tf.nn.moments(X, axes=axes, keep_dims=True)
 
-                    update_running_mean = tf.assign(
-                        self.running_mean,
-                        self.running_mean * self.decay + batch_mean * (1 - self.decay)
-                    )
-                    update_running_variance = tf.assign(
-                        self.running_variance,
-                        self.running_variance * self.decay + batch_var * (1 - self.decay)
-                    )
-
-                    with tf.control_dependencies([update_running_mean, update_running_variance]):
+                    with tf.control_dependencies(self._update_running_stats(batch_mean, batch_var)):
                         X = tf.nn.batch_normalization(
                             X,
                             batch_mean,
@@ -1673,7 +1624,9 @@ class ScaleLayer(MakiLayer):
 
         regularize_params = []
 
-        self.scale = tf.Variable(init_value, name=self.name_scale, dtype=tf.float32)
+        self.scale = MakiLayer.create_variable(
+            self.name_scale, shape=list(np.shape(init_value)), init_fn=lambda: np.asarray(init_value)
+        )
         if regularize_scale:
             regularize_params = [self.scale]
 
@@ -1752,16 +1705,15 @@ class WeightStandConvLayer(MakiLayer):
         name = str(name)
 
         # CREATE WEIGHTS
-        if W is None:
+        # Both weights must have the same initial value
+        if W is None and not DeferredInit.is_active():
             W = InitConvKernel.init_by_name(kw, kh, out_f, in_f, kernel_initializer)
-        if b is None:
-            b = np.zeros(out_f)
 
         self.name_conv = ConvLayer.NAME_CONV_W.format(kw, kh, in_f, out_f, name)
         # Inference weights
-        self.W_infer = tf.Variable(W.astype(np.float32), name=self.name_conv)
+        self.W_infer = MakiLayer.create_variable(self.name_conv, shape=[kw, kh, in_f, out_f], value=W)
         # Training weights
-        self.W_train = tf.Variable(W.astype(np.float32), name=self.name_conv + '_train')
+        self.W_train = MakiLayer.create_variable(self.name_conv + '_train', shape=[kw, kh, in_f, out_f], value=W)
         params = [self.W_train]
         named_params_dict = {
             self.name_conv: self.W_infer,
@@ -1771,7 +1723,9 @@ class WeightStandConvLayer(MakiLayer):
 
         if use_bias:
             self.name_bias = ConvLayer.NAME_BIAS.format(kw, kh, in_f, out_f, name)
-            self.b = tf.Variable(b.astype(np.float32), name=self.name_bias)
+            self.b = MakiLayer.create_variable(
+                self.name_bias, shape=[out_f], init_fn=lambda: np.zeros(out_f), value=b
+            )
             params += [self.b]
             named_params_dict[self.name_bias] = self.b
             if regularize_bias:
@@ -1881,8 +1835,7 @@ class DummyEmbeddingLayer(MakiLayer):
         self._dim = dim
         self._n_repeat = n_repeat
 
-        embed = np.zeros(shape=[dim], dtype='float32')
-        self._embed = tf.Variable(embed, name=f'{name}_embedding')
+        self._embed = MakiLayer.create_variable(f'{name}_embedding', shape=[dim], init_fn=lambda: np.zeros(dim))
         embed_mat = tf.stack([self._embed]*n_repeat, axis=0)
         # [1, n_repeat, dim]
         self._embed_mat = tf.expand_dims(embed_mat, axis=0)
@@ -18,7 +18,7 @@
 from __future__ import absolute_import
 import numpy as np
 from tqdm import tqdm
-from makiflow.metrics.od_utils import compute_tps, parse_dicts, nms, clear_filtered_preds, merge_nms_result
+from makiflow.metrics.od_utils import compute_tps, parse_dicts, batch_nms, clear_filtered_preds, merge_nms_result
 
 
 def compute_ap(recall, precision):
@@ -180,12 +180,14 @@ def mAP_maki_supported(sdd_preds, iou_threshold, conf_threshold, gboxes, glabels
     # PROCESS THE SSD
     filtered_preds = []
     for confidences, localisations in sdd_preds:
-        for image_confs, image_locs in zip(confidences, localisations):
-            # bboxes, classes, confidences
-            # `bboxes` is a list of ndarrays
-            # `classes` is a list of ints
-            # `confidences` is a list of floats
-            filtered_preds += [nms(image_locs, image_confs, conf_threshold=conf_threshold, iou_threshold=iou_threshold)]
+        # [(bboxes, classes, confidences)] for each image in the batch
+        # `bboxes` is a list of ndarrays
+        # `classes` is a list of ints
+        # `confidences` is a list of floats
+        filtered_preds += batch_nms(
+            np.asarray(localisations), np.asarray(confidences),
+            conf_threshold=conf_threshold, iou_threshold=iou_threshold
+        )
     # Clear the NMS results from empty predictions
     filtered_preds = clear_filtered_preds(filtered_preds)
     # Convert NMS results to separate lists of numpy arrays
@@ -77,7 +77,86 @@ def jaccard_index(boxes_a, boxes_b):
     return iou
 
 
-def nms(pred_bboxes, pred_confs, conf_threshold=0.4, iou_threshold=0.1, background_class=0):
+def jaccard_matrix(boxes_a, boxes_b):
+    """
+    Calculates Jaccard Index for every pair of bounding boxes from `boxes_a` and `boxes_b`.
+
+    Parameters
+    ----------
+    boxes_a : ndarray
+        Array of shape [n, 4]. Bboxes in [x1, y1, x2, y2] format.
+    boxes_b : ndarray
+        Array of shape [m, 4]. Bboxes in [x1, y1, x2, y2] format.
+
+    Returns
+    -------
+    ndarray
+        Array of shape [n, m] where (i, j) element is the Jaccard Index of `boxes_a[i]` and `boxes_b[j]`.
+    """
+    boxes_a = boxes_a[:, None, :]
+    boxes_b = boxes_b[None, :, :]
+
+    x_overlap = np.minimum(boxes_a[..., 2], boxes_b[..., 2]) - np.maximum(boxes_a[..., 0], boxes_b[..., 0])
+    y_overlap = np.minimum(boxes_a[..., 3], boxes_b[..., 3]) - np.maximum(boxes_a[..., 1], boxes_b[..., 1])
+    intersection = np.maximum(x_overlap, 0.0) * np.maximum(y_overlap, 0.0)
+
+    area_box_a = (boxes_a[..., 2] - boxes_a[..., 0]) * (boxes_a[..., 3] - boxes_a[..., 1])
+    area_box_b = (boxes_b[..., 2] - boxes_b[..., 0]) * (boxes_b[..., 3] - boxes_b[..., 1])
+    union = area_box_a + area_box_b - intersection
+
+    return intersection / union
+
+
+def greedy_nms(boxes, scores, iou_threshold, groups=None):
+    """
+    Performs greedy Non-Maximum Suppression. Boxes are suppressed only by the boxes from the same group.
+    Each kept box is compared only with the boxes that are not suppressed yet, so the memory usage
+    is linear in the number of boxes.
+
+    Parameters
+    ----------
+    boxes : ndarray
+        Array of shape [n, 4]. Bboxes in [x1, y1, x2, y2] format.
+    scores : ndarray
+        Array of shape [n]. Confidences of the `boxes`.
+    iou_threshold : float
+        Boxes that have IoU with a more confident box greater than `iou_threshold` are suppressed.
+    groups : ndarray, optional
+        Array of shape [n] of ints. Id of the group (class, image, etc) each box belongs to.
+        If not provided, all the boxes are treated as a single group (class-agnostic NMS).
+
+    Returns
+    -------
+    ndarray
+        Indices of the kept boxes sorted by confidence in descending order.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if groups is None:
+        groups = np.zeros(len(boxes), dtype=np.int64)
+
+    # Stable sort keeps the original order for boxes with the same confidence
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    for group in np.unique(groups):
+        group_order = order[groups[order] == group]
+        group_boxes = boxes[group_order]
+        # Positions in `group_order` of the boxes that are not suppressed yet
+        remaining = np.arange(len(group_order))
+        while len(remaining) > 0:
+            current = remaining[0]
+            keep.append(group_order[current])
+            remaining = remaining[1:]
+            ious = jaccard_matrix(group_boxes[current:current + 1], group_boxes[remaining])[0]
+            # NaN IoU (degenerate boxes) does not suppress anything
+            remaining = remaining[~(ious > iou_threshold)]
+
+    keep = np.array(keep, dtype=np.int64)
+    return keep[np.argsort(-scores[keep], kind='stable')]
+
+
+def nms(pred_bboxes, pred_confs, conf_threshold=0.4, iou_threshold=0.1, background_class=0, class_agnostic=False):
     """
     Performs Non-Maximum Suppression on predicted bboxes.
 
@@ -96,6 +175,8 @@ def nms(pred_bboxes, pred_confs, conf_threshold=0.4, iou_threshold=0.1, backgrou
         than `iou_threshold`. LESSER - LESS BBOXES LAST, MORE - MORE BBOXES LAST.
     background_class : int
         Index of the background class.
+    class_agnostic : bool
+        If set to True, bboxes of different classes suppress each other as well.
 
     Returns
     -------
@@ -106,65 +187,70 @@ def nms(pred_bboxes, pred_confs, conf_threshold=0.4, iou_threshold=0.1, backgrou
     final_conf_values : list
         List of confidences (floats) for the predicted `classes`.
     """
+    boxes, classes, confs = _filter_predictions(pred_bboxes, pred_confs, conf_threshold, background_class)
+
+    groups = None if class_agnostic else classes
+    keep = greedy_nms(boxes, confs, iou_threshold, groups=groups)
+
+    return list(boxes[keep]), list(classes[keep]), list(confs[keep])
+
+
+def batch_nms(pred_bboxes, pred_confs, conf_threshold=0.4, iou_threshold=0.1, background_class=0,
+              class_agnostic=False):
+    """
+    Performs Non-Maximum Suppression on a batch of predictions at once.
 
+    Parameters
+    ----------
+    pred_bboxes : ndarray
+        Predicted bboxes. Numpy array of shape [batch_size, num_predictions, 4].
+    pred_confs : ndarray
+        Predicted confidences. Numpy array of shape [batch_size, num_predictions, num_classes].
+    conf_threshold : float
+        See `nms`.
+    iou_threshold : float
+        See `nms`.
+    background_class : int
+        Index of the background class.
+    class_agnostic : bool
+        If set to True, bboxes of different classes suppress each other as well.
+
+    Returns
+    -------
+    list
+        [(bboxes, classes, confidences)] for each image in the batch. Same as the output of `nms`.
+    """
+    batch_size, num_predictions = pred_confs.shape[:2]
+    num_classes = pred_confs.shape[-1]
+    boxes, classes, confs, images = _filter_predictions(
+        np.reshape(pred_bboxes, [-1, 4]),
+        np.reshape(pred_confs, [-1, num_classes]),
+        conf_threshold,
+        background_class,
+        images=np.repeat(np.arange(batch_size), num_predictions)
+    )
+
+    # Boxes from different images never suppress each other
+    groups = images if class_agnostic else images * num_classes + classes
+    keep = greedy_nms(boxes, confs, iou_threshold, groups=groups)
+
+    results = []
+    for i in range(batch_size):
+        image_keep = keep[images[keep] == i]
+        results += [(list(boxes[image_keep]), list(classes[image_keep]), list(confs[image_keep]))]
+    return results
+
+
+def _filter_predictions(pred_bboxes, pred_confs, conf_threshold, background_class, images=None):
+    pred_conf_classes = np.argmax(pred_confs, axis=1)
     pred_conf_values = np.max(pred_confs, axis=1)
 
-    # Take predicted boxes with confidence higher than conf_trash_hold
-    filtered_pred_boxes = pred_bboxes[pred_conf_values > conf_threshold]
-    filtered_pred_confs = pred_confs[pred_conf_values > conf_threshold]
-
-    # Get classes in order get rid of background class
-    pred_conf_classes = np.argmax(filtered_pred_confs, axis=1)
-
-    # Get rid of background class boxes
-    back_ground_class_mask = pred_conf_classes != background_class
-    filtered_pred_boxes = filtered_pred_boxes[back_ground_class_mask]
-    filtered_pred_confs = filtered_pred_confs[back_ground_class_mask]
-
-    # Create array with indexes of bboxes for easier navigation later
-    indexes = np.arange(filtered_pred_confs.shape[0])
-
-    pred_conf_classes = np.argmax(filtered_pred_confs, axis=1)
-    pred_conf_values = np.max(filtered_pred_confs, axis=1)
-
-    usage_mask = pred_conf_values > conf_threshold
-    final_boxes = []
-    final_conf_classes = []
-    final_conf_values = []
-    while True:
-        # Step 1: Choose the most confident box if possible
-        bboxes = filtered_pred_boxes[usage_mask]
-        conf_values = pred_conf_values[usage_mask]
-        conf_classes = pred_conf_classes[usage_mask]
-        unused_indexes = indexes[usage_mask]
-        if bboxes.shape[0] == 0:
-            break
-
-        id_most_confident = np.argmax(conf_values)
-        most_confident_box = bboxes[id_most_confident]
-
-        # Step 2: Mark the box as used in the mask, add to final predictions
-        usage_mask[unused_indexes[id_most_confident]] = False
-        final_boxes.append(most_confident_box)
-        final_conf_classes.append(conf_classes[id_most_confident])
-        final_conf_values.append(conf_values[id_most_confident])
-
-        # Step 3: Calculate Jaccard Index for the boxes with the same class
-
-        # Pick boxes with the same class
-        boxes_same_class = bboxes[conf_classes == conf_classes[id_most_confident]]
-        # Save indexes of these boxes
-        indexes_same_class = unused_indexes[conf_classes == conf_classes[id_most_confident]]
-        # Stack current boxes for the Jaccard Index calculation
-        most_confident_box_stack = np.vstack([most_confident_box] * len(boxes_same_class))
-        ious = jaccard_index(most_confident_box_stack, boxes_same_class)
-
-        # Step 4: Mark boxes as used which iou is greater than `iou_threshold`
-        boxes_to_mark = indexes_same_class[ious > iou_threshold]
-        for box in boxes_to_mark:
-            usage_mask[box] = False
-
-    return final_boxes, final_conf_classes, final_conf_values
+    # Take predicted boxes with confidence higher than `conf_threshold` and get rid of the background class boxes
+    mask = (pred_conf_values > conf_threshold) & (pred_conf_classes != background_class)
+    filtered = pred_bboxes[mask], pred_conf_classes[mask], pred_conf_values[mask]
+    if images is not None:
+        filtered += (images[mask],)
+    return filtered
 
 
 def compute_tps(pred_boxes, pred_classes, true_boxes, true_classes, iou_th=0.5):
@@ -33,10 +33,11 @@ class ClassificatorTrainer(MakiTrainer, ABC):
         self._weight_map = super().get_label_tensors()[ClassificatorTrainer.WEIGHT_MAP]
 
     def get_labels(self):
-        return self._labels
+        # The label tensors are requested each time since they differ between the towers
+        return super().get_label_tensors()[ClassificatorTrainer.LABELS]
 
     def get_weight_map(self):
-        return self._weight_map
+        return super().get_label_tensors()[ClassificatorTrainer.WEIGHT_MAP]
 
     def get_logits(self):
         return super().get_traingraph_tensor(self._logits_name)
@@ -36,7 +36,8 @@ class RegressorTrainer(MakiTrainer, ABC):
         self._logits_names = source_names
 
     def get_labels(self):
-        return self._labels
+        # The label tensors are requested each time since they differ between the towers
+        return super().get_label_tensors()
 
     def get_logits(self):
         logits = []
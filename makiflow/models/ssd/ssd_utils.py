@@ -23,6 +23,8 @@ import cv2
 import numpy as np
 from tqdm import tqdm
 
+from makiflow.metrics.od_utils import nms as od_nms
+
 
 def jaccard_index(boxes_a, boxes_b):
     """
@@ -312,66 +314,13 @@ def nms(pred_bboxes, pred_confs, conf_trashhold=0.4, iou_trashhold=0.1, backgrou
     :param background_class - index of the background class.
     :return Returns final predicted bboxes and confidences
     """
-    # TODO: backgroung_class is never used
-
-    pred_conf_values = np.max(pred_confs, axis=1)
-
-    # Take predicted boxes with confidence higher than conf_trash_hold
-    filtered_pred_boxes = pred_bboxes[pred_conf_values > conf_trashhold]
-    filtered_pred_confs = pred_confs[pred_conf_values > conf_trashhold]
-
-    # Get classes in order get rid of background class
-    pred_conf_classes = np.argmax(filtered_pred_confs, axis=1)
-
-    # Get rid of background class boxes
-    back_ground_class_mask = pred_conf_classes != 0
-    filtered_pred_boxes = filtered_pred_boxes[back_ground_class_mask]
-    filtered_pred_confs = filtered_pred_confs[back_ground_class_mask]
-
-    # Create array with indexes of bboxes for easier navigation later
-    indexes = np.arange(filtered_pred_confs.shape[0])
-
-    pred_conf_classes = np.argmax(filtered_pred_confs, axis=1)
-    pred_conf_values = np.max(filtered_pred_confs, axis=1)
-
-    usage_mask = pred_conf_values > conf_trashhold
-    final_boxes = []
-    final_conf_classes = []
-    final_conf_values = []
-    while True:
-        # Step 1: Choose the most confident box if possible
-        bboxes = filtered_pred_boxes[usage_mask]
-        conf_values = pred_conf_values[usage_mask]
-        conf_classes = pred_conf_classes[usage_mask]
-        unused_indexes = indexes[usage_mask]
-        if bboxes.shape[0] == 0:
-            break
-
-        id_most_confident = np.argmax(conf_values)
-        most_confident_box = bboxes[id_most_confident]
-
-        # Step 2: Mark the box as used in the mask, add to final predictions
-        usage_mask[unused_indexes[id_most_confident]] = False
-        final_boxes.append(most_confident_box)
-        final_conf_classes.append(conf_classes[id_most_confident])
-        final_conf_values.append(conf_values[id_most_confident])
-
-        # Step 3: Calculate Jaccard Index for the boxes with the same class
-
-        # Pick boxes with the same class
-        boxes_same_class = bboxes[conf_classes == conf_classes[id_most_confident]]
-        # Save indexes of these boxes
-        indexes_same_class = unused_indexes[conf_classes == conf_classes[id_most_confident]]
-        # Stack current boxes for the Jaccard Index calucaltion
-        most_confident_box_stack = np.vstack([most_confident_box] * len(boxes_same_class))
-        ious = jaccard_index(most_confident_box_stack, boxes_same_class)
-
-        # Step 4: Mark boxes as used which iou is greater than 0.1
-        boxes_to_mark = indexes_same_class[ious > iou_trashhold]
-        for box in boxes_to_mark:
-            usage_mask[box] = False
-
-    return final_boxes, final_conf_classes, final_conf_values
+    return od_nms(
+        pred_bboxes,
+        pred_confs,
+        conf_threshold=conf_trashhold,
+        iou_threshold=iou_trashhold,
+        background_class=background_class
+    )
 
 
 def bboxes_xy2wh(bboxes_xy):
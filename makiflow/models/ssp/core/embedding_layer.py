@@ -83,7 +83,9 @@ class SkeletonEmbeddingLayer(MakiLayer):
 
         embedding = np.array(self._custom_embedding)
         with tf.name_scope(name):
-            self._embedding = tf.Variable(embedding, dtype='float32', name='SkeletonEmbedding')
+            self._embedding = MakiLayer.create_variable(
+                'SkeletonEmbedding', shape=list(embedding.shape), init_fn=lambda: embedding
+            )
 
         super().__init__(
             name=name,
@@ -205,7 +207,8 @@ if __name__ == '__main__':
     print('Coords TfTensor', coords_ish.get_data_tensor())
 
     sess = tf.Session()
-    sess.run(tf.global_variables_initializer())
+    # The layers' variables are initialized from the fed values, see `MakiLayer.create_variable`
+    sess.run(tf.global_variables_initializer(), feed_dict=MakiLayer.get_init_feed_dict(tf.global_variables()))
     coords = sess.run(
         coords_ish.get_data_tensor(),
         feed_dict={
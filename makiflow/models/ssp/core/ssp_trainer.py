@@ -171,6 +171,8 @@ class SSPTrainer(MakiTrainer, ABC):
             self._head_labels.append(head)
 
     def _build_loss(self):
+        # The label tensors are fetched anew, since each tower gets its own slice of them
+        self._setup_head_labels()
         losses = []
         for head_label in self._head_labels:
             head = self.find_similar_model_head(head_label)
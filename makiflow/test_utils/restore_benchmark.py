@@ -0,0 +1,86 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from makiflow.core import MakiBuilder
+from makiflow.layers import InputLayer, MulByAlphaLayer
+import tensorflow as tf
+import time
+
+
+def chain_graph_info(n_layers=2000, input_shape=[1, 8]):
+    """
+    Creates the graph info of a synthetic model that is a chain of `n_layers` MulByAlphaLayers.
+
+    Parameters
+    ----------
+    n_layers : int
+        Number of layers in the chain.
+    input_shape : list
+        Shape of the input tensor including the batch dimension.
+
+    Returns
+    -------
+    list
+        Graph info section of the architecture file.
+    str
+        Name of the output MakiTensor.
+    """
+    with tf.Graph().as_default():
+        x = InputLayer(input_shape, name='input')
+        for i in range(n_layers):
+            x = MulByAlphaLayer(alpha=1.0, name=f'mul{i}')(x)
+
+        graph_info = [tensor.to_dict() for tensor in x.get_previous_tensors().values()]
+        graph_info += [x.to_dict()]
+    return graph_info, x.get_name()
+
+
+def restore_benchmark(n_layers=2000, n_runs=3, custom_input=True):
+    """
+    Measures the time of MakiBuilder.restore_graph for a chain of `n_layers` layers.
+
+    Parameters
+    ----------
+    n_layers : int
+        Number of layers in the chain.
+    n_runs : int
+        Number of the restorations to average over.
+    custom_input : bool
+        If True, the graph is restored with a custom InputLayer, which requires renaming of the parents.
+
+    Returns
+    -------
+    float
+        Mean time (in seconds) of one restoration.
+    """
+    graph_info, output_name = chain_graph_info(n_layers)
+    total_time = 0.0
+    for _ in range(n_runs):
+        # Each restoration gets a fresh graph, so the previous runs do not slow it down
+        with tf.Graph().as_default():
+            input_layer = InputLayer([1, 8], name='custom_input') if custom_input else None
+            start = time.perf_counter()
+            makitensors = MakiBuilder.restore_graph([output_name], graph_info, input_layer=input_layer)
+            total_time += time.perf_counter() - start
+        assert len(makitensors) == n_layers + 1, f'Expected {n_layers + 1} MakiTensors, got {len(makitensors)}'
+    return total_time / n_runs
+
+
+if __name__ == '__main__':
+    for n_layers in [250, 500, 1000, 2000]:
+        mean_time = restore_benchmark(n_layers)
+        print(f'{n_layers} layers: {mean_time:.3f}s per restoration, {mean_time / n_layers * 1e3:.3f}ms per layer.')
@@ -0,0 +1,145 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from makiflow.generators.pipeline.tfr.tfr_gen_layers import InputGenLayerV1, InputGenLayerV2Batched, \
+    InputGenLayerV2, InputGenLayerV3, InputGenLayerV4, InputGenLayerV5
+from makiflow.generators.pipeline.tfr.tfr_pipeline import TFRPipelineBuilder
+from makiflow.generators.pipeline.tfr.tfr_random_access import TFRRandomAccessReader
+from makiflow.generators.pipeline.tfr.tfr_map_method import TFRMapMethod
+from makiflow.generators.pipeline.tfr.tfr_pathgenerator import CycleGenerator
+from makiflow.generators.pipeline.tfr.tfr_writer import record_shards, load_manifest
+from makiflow.generators.pipeline.tfr.utils import _tensor_to_byte_feature
+import numpy as np
+import tensorflow as tf
+import time
+
+IMAGE = 'image'
+
+
+def _serialize_example(image):
+    feature = {IMAGE: _tensor_to_byte_feature(image)}
+    features = tf.train.Features(feature=feature)
+    return tf.train.Example(features=features).SerializeToString()
+
+
+class SyntheticLoadMethod(TFRMapMethod):
+    def __init__(self, image_shape):
+        self.image_shape = image_shape
+
+    def read_record(self, serialized_example):
+        example = tf.io.parse_single_example(serialized_example, {IMAGE: tf.io.FixedLenFeature((), tf.string)})
+        image = tf.io.parse_tensor(example[IMAGE], out_type=tf.float32)
+        image = tf.reshape(image, self.image_shape)
+        return {IMAGE: image}
+
+
+class IdentityMethod(TFRMapMethod):
+    def read_record(self, serialized_example):
+        return serialized_example
+
+
+def write_synthetic_tfrecords(prefix, n_data_points=4096, image_shape=(64, 64, 3), dp_per_record=256):
+    """
+    Writes tfrecords with random float32 images.
+
+    Returns
+    -------
+    str
+        Path to the manifest file.
+    """
+    images = [np.random.randn(*image_shape).astype(np.float32) for _ in range(n_data_points)]
+    return record_shards(_serialize_example, [images], prefix, dp_per_record)
+
+
+def _measure(layer, n_batches, n_warmup):
+    # Returns the number of batches per second
+    data_tensor = layer.get_data_tensor()
+    with tf.Session() as sess:
+        for _ in range(n_warmup):
+            sess.run(data_tensor)
+        start = time.perf_counter()
+        for _ in range(n_batches):
+            sess.run(data_tensor)
+        return n_batches / (time.perf_counter() - start)
+
+
+def pipeline_benchmark(manifest_path, image_shape=(64, 64, 3), batch_size=32, n_batches=200, n_warmup=20,
+                       num_parallel_calls=4, buffer_size=512):
+    """
+    Measures the throughput of all the tfrecord input layers on the same data. The legacy layers get
+    the same parallelism and shuffle buffer.
+
+    Returns
+    -------
+    dict
+        Contains pairs (layer name, batches per second).
+    """
+    tfrecords, _, _ = load_manifest(manifest_path)
+    load = SyntheticLoadMethod(list(image_shape))
+    common = dict(prefetch_size=1, batch_size=batch_size, input_data_type=IMAGE, name='input')
+    variants = {
+        'V1': lambda: InputGenLayerV1(
+            tf_records=tfrecords, map_operation=load, num_parallel_calls=num_parallel_calls,
+            shuffle=True, buffer_size=buffer_size, **common
+        ),
+        'V2Batched': lambda: InputGenLayerV2Batched(
+            tfr_path_generator=CycleGenerator.from_manifest(manifest_path), operation_before_batched=load,
+            map_operation=IdentityMethod(), num_parallel_calls=num_parallel_calls, cycle_length=4,
+            shuffle=True, buffer_size=buffer_size // batch_size, **common
+        ),
+        'V2': lambda: InputGenLayerV2(
+            tfr_path_generator=CycleGenerator.from_manifest(manifest_path), map_operation=load,
+            num_parallel_calls=num_parallel_calls, cycle_length=4, shuffle=True, buffer_size=buffer_size, **common
+        ),
+        'V3': lambda: InputGenLayerV3(
+            tfr_path_generator=CycleGenerator.from_manifest(manifest_path), map_operation=load,
+            num_parallel_calls=num_parallel_calls, shuffle=True, buffer_size=buffer_size, **common
+        ),
+        'V4': lambda: InputGenLayerV4(
+            tfr_path_generator=CycleGenerator.from_manifest(manifest_path), map_operation=load,
+            num_parallel_calls=num_parallel_calls, cycle_length=4, shuffle=True, buffer_size=buffer_size, **common
+        ),
+        'V5': lambda: InputGenLayerV5(
+            TFRPipelineBuilder(batch_size, load).set_tfrecords(tfrecords).set_shuffle(buffer_size),
+            input_data_type=IMAGE, name='input'
+        ),
+        'V5RandomAccess': lambda: InputGenLayerV5(
+            TFRPipelineBuilder(batch_size, load).set_random_access(TFRRandomAccessReader.from_manifest(manifest_path)),
+            input_data_type=IMAGE, name='input'
+        )
+    }
+
+    results = {}
+    for name, build_layer in variants.items():
+        # Each layer gets a fresh graph, so the previous ones do not affect it
+        with tf.Graph().as_default():
+            results[name] = _measure(build_layer(), n_batches, n_warmup)
+    return results
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    IMAGE_SHAPE = (64, 64, 3)
+    BATCH_SIZE = 32
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manifest = write_synthetic_tfrecords(os.path.join(tmp_dir, 'synthetic'), image_shape=IMAGE_SHAPE)
+        throughputs = pipeline_benchmark(manifest, image_shape=IMAGE_SHAPE, batch_size=BATCH_SIZE)
+
+    for layer_name, batches_per_sec in throughputs.items():
+        print(f'{layer_name}: {batches_per_sec:.1f} batches/s, {batches_per_sec * BATCH_SIZE:.0f} images/s.')
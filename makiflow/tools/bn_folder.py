@@ -0,0 +1,286 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import numpy as np
+import tensorflow as tf
+
+from makiflow.core import MakiTensor, MakiRestorable
+from makiflow.core.inference.model_serializer import ModelSerializer
+from makiflow.layers import ConvLayer, DepthWiseConvLayer, SeparableConvLayer, DenseLayer, BatchNormLayer
+
+
+class BatchNormFolder:
+    """
+    Inference graph optimization. Folds statistics and affine parameters of the BatchNormLayers
+    into the kernel and bias of the preceding linear layer:
+        scale = gamma / sqrt(var + eps)
+        W' = W * scale
+        b' = (b - mean) * scale + beta
+    A BatchNormLayer is folded only if:
+    - it tracks running statistics;
+    - its input is produced by ConvLayer, DepthWiseConvLayer, SeparableConvLayer or DenseLayer without activation;
+    - both layers are called once and the output of the linear layer is used by the BatchNormLayer only;
+    - its output is not one of the model's inputs or outputs.
+    """
+    FOLDABLE_LAYERS = (ConvLayer, DepthWiseConvLayer, SeparableConvLayer, DenseLayer)
+
+    def __init__(self, model: ModelSerializer):
+        """
+        Parameters
+        ----------
+        model : ModelSerializer
+            The model to optimize. It must be initialized with a session.
+        """
+        self._model = model
+
+    def fold(self):
+        """
+        Creates an equivalent architecture and weights without the foldable BatchNormLayers.
+        The model itself is not modified.
+
+        Returns
+        -------
+        model_info : dict
+            Model info section of the architecture file.
+        graph_info : list
+            Graph info section of the architecture file.
+        weights : dict
+            Contains pairs { var_name: ndarray }. The names are the same as the ones
+            used by the layers, therefore, the weights can be loaded via `load_weights`.
+        """
+        model = self._model
+        graph_tensors = model.get_graph_tensors()
+        session = model.get_session()
+
+        named_params = {}
+        for tensor in graph_tensors.values():
+            named_params.update(tensor.get_parent_layer().get_params_dict())
+        weights = session.run(named_params)
+
+        model_info = model._get_model_info()
+        graph_info = model._get_graph_info()
+
+        protected_names = set()
+        for tensor in model.get_inputs() + model.get_outputs():
+            protected_names.add(tensor.get_name())
+
+        # Number of the MakiTensors that consume each MakiTensor
+        n_consumers = {}
+        for tensor in graph_tensors.values():
+            for parent_name in tensor.get_parent_tensor_names():
+                n_consumers[parent_name] = n_consumers.get(parent_name, 0) + 1
+
+        # Contains pairs { BN MakiTensor name: linear MakiTensor name }
+        folded = {}
+        # Contains pairs { linear MakiTensor name: linear layer }
+        folded_layers = {}
+        for name, tensor in graph_tensors.items():
+            bn = tensor.get_parent_layer()
+            if not self._can_fold(tensor, graph_tensors, n_consumers, protected_names):
+                continue
+
+            linear_tensor = tensor.get_parent_tensors()[0]
+            linear = linear_tensor.get_parent_layer()
+            scale, shift = self._bn_scale_shift(bn, weights)
+            self._fold_layer(linear, scale, shift, weights)
+
+            for var_name in bn.get_params_dict():
+                weights.pop(var_name)
+
+            folded[name] = linear_tensor.get_name()
+            folded_layers[linear_tensor.get_name()] = linear
+
+        new_graph_info = []
+        for tensor_info in graph_info:
+            if tensor_info[MakiTensor.NAME] in folded:
+                continue
+
+            tensor_info[MakiTensor.PARENT_TENSOR_NAMES] = [
+                folded.get(parent_name, parent_name) for parent_name in tensor_info[MakiTensor.PARENT_TENSOR_NAMES]
+            ]
+            linear = folded_layers.get(tensor_info[MakiTensor.NAME])
+            if linear is not None:
+                # The folded layer always has a bias
+                layer_params = tensor_info[MakiTensor.PARENT_LAYER_INFO][MakiRestorable.PARAMS]
+                layer_params[type(linear).USE_BIAS] = True
+            new_graph_info.append(tensor_info)
+
+        print(f'Folded {len(folded)} BatchNormLayers.')
+        return model_info, new_graph_info, weights
+
+    def save(self, arch_path, weights_path):
+        """
+        Folds the BatchNormLayers and saves the resulting architecture and weights.
+        The saved model can be restored via the usual `from_json` and `load_weights` methods.
+
+        Parameters
+        ----------
+        arch_path : str
+            Path to the architecture json file.
+        weights_path : str
+            Path to the checkpoint file.
+            Example: '/home/student401/my_model/model.ckpt'
+        """
+        model_info, graph_info, weights = self.fold()
+
+        model_dict = {
+            ModelSerializer.MODEL_INFO: model_info,
+            ModelSerializer.GRAPH_INFO: graph_info
+        }
+        with open(arch_path, mode='w') as json_file:
+            json_file.write(json.dumps(model_dict, indent=1))
+        print(f"Folded model's architecture is saved to {arch_path}.")
+
+        save_weights(weights, weights_path)
+
+    def _can_fold(self, tensor, graph_tensors, n_consumers, protected_names):
+        bn = tensor.get_parent_layer()
+        if not isinstance(bn, BatchNormLayer) or not bn._track_running_stats:
+            return False
+
+        if bn.get_n_calls() != 1 or tensor.get_name() in protected_names:
+            return False
+
+        parent_names = tensor.get_parent_tensor_names()
+        if len(parent_names) != 1:
+            return False
+
+        linear_tensor = graph_tensors[parent_names[0]]
+        linear = linear_tensor.get_parent_layer()
+        if not isinstance(linear, BatchNormFolder.FOLDABLE_LAYERS) or linear.f is not None:
+            return False
+
+        return linear.get_n_calls() == 1 and n_consumers[linear_tensor.get_name()] == 1 and \
+            linear_tensor.get_name() not in protected_names
+
+    @staticmethod
+    def _bn_scale_shift(bn: BatchNormLayer, weights):
+        mean = weights[bn.name_mean]
+        var = weights[bn.name_var]
+        gamma = weights[bn.name_gamma] if bn.use_gamma else np.ones_like(mean)
+        beta = weights[bn.name_beta] if bn.use_beta else np.zeros_like(mean)
+
+        scale = gamma / np.sqrt(var + bn.eps)
+        shift = beta - mean * scale
+        return scale, shift
+
+    @staticmethod
+    def _fold_layer(layer, scale, shift, weights):
+        """
+        Scales the kernel and bias of the `layer` in the `weights` dictionary.
+        Adds the bias if the layer did not use one.
+        """
+        name = layer.get_name()
+        if isinstance(layer, ConvLayer):
+            kw, kh, in_f, out_f = layer.shape
+            kernel_name = layer.name_conv
+            bias_name = ConvLayer.NAME_BIAS.format(kw, kh, in_f, out_f, name)
+            kernel_scale = scale
+        elif isinstance(layer, DepthWiseConvLayer):
+            kw, kh, in_f, multiplier = layer.shape
+            kernel_name = layer.name_conv
+            bias_name = DepthWiseConvLayer.NAME_BIAS.format(in_f * multiplier, name)
+            # Output channel `c * multiplier + m` is produced by the kernel [:, :, c, m]
+            kernel_scale = np.reshape(scale, [in_f, multiplier])
+        elif isinstance(layer, SeparableConvLayer):
+            # Only the pointwise kernel affects the output channels
+            kernel_name = layer.name_PW
+            bias_name = SeparableConvLayer.NAME_BIAS.format(layer.out_f, name)
+            kernel_scale = scale
+        else:
+            kernel_name = layer.name_dense
+            bias_name = DenseLayer.NAME_BIAS.format(layer.input_shape, layer.output_shape, name)
+            kernel_scale = scale
+
+        bias = weights[bias_name] if layer.use_bias else np.zeros_like(scale)
+        weights[kernel_name] = (weights[kernel_name] * kernel_scale).astype(np.float32)
+        weights[bias_name] = (bias * scale + shift).astype(np.float32)
+
+
+def save_weights(weights: dict, path):
+    """
+    Saves numpy weights as a TensorFlow checkpoint. The variables are created in a separate graph,
+    so the current default graph is left untouched.
+
+    Parameters
+    ----------
+    weights : dict
+        Contains pairs { var_name: ndarray }.
+    path : str
+        Path to the checkpoint file.
+        Example: '/home/student401/my_model/model.ckpt'
+    """
+    with tf.Graph().as_default():
+        placeholders = {}
+        variables = {}
+        for var_name, value in weights.items():
+            placeholders[var_name] = tf.placeholder(value.dtype, shape=value.shape)
+            variables[var_name] = tf.Variable(placeholders[var_name], name=var_name)
+
+        feed_dict = {placeholders[var_name]: weights[var_name] for var_name in weights}
+        with tf.Session() as sess:
+            sess.run(tf.variables_initializer(list(variables.values())), feed_dict=feed_dict)
+            save_path = tf.train.Saver(variables).save(sess, path)
+    print(f'Weights are saved to {save_path}')
+
+
+# For debug
+if __name__ == '__main__':
+    import os
+    import tempfile
+    from makiflow.layers import InputLayer
+    from makiflow.models import Classificator
+
+    def random_bn(D, name):
+        return BatchNormLayer(
+            D=D, name=name,
+            mean=np.random.randn(D), var=np.random.rand(D) + 0.5,
+            gamma=np.random.randn(D), beta=np.random.randn(D)
+        )
+
+    # RUN A NUMERIC SANITY CHECK: the folded model must give the same outputs as conv -> BN.
+    # The last layer is not folded into, since the model's outputs are never folded.
+    np.random.seed(0)
+    in_x = InputLayer(input_shape=[2, 8, 8, 3], name='input')
+    x = ConvLayer(kw=3, kh=3, in_f=3, out_f=4, activation=None, use_bias=False, name='conv')(in_x)
+    x = random_bn(4, 'conv_bn')(x)
+    x = DepthWiseConvLayer(kw=3, kh=3, in_f=4, multiplier=2, activation=None, name='depthwise')(x)
+    x = random_bn(8, 'depthwise_bn')(x)
+    out_x = ConvLayer(kw=1, kh=1, in_f=8, out_f=5, activation=None, name='head')(x)
+
+    model = Classificator(in_x=in_x, out_x=out_x)
+    model.set_session(tf.Session())
+    data = np.random.randn(2, 8, 8, 3).astype(np.float32)
+    expected = model.get_session().run(out_x.get_data_tensor(), feed_dict={in_x.get_data_tensor(): data})
+
+    tmp_dir = tempfile.mkdtemp()
+    arch_path = os.path.join(tmp_dir, 'folded.json')
+    BatchNormFolder(model).save(arch_path, os.path.join(tmp_dir, 'folded.ckpt'))
+
+    with tf.Graph().as_default():
+        folded = Classificator.from_json(arch_path)
+        folded.set_session(tf.Session())
+        folded.load_weights(os.path.join(tmp_dir, 'folded.ckpt'))
+        actual = folded.get_session().run(
+            folded.get_logits().get_data_tensor(),
+            feed_dict={folded.get_inputs()[0].get_data_tensor(): data}
+        )
+
+    print('Max absolute difference:', np.abs(expected - actual).max())
+    assert np.allclose(expected, actual, atol=1e-4), 'The folded model gives different outputs.'
+    print('The folded model is equivalent to the original one.')
@@ -15,89 +15,113 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
+from concurrent.futures import ProcessPoolExecutor
+
 import ujson
 from tqdm import tqdm
 
+from makiflow.tools.parse_cache import file_hash, load_cache, save_cache, add_class_counts
+
+
+def _convert_images(images, annotations_by_image, categories, channels):
+    """
+    Converts COCO image infos and their annotations to [{file, [bboxes]}].
+    It is a module-level function, so it can be sent to the worker processes.
+    """
+    result_list = []
+    for img in images:
+        objects_list = []
+        for info_bbox in annotations_by_image.get(img['id'], []):
+            x1 = info_bbox['bbox'][0]
+            y1 = info_bbox['bbox'][1]
+            x2 = x1 + info_bbox['bbox'][2]
+            y2 = y1 + info_bbox['bbox'][3]
+            objects_list.append({
+                'name': categories[info_bbox['category_id']],
+                'box': [x1, y1, x2, y2]
+            })
+
+        result_list.append({
+            'filename': img['file_name'],
+            'size': (img['width'], img['height'], channels),
+            'objects': objects_list
+        })
+    return result_list
+
+
 class JsonParser:
+    # Number of the images converted by one task of a worker process
+    CHUNK_SIZE = 1024
 
     def __init__(self):
         self.result_list = []
         self.classes = set()
         self.classes_count = {}
 
-    def parse_coco_json(self, to_json_path, channels=3, num_files=None):
+    def parse_coco_json(self, to_json_path, channels=3, num_files=None, n_workers=1, cache_dir=None):
         """
         Parse the single json file from CocoJson to [{file, [bboxes]}]
         :param channels: count of channels in Image
         :param to_json_path: path to json.json file
+        :param num_files: number of the images to parse. If None, all the images are parsed
+        :param n_workers: number of the processes converting the images
+        :param cache_dir: directory for caching the parsed data. The cache is keyed by the hash of the json file,
+        so a changed file is parsed again. If None, the cache is not used
         :return: dict with params of json.json
         """
-        result_list = []
-        result = dict()
-        json_file = open(to_json_path)
+        cache_key = None
+        if cache_dir is not None:
+            cache_key = f'coco_{file_hash(to_json_path)}_{channels}_{num_files}'
+        result_list = load_cache(cache_dir, cache_key)
+
+        if result_list is None:
+            result_list = self._parse(to_json_path, channels, num_files, n_workers)
+            save_cache(cache_dir, cache_key, result_list)
+
+        add_class_counts(result_list, self.classes, self.classes_count)
+        self.result_list = result_list
+        return result_list
 
-        json_str = ujson.load(json_file)
-        json_file.close()
+    def _parse(self, to_json_path, channels, num_files, n_workers):
+        with open(to_json_path) as json_file:
+            json_str = ujson.load(json_file)
 
         info_images = json_str['images']
         info_images = sorted(info_images, key=lambda image: image['id'])
+        if num_files is not None:
+            info_images = info_images[:num_files]
 
-        info_bboxes = json_str['annotations']
-        info_bboxes = sorted(info_bboxes, key=lambda info_bbox: info_bbox['image_id'])
+        # Group the annotations in a single pass. The order of the annotations within an image is kept.
+        image_ids = set([img['id'] for img in info_images])
+        annotations_by_image = {}
+        for info_bbox in json_str['annotations']:
+            if info_bbox['image_id'] in image_ids:
+                annotations_by_image.setdefault(info_bbox['image_id'], []).append(info_bbox)
 
-        raw_categories = json_str['categories']
         categories = {}
-        for rc in raw_categories:
+        for rc in json_str['categories']:
             categories[rc['id']] = rc['name']
-        
-        ii = 0
-        if num_files is not None:
-            num_iterations = num_files
-            print('OK')
-        else:
-            num_iterations = len(info_images)
-            print('NO OK')
-        iterator = tqdm(info_images)
-        for img in iterator:
-            id = img['id']
-            result['filename'] = img['file_name']
-            result['size'] = (img['width'], img['height'], channels)
-
-            objects_list = []
-            for i in range(len(info_bboxes)):
-                if id != info_bboxes[0]['image_id']:
-                    break
-
-                info_bbox = info_bboxes.pop(0)
-                name = categories[info_bbox['category_id']]
-                
-                # Add category to the set of classes
-                self.classes.add(name)
-                try:
-                    self.classes_count[name] += 1
-                except:
-                    self.classes_count[name] = 1
-                
-                x1 = info_bbox['bbox'][0]
-                y1 = info_bbox['bbox'][1]
-                x2 = x1 + info_bbox['bbox'][2]
-                y2 = y1 + info_bbox['bbox'][3]
-                box = [x1, y1, x2, y2]
-                objects_list.append({
-                    'name': name,
-                    'box': box
-                })
-            result['objects'] = objects_list
-            result_list.append(result)
-            result = dict()
-            
-            ii += 1
-            if ii > num_iterations:
-                iterator.close()
-                break
-            
-            
-        self.result_list = result_list
+
+        if n_workers == 1:
+            return _convert_images(tqdm(info_images), annotations_by_image, categories, channels)
+
+        chunks = [
+            info_images[i: i + JsonParser.CHUNK_SIZE]
+            for i in range(0, len(info_images), JsonParser.CHUNK_SIZE)
+        ]
+        result_list = []
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = []
+            for chunk in chunks:
+                # Send only the annotations of the chunk's images
+                chunk_annotations = {
+                    img['id']: annotations_by_image[img['id']]
+                    for img in chunk if img['id'] in annotations_by_image
+                }
+                futures.append(executor.submit(_convert_images, chunk, chunk_annotations, categories, channels))
+
+            for future in tqdm(futures):
+                result_list += future.result()
         return result_list
 
     def get_last_results(self):
@@ -0,0 +1,120 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov, Artem Mukhin
+#
+# This file is part of MakiFlow.
+#
+# MakiFlow is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiFlow is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+import pickle
+
+CACHE_FORM = '{0}.pkl'
+# Size of the chunks (in bytes) the files are hashed by
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_hash(path):
+    """
+    Computes SHA-1 hash of the file's contents.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+
+    Returns
+    -------
+    str
+        Hex digest of the hash.
+    """
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def files_state_hash(paths):
+    """
+    Computes SHA-1 hash of the paths, sizes and modification times of the files.
+    It is much cheaper than hashing the contents and changes whenever any of the files changes.
+
+    Parameters
+    ----------
+    paths : list
+        Paths to the files.
+
+    Returns
+    -------
+    str
+        Hex digest of the hash.
+    """
+    sha = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        sha.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return sha.hexdigest()
+
+
+def load_cache(cache_dir, key):
+    """
+    Returns
+    -------
+    object
+        The cached object or None if there is no cache for the `key`.
+    """
+    if cache_dir is None:
+        return None
+
+    cache_path = os.path.join(cache_dir, CACHE_FORM.format(key))
+    if not os.path.isfile(cache_path):
+        return None
+
+    with open(cache_path, 'rb') as f:
+        data = pickle.load(f)
+    print(f'Loaded the parsed data from the cache {cache_path}')
+    return data
+
+
+def save_cache(cache_dir, key, data):
+    if cache_dir is None:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, CACHE_FORM.format(key))
+    # Write to a temporary file first, so that an interrupted write does not leave a broken cache
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def add_class_counts(result_list, classes, classes_count):
+    """
+    Adds the objects of the parsed annotations to the counts of the classes. The counts are computed
+    from the results, so they are the same whether the results are parsed or loaded from the cache.
+
+    Parameters
+    ----------
+    result_list : list
+        List of dictionaries with the 'objects' field.
+    classes : set
+        Names of the classes. Updated in place.
+    classes_count : dict
+        Contains pairs { class name: number of objects }. Updated in place.
+    """
+    for result in result_list:
+        for obj in result['objects']:
+            classes.add(obj['name'])
+            classes_count[obj['name']] = classes_count.get(obj['name'], 0) + 1
@@ -16,49 +16,99 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 from lxml import etree
 from tqdm import tqdm
 
+from makiflow.tools.parse_cache import files_state_hash, load_cache, save_cache, add_class_counts
+
+
+def _parse_xml_file(to_xml_path):
+    """
+    Parse the single xml file. It is a module-level function, so it can be sent to the worker processes.
+    :param to_xml_path: path to xml file
+    :return: dict with params of xml
+    """
+    result = dict()
+    with open(to_xml_path) as xml_file:
+        xml = xml_file.read()
+
+    root = etree.fromstring(xml)
+    filename = root.xpath('filename')
+    result['filename'] = filename[0].text
+
+    folder = root.xpath('folder')
+    result['folder'] = folder[0].text
+
+    object_list = list()
+    objects = root.xpath('object')
+    for obj in objects:
+        name = obj.xpath('name')[0].text
+        box = [float(obj.xpath('bndbox/xmin')[0].text), float(obj.xpath('bndbox/ymin')[0].text),
+               float(obj.xpath('bndbox/xmax')[0].text), float(obj.xpath('bndbox/ymax')[0].text)]
+
+        object_list.append({
+            'name': name,
+            'box': box
+        })
+    result['objects'] = object_list
+
+    depth = int(root.xpath('size/depth')[0].text)
+    width = int(root.xpath('size/width')[0].text)
+    height = int(root.xpath('size/height')[0].text)
+    result['size'] = (depth, width, height)
+
+    return result
+
 
 class XmlParser:
     """ Used for taking data from Pascal dataset xml. Make sure you have the same data format
     in case you want to use it.
     """
+    # Number of the files parsed by one task of a worker process
+    CHUNK_SIZE = 64
+
     def __init__(self):
         self.result_list = list()
         self.classes = set()
         self.classes_count = {}
 
-    def parse_all_in_dict(self, source_path, num_files=None):
+    def parse_all_in_dict(self, source_path, num_files=None, n_workers=1, cache_dir=None):
         """
         Parse all files in directory
         :param source_path: path to folder, what contains the target xml files
-        :param num_files: TODO
+        :param num_files: number of the files to parse. If None, all the files are parsed
+        :param n_workers: number of the processes parsing the files
+        :param cache_dir: directory for caching the parsed data. The cache is keyed by the paths, sizes and
+        modification times of the files, so changed files are parsed again. If None, the cache is not used
         :return: list of dictionaries with params of xml
         """
+        paths = []
+        for root_dir, _, files in os.walk(source_path):
+            paths += [os.path.join(root_dir, file) for file in files]
         if num_files is not None:
-            
-            i = 0
-            self.result_list = list()
-            for root_dir, _, files in os.walk(source_path):
-                for file in tqdm(files):
-                    res = self.parse_xml(os.path.join(root_dir, file))
-                    self.result_list.append(res)
-                    i += 1
-                    if i > num_files:
-                        break
-            return self.result_list
-        
-        else:
-            
-            self.result_list = list()
-            for root_dir, _, files in os.walk(source_path):
-                for file in tqdm(files):
-                    res = self.parse_xml(os.path.join(root_dir, file))
-                    self.result_list.append(res)
-            return self.result_list
-            
+            paths = paths[:num_files]
+
+        cache_key = None
+        if cache_dir is not None:
+            cache_key = f'voc_{files_state_hash(paths)}'
+        result_list = load_cache(cache_dir, cache_key)
+
+        if result_list is None:
+            if n_workers == 1:
+                result_list = [_parse_xml_file(path) for path in tqdm(paths)]
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    result_list = list(tqdm(
+                        executor.map(_parse_xml_file, paths, chunksize=XmlParser.CHUNK_SIZE),
+                        total=len(paths)
+                    ))
+            save_cache(cache_dir, cache_key, result_list)
+
+        add_class_counts(result_list, self.classes, self.classes_count)
+        self.result_list = result_list
+        return self.result_list
 
     def parse_xml(self, to_xml_path):
         """
@@ -66,43 +116,9 @@ class XmlParser:
         :param to_xml_path: path to xml file
         :return: dict with params of xml
         """
-        result = dict()
-        with open(to_xml_path) as xml_file:
-            xml = xml_file.read()
-
-        root = etree.fromstring(xml)
-        filename = root.xpath('filename')
-        result['filename'] = filename[0].text
-        
-        folder = root.xpath('folder')
-        result['folder'] = folder[0].text
-
-        object_list = list()
-        objects = root.xpath('object')
-        for obj in objects:
-            name = obj.xpath('name')[0].text
-            box = [float(obj.xpath('bndbox/xmin')[0].text), float(obj.xpath('bndbox/ymin')[0].text),
-                   float(obj.xpath('bndbox/xmax')[0].text), float(obj.xpath('bndbox/ymax')[0].text)]
-            
-            # Add category to the set of classes
-            self.classes.add(name)
-            try:
-                self.classes_count[name] += 1
-            except:
-                self.classes_count[name] = 1
-                    
-                    
-            object_list.append({
-                'name': name,
-                'box': box
-            })
-        result['objects'] = object_list
-
-        depth = int(root.xpath('size/depth')[0].text)
-        width = int(root.xpath('size/width')[0].text)
-        height = int(root.xpath('size/height')[0].text)
-        result['size'] = (depth, width, height)
-
+        result = _parse_xml_file(to_xml_path)
+        # Add categories to the set of classes
+        add_class_counts([result], self.classes, self.classes_count)
         return result
 
     def get_last_results(self):
@@ -111,4 +127,4 @@ class XmlParser:
 
 if __name__ == "__main__":
     parser = XmlParser()
-    print(parser.parse_all_in_dict(source_path='xml_source'))
\ No newline at end of file
+    print(parser.parse_all_in_dict(source_path='xml_source'))